@@ -0,0 +1,260 @@
+"""
+Benchmark the Lambda's cold start and warm request latency against a local DynamoDB stub.
+
+The stub is a minimal DynamoDB JSON endpoint (DescribeTable, Scan, Query, GetItem,
+and acknowledged but unapplied writes) serving `--items` synthetic certificates; it
+counts every operation and every new TCP connection. Each run starts a fresh
+interpreter, as a new Lambda execution environment would, and measures:
+
+- import:  loading lambda.py
+- cold:    the first list request (client creation included)
+- warm:    `--requests` further list, get-by-id, create and expiring_within=30d
+           requests each
+
+along with the DynamoDB calls and connections each phase made and the share of
+responses marked X-Cache: HIT. `--lambda-path`
+benchmarks another copy of lambda.py, e.g. the previous revision:
+    git show HEAD~1:aws-backend/lambda.py > /tmp/lambda.py
+    python bench_lambda.py --lambda-path /tmp/lambda.py
+
+Run from the aws-backend directory:
+    python bench_lambda.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TABLE_NAME = 'Certificates'
+EXPIRY_SHARDS = 4
+COUNTER_ID = '#certificates'
+
+
+def make_items(count):
+    """
+    Synthetic certificates in DynamoDB's attribute-value JSON, expiring from 30 days
+    ago to two years from now, with the expiry index attributes lambda.py writes
+    """
+    items = []
+    now = time.time()
+    for i in range(count):
+        cert_id = f'cert-{i:06d}'
+        expires_at = int(now + ((i * 37) % 760 - 30) * 86400)
+        expires = datetime.fromtimestamp(expires_at, timezone.utc)
+        items.append({
+            'user_id': {'S': 'default'},
+            'certificate_id': {'S': cert_id},
+            'domain_name': {'S': f'host{i}.example.com'},
+            'common_name': {'S': f'host{i}.example.com'},
+            'issuer': {'S': "Let's Encrypt"},
+            'valid_from': {'S': '2025-01-01T00:00:00+00:00'},
+            'valid_until': {'S': expires.isoformat()},
+            'status': {'S': 'active'},
+            'ttl_timestamp': {'N': str(1900000000 + i)},
+            'expires_at': {'N': str(expires_at)},
+            'expiry_bucket': {'S': f"{expires:%Y-%m}#{zlib.crc32(cert_id.encode()) % EXPIRY_SHARDS}"},
+        })
+    return items
+
+
+class StubDynamoDB(ThreadingHTTPServer):
+    """DynamoDB JSON protocol stub over HTTP/1.1 keep-alive; `counts` tallies operations and connections"""
+
+    daemon_threads = True
+
+    def __init__(self, items):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.items = items
+        self.by_id = {item['certificate_id']['S']: item for item in items}
+        self.buckets = {}
+        for item in items:
+            self.buckets.setdefault(item['expiry_bucket']['S'], []).append(item)
+        months = {bucket.split('#')[0] for bucket in self.buckets}
+        self.counter = {'item_count': {'N': str(len(items))},
+                        **{f'expiry_month#{month}': {'N': str(int(time.time()))} for month in months}}
+        self.counts = {}
+        self.counts_lock = threading.Lock()
+
+    def count(self, name):
+        with self.counts_lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self):
+        with self.counts_lock:
+            return dict(self.counts)
+
+    def respond(self, operation, request):
+        if operation == 'DescribeTable':
+            return {'Table': {'TableName': TABLE_NAME, 'TableStatus': 'ACTIVE', 'ItemCount': len(self.items)}}
+        if operation == 'Scan':
+            total = request.get('TotalSegments', 1)
+            segment = request.get('Segment', 0)
+            items = self.items[segment::total]
+            if request.get('Select') == 'COUNT':
+                return {'Count': len(items), 'ScannedCount': len(items)}
+            return {'Items': items, 'Count': len(items), 'ScannedCount': len(items)}
+        if operation == 'Query' and request.get('IndexName') == 'ExpiryIndex':
+            values = request['ExpressionAttributeValues']
+            cutoff = int(values[':cutoff']['N'])
+            items = [item for item in self.buckets.get(values[':bucket']['S'], ())
+                     if int(item['expires_at']['N']) < cutoff]
+            return {'Items': items, 'Count': len(items), 'ScannedCount': len(items)}
+        if operation == 'Query':
+            cert_id = next(iter(request.get('ExpressionAttributeValues', {}).values()), {}).get('S')
+            items = [self.by_id[cert_id]] if cert_id in self.by_id else []
+            return {'Items': items, 'Count': len(items), 'ScannedCount': len(items)}
+        if operation == 'GetItem':
+            if request['Key']['certificate_id']['S'] == COUNTER_ID:
+                return {'Item': self.counter}
+            item = self.by_id.get(request['Key']['certificate_id']['S'])
+            return {'Item': item} if item else {}
+        # Writes (PutItem, UpdateItem, TransactWriteItems, ...) are acknowledged but not
+        # applied, so every run sees the same table
+        if operation == 'BatchWriteItem':
+            return {'UnprocessedItems': {}}
+        return {}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        # Count connections opened by the Lambda, not the harness's stats requests
+        if not getattr(self, 'counted', False):
+            self.counted = True
+            self.server.count('connections')
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        operation = self.headers.get('X-Amz-Target', '').rpartition('.')[2]
+        self.server.count(operation)
+        body = json.dumps(self.server.respond(operation, request)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-amz-json-1.0')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('x-amzn-RequestId', 'stub')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Counters for the child process, read between phases
+        body = json.dumps(self.server.snapshot()).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def child(lambda_path, stats_url, requests, cert_id):
+    """Runs in a fresh interpreter: import the handler, then time cold and warm requests"""
+    import importlib.util
+
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location('lambda_function', lambda_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    import_ms = (time.perf_counter() - start) * 1000
+
+    import io
+    import urllib.request
+
+    def counts():
+        with urllib.request.urlopen(stats_url) as response:
+            return json.loads(response.read())
+
+    def invoke(event):
+        # Handler logging goes to CloudWatch in Lambda; format it, but keep it off our stdout
+        stdout, sys.stdout = sys.stdout, io.StringIO()
+        try:
+            start = time.perf_counter()
+            response = module.lambda_handler(event, None)
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdout = stdout
+        if response['statusCode'] >= 300:
+            raise RuntimeError(f"{event['path']} returned {response['statusCode']}: {response['body']}")
+        return elapsed * 1000, (response.get('headers') or {}).get('X-Cache') == 'HIT'
+
+    def delta(before, after):
+        return {name: count - before.get(name, 0) for name, count in after.items() if count != before.get(name, 0)}
+
+    list_event = {'httpMethod': 'GET', 'path': '/certificates', 'queryStringParameters': None}
+    get_event = {'httpMethod': 'GET', 'path': f'/certificates/{cert_id}', 'pathParameters': {'id': cert_id}}
+    create_event = {'httpMethod': 'POST', 'path': '/certificates', 'body': json.dumps({'domain_name': 'new.example.com'})}
+    expiring_event = {'httpMethod': 'GET', 'path': '/certificates', 'queryStringParameters': {'expiring_within': '30d'}}
+
+    result = {'import_ms': import_ms}
+    before = counts()
+    result['cold_ms'], _ = invoke(list_event)
+    result['cold_calls'] = delta(before, counts())
+    for name, event in (('list', list_event), ('get', get_event), ('create', create_event),
+                        ('expiring', expiring_event)):
+        before = counts()
+        timings = [invoke(event) for _ in range(requests)]
+        result[f'warm_{name}_p50_ms'] = statistics.median(elapsed for elapsed, _ in timings)
+        result[f'warm_{name}_hit_rate'] = sum(hit for _, hit in timings) / requests
+        result[f'warm_{name}_calls'] = {op: n / requests for op, n in delta(before, counts()).items()}
+    print(json.dumps(result))
+
+
+def run_child(args, stub):
+    env = dict(os.environ,
+               DYNAMODB_ENDPOINT_URL=f'http://127.0.0.1:{stub.server_port}',
+               CERTIFICATES_TABLE=TABLE_NAME, EXPIRY_SHARDS=str(EXPIRY_SHARDS),
+               AWS_ACCESS_KEY_ID='stub', AWS_SECRET_ACCESS_KEY='stub', AWS_DEFAULT_REGION='us-east-1',
+               PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.environ.get('PYTHONPATH')])))
+    command = [sys.executable, os.path.abspath(__file__), '--child', args.lambda_path,
+               f'http://127.0.0.1:{stub.server_port}/stats', str(args.requests), 'cert-000000']
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def format_calls(calls):
+    return ', '.join(f'{op} {n:g}' for op, n in sorted(calls.items())) or '-'
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        lambda_path, stats_url, requests, cert_id = sys.argv[2:6]
+        child(lambda_path, stats_url, int(requests), cert_id)
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lambda-path', default=os.path.join(HERE, 'lambda.py'))
+    parser.add_argument('--items', type=int, default=10, help='certificates in the stub table')
+    parser.add_argument('--requests', type=int, default=50, help='warm requests per kind')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters (cold starts)')
+    args = parser.parse_args()
+    args.lambda_path = os.path.abspath(args.lambda_path)
+
+    stub = StubDynamoDB(make_items(args.items))
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    try:
+        runs = [run_child(args, stub) for _ in range(args.runs)]
+    finally:
+        stub.shutdown()
+
+    def median(key):
+        return statistics.median(run[key] for run in runs)
+
+    print(f'{args.lambda_path} (median of {args.runs} cold starts, {args.items} items)')
+    print(f"  import            {median('import_ms'):>8.1f} ms")
+    print(f"  cold list         {median('cold_ms'):>8.1f} ms   calls: {format_calls(runs[-1]['cold_calls'])}")
+    for name in ('list', 'get', 'create', 'expiring'):
+        hit_rate = median(f'warm_{name}_hit_rate')
+        print(f"  warm {name:<8} p50 {median(f'warm_{name}_p50_ms'):>8.2f} ms   "
+              f"calls/request: {format_calls(runs[-1][f'warm_{name}_calls'])}"
+              + (f'   X-Cache hits: {hit_rate:.0%}' if hit_rate else ''))
+
+
+if __name__ == '__main__':
+    main()
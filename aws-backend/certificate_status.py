@@ -0,0 +1 @@
+../backend/models/certificate_status.py
\ No newline at end of file
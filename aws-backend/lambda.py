@@ -1,19 +1,132 @@
+import io
 import json
-import boto3
+import base64
+import re
 import uuid
+import zlib
 from datetime import datetime, timedelta, timezone
-from boto3.dynamodb.conditions import Key
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal # Import Decimal type
+from records import RECORD_FORMATS, detect_format, iter_records
+from rotation_policy import parse_rotation_selector, selector_matches
+from certificate_status import DEFAULT_WARNING_DAYS, evaluate_statuses, now_epoch, parse_timestamp, status_for, to_epoch_array
 
-# Initialize DynamoDB client
-dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('CERTIFICATES_TABLE', 'Certificates')
-table = dynamodb.Table(table_name)
+
+# Parallel Segment/TotalSegments scans used to read the whole table
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', 4))
+
+# HTTP connections kept open to DynamoDB; enough for every scan segment at once
+DYNAMODB_MAX_CONNECTIONS = int(os.environ.get('DYNAMODB_MAX_CONNECTIONS', max(10, SCAN_SEGMENTS * 2)))
+
+# Largest segment count accepted in an order=scan cursor (cursors keep the count
+# they were issued with, so SCAN_SEGMENTS can change between requests)
+MAX_CURSOR_SEGMENTS = max(SCAN_SEGMENTS, 64)
+
+# DynamoDB resource and table, created on first use and reused by warm invocations.
+# boto3 is imported there too, so requests that never reach DynamoDB (preflight,
+# validation errors) don't pay for it.
+dynamodb = None
+table = None
+_table_lock = threading.Lock()
+
+def get_table():
+    """The Certificates table, creating the DynamoDB resource on first call"""
+    global dynamodb, table
+    if table is not None:
+        return table
+    # Scan segments may reach here from several threads; boto3 sessions aren't thread-safe
+    with _table_lock:
+        if table is not None:
+            return table
+        import boto3
+        from botocore.config import Config
+        config = Config(
+            # One pooled keep-alive connection per concurrent request instead of a new TLS handshake
+            max_pool_connections=DYNAMODB_MAX_CONNECTIONS,
+            tcp_keepalive=True,
+            connect_timeout=float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', 2)),
+            read_timeout=float(os.environ.get('DYNAMODB_READ_TIMEOUT', 10)),
+            retries={'mode': 'standard', 'max_attempts': 3}
+        )
+        # DYNAMODB_ENDPOINT_URL points it at DynamoDB Local or moto for testing
+        dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL') or None,
+                                  config=config)
+        table = dynamodb.Table(table_name)
+        return table
+
+# Orders accepted by GET /certificates?order=: expiry (sorted, reads the whole table) or
+# scan (table order, one page per segment per call, resumed with next_cursor)
+LIST_ORDERS = ('expiry', 'scan')
 
 # Define the maximum number of certificates allowed in the table
 MAX_CERTIFICATES = 10 
 
+# Partition key of every certificate the API creates (there are no per-user partitions yet)
+DEFAULT_USER_ID = 'default'
+
+# Certificates kept by the warm container's read-through cache for GET /certificates/{id}
+# (0 disables it), and how many seconds an entry is served before it's read again.
+# Writes made by this container invalidate entries at once; the TTL bounds how long
+# other containers' writes and TTL deletions go unnoticed.
+CERTIFICATE_CACHE_SIZE = int(os.environ.get('CERTIFICATE_CACHE_SIZE', 1024))
+CERTIFICATE_CACHE_TTL = float(os.environ.get('CERTIFICATE_CACHE_TTL', 30))
+
+# Item holding the number of certificates in the table. It has a partition of its own,
+# which scans filter out and certificate lookups ignore.
+COUNTER_KEY = {'user_id': '#counters', 'certificate_id': '#certificates'}
+
+# The table's key attributes (HASH, RANGE), both strings
+TABLE_KEY_ATTRIBUTES = ('user_id', 'certificate_id')
+
+# Expiry index for GET /certificates?expiring_within=: every certificate with a
+# parseable valid_until carries `expires_at` (epoch seconds) and `expiry_bucket`
+# ("<YYYY-MM>#<shard>", the expiry month plus a hash shard of the ID, so one busy
+# month doesn't all land on one partition). The GSI is
+#   ExpiryIndex: HASH expiry_bucket (S), RANGE expires_at (N), projection ALL
+# and the counter item records which months have certificates, so a query knows
+# which buckets to read: one `expiry_month#<YYYY-MM>` attribute per month, holding
+# the epoch of the last write that put a certificate in it.
+EXPIRY_INDEX = os.environ.get('EXPIRY_INDEX', 'ExpiryIndex')
+EXPIRY_SHARDS = int(os.environ.get('EXPIRY_SHARDS', 4))
+EXPIRY_MONTH_PREFIX = 'expiry_month#'
+
+# A month whose buckets all come back empty is dropped from the counter item once
+# its last write is this many seconds old (well past the index's propagation delay)
+EXPIRY_MONTH_GRACE = int(os.environ.get('EXPIRY_MONTH_GRACE', 600))
+
+# Largest `expiring_within` window in days
+MAX_EXPIRING_WITHIN_DAYS = 36500
+
+# Slots reserved on the counter at a time during a bulk import (one BatchWriteItem)
+IMPORT_RESERVE_SIZE = 25
+
+# BatchWriteItem calls per import group before items DynamoDB keeps leaving
+# unprocessed (throttling) are reported as failed rows
+BATCH_WRITE_ATTEMPTS = 5
+
+# Certificates expiring within this many days are reported as 'warning'
+STATUS_WARNING_DAYS = int(os.environ.get('STATUS_WARNING_DAYS', DEFAULT_WARNING_DAYS))
+
+# Number of rows read between progress log lines during a bulk import
+BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 500))
+
+# Certificates rotated per progress batch by POST /certificates/rotate-batch; each
+# rotation is its own transaction and a batch runs them concurrently
+ROTATE_BATCH_SIZE = int(os.environ.get('ROTATE_BATCH_SIZE', 100))
+
+# Upper bound for the `limit` query parameter on GET /certificates
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 1000))
+
+# Fields that can be requested through the `fields` projection parameter
+CERTIFICATE_FIELDS = ('user_id', 'certificate_id', 'domain_name', 'common_name', 'issuer',
+                      'valid_from', 'valid_until', 'status', 'created_at', 'updated_at',
+                      'metadata', 'ttl_timestamp', 'expires_at')
+
 # Helper function to handle Decimal types for JSON serialization
 def decimal_default_encoder(obj):
     if isinstance(obj, Decimal):
@@ -31,7 +144,8 @@ def get_headers():
         'Content-Type': 'application/json',
         'Access-Control-Allow-Origin': '*', # Allow all origins for development
         'Access-Control-Allow-Methods': 'GET,POST,DELETE,OPTIONS', # Allowed HTTP methods
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token' # Allowed headers for preflight
+        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token', # Allowed headers for preflight
+        'Access-Control-Expose-Headers': 'X-Cache' # Lets browser clients read cache hits
     }
 
 def error_response(status_code, message):
@@ -42,7 +156,7 @@ def error_response(status_code, message):
         'body': json.dumps({'error': message})
     }
 
-def success_response(status_code, data=None, message=None):
+def success_response(status_code, data=None, message=None, **extra):
     """Helper function to create consistent success responses"""
     body = {}
     if data is not None:
@@ -50,6 +164,8 @@ def success_response(status_code, data=None, message=None):
         body['data'] = data
     if message:
         body['message'] = message
+    # Extra top-level fields such as `next_cursor` for paginated listings
+    body.update(extra)
     
     # Apply custom encoder for all JSON dumping
     # This ensures any Decimal values in the response data are handled
@@ -59,20 +175,47 @@ def success_response(status_code, data=None, message=None):
         'body': json.dumps(body, default=decimal_default_encoder) if body else None
     }
 
+def handle_stream_records(records):
+    """
+    Keep the counter item in step with TTL expiry. The function subscribes to the
+    table's stream; deletions made by DynamoDB's TTL process are REMOVE records from
+    the dynamodb.amazonaws.com service principal, and the API's own deletes already
+    decremented the counter in their transaction.
+    """
+    expired = 0
+    for record in records:
+        identity = record.get('userIdentity') or {}
+        keys = record.get('dynamodb', {}).get('Keys', {})
+        if record.get('eventName') == 'REMOVE' and 'certificate_id' in keys:
+            certificate_cache.invalidate(keys['certificate_id'].get('S'))
+        if (record.get('eventName') == 'REMOVE' and identity.get('type') == 'Service'
+                and identity.get('principalId') == 'dynamodb.amazonaws.com'
+                and keys.get('user_id', {}).get('S') != COUNTER_KEY['user_id']):
+            expired += 1
+    if expired:
+        if not release_certificate_slots(expired):
+            # No counter yet, or it was seeded after these items expired
+            print(f"Counter not decremented for {expired} expired certificates")
+        print(f"Counted {expired} certificates removed by TTL")
+    return {'expired': expired}
+
 def lambda_handler(event, context):
     """
     Main Lambda handler that routes requests to appropriate functions
     based on HTTP method and path, implementing RESTful patterns.
     """
-    print("Received event:", json.dumps(event, indent=2))
+    # DynamoDB Streams invocations (TTL expiry) rather than API Gateway requests
+    if 'Records' in event:
+        return handle_stream_records(event['Records'])
+
+    http_method = event.get('httpMethod')
+    path = event.get('path', '')
+    print(f"Received {http_method} {path}")
     
     # Handle preflight OPTIONS request for CORS
-    if event.get('httpMethod') == 'OPTIONS':
+    if http_method == 'OPTIONS':
         return success_response(200, {})
     
-    http_method = event.get('httpMethod')
-    path = event.get('path', '')
-    
     try:
         # GET operations: Retrieve all certificates or a single certificate by ID (path parameter)
         if http_method == 'GET':
@@ -85,7 +228,7 @@ def lambda_handler(event, context):
             # Check for base path /certificates to get all
             elif path == '/certificates':
                 print("Routing GET request for all certificates.")
-                return get_all_certificates()
+                return get_all_certificates(event.get('queryStringParameters') or {})
             else:
                 return error_response(400, 'Invalid GET request path or missing ID for single retrieval.')
             
@@ -100,6 +243,25 @@ def lambda_handler(event, context):
                 except json.JSONDecodeError:
                     return error_response(400, 'Invalid JSON in request body')
                 return create_certificate(body)
+            elif path == '/certificates:bulk':
+                print("Routing POST request to bulk import certificates.")
+                if not event.get('body'):
+                    return error_response(400, 'Request body is required')
+                headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+                params = event.get('queryStringParameters') or {}
+                record_format = detect_format(headers.get('content-type'), params.get('format'))
+                if record_format is None:
+                    return error_response(415, f'Unsupported format, expected one of: {", ".join(RECORD_FORMATS)}')
+                body = event['body']
+                body = base64.b64decode(body) if event.get('isBase64Encoded') else body.encode('utf-8')
+                return bulk_import_certificates(body, record_format)
+            elif path == '/certificates/rotate-batch':
+                print("Routing POST request to rotate certificates in batches.")
+                try:
+                    body = json.loads(event.get('body') or 'null')
+                except json.JSONDecodeError:
+                    return error_response(400, 'Invalid JSON in request body')
+                return rotate_certificates_batch(body)
             elif path.startswith('/certificates/') and path.endswith('/rotate'):
                 print("Routing POST request to rotate a certificate.")
                 # Extract certificate ID from path (e.g., /certificates/123/rotate)
@@ -128,141 +290,671 @@ def lambda_handler(event, context):
         # Return a generic internal server error for unexpected exceptions
         return error_response(500, 'Internal server error')
 
-def get_all_certificates():
-    """Retrieve all certificates from DynamoDB"""
+def expiry_sort_key(item):
+    """Sort key matching the Flask store: (group, expires_at, id), undated/invalid last"""
+    expires_at = parse_timestamp(item.get('valid_until'))
+    if expires_at is None:
+        return (1, 0, item['certificate_id'])
+    return (0, expires_at, item['certificate_id'])
+
+def encode_cursor(key):
+    """Encode a sort key as an opaque URL-safe cursor"""
+    raw = json.dumps(list(key), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
     try:
-        print("1. Starting get_all_certificates function")
-        print(f"2. Table name: {table_name}")
-        
-        # Check if table exists (optional, mostly for initial setup/debugging)
+        padded = token + '=' * (-len(token) % 4)
+        group, expires_at, cert_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {token}') from e
+    if group not in (0, 1) or not isinstance(expires_at, int) or not isinstance(cert_id, str):
+        raise ValueError(f'Invalid cursor: {token}')
+    return (group, expires_at, cert_id)
+
+def projection_kwargs(fields):
+    """Scan arguments reading only `fields` plus what ordering and status need"""
+    if fields is None:
+        return {}
+    attributes = set(fields) | {'certificate_id', 'valid_from', 'valid_until'}
+    names = {f'#f{i}': name for i, name in enumerate(sorted(attributes))}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+def without_counter(scan_kwargs):
+    """Filter arguments that keep the counter item out of a scan"""
+    return {
+        'FilterExpression': 'user_id <> :counter_partition',
+        'ExpressionAttributeValues': dict(scan_kwargs.get('ExpressionAttributeValues', {}),
+                                          **{':counter_partition': COUNTER_KEY['user_id']})
+    }
+
+def scan_segment(segment, total_segments, scan_kwargs, start_key=None, max_pages=None):
+    """
+    Read one scan segment page by page, following LastEvaluatedKey. Returns
+    (items, last_key); last_key is None once the segment is exhausted, otherwise
+    the key to resume from after `max_pages` pages.
+    """
+    # Table resources aren't thread-safe but clients are; the resource's client still
+    # converts items and keys to and from plain Python values
+    client = get_table().meta.client
+    kwargs = dict(scan_kwargs, TableName=table_name, **without_counter(scan_kwargs))
+    if total_segments > 1:
+        kwargs.update(Segment=segment, TotalSegments=total_segments)
+    items = []
+    pages = 0
+    while True:
+        if start_key is not None:
+            kwargs['ExclusiveStartKey'] = start_key
+        response = client.scan(**kwargs)
+        items.extend(response.get('Items', []))
+        start_key = response.get('LastEvaluatedKey')
+        pages += 1
+        if start_key is None or (max_pages is not None and pages >= max_pages):
+            return items, start_key
+
+def parallel_scan(scan_kwargs=None, total_segments=SCAN_SEGMENTS, pending=None, max_pages=None):
+    """
+    Scan the table as `total_segments` Segment/TotalSegments scans on a thread pool.
+    `pending` maps unfinished segments to the key to resume from (None to start);
+    by default every segment starts from the beginning. Returns (items, pending)
+    with the segments that still have pages left after `max_pages` each.
+    """
+    scan_kwargs = scan_kwargs or {}
+    if pending is None:
+        pending = {segment: None for segment in range(total_segments)}
+    if not pending:
+        return [], {}
+    with ThreadPoolExecutor(max_workers=min(len(pending), DYNAMODB_MAX_CONNECTIONS)) as executor:
+        futures = {
+            segment: executor.submit(scan_segment, segment, total_segments, scan_kwargs, start_key, max_pages)
+            for segment, start_key in sorted(pending.items())
+        }
+        items = []
+        remaining = {}
+        for segment, future in futures.items():
+            segment_items, last_key = future.result()
+            items.extend(segment_items)
+            if last_key is not None:
+                remaining[segment] = last_key
+    return items, remaining
+
+def encode_scan_cursor(total_segments, pending):
+    """Continuation token for an order=scan listing: the segment count and each unfinished segment's key"""
+    raw = json.dumps({'segments': total_segments, 'pending': sorted(pending.items())}, separators=(',', ':'),
+                     default=decimal_default_encoder).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def is_table_key(key):
+    """Whether `key` is a usable ExclusiveStartKey for a scan of the table"""
+    return (isinstance(key, dict) and sorted(key) == sorted(TABLE_KEY_ATTRIBUTES)
+            and all(isinstance(value, str) and value for value in key.values()))
+
+def decode_scan_cursor(token):
+    """Decode a token from encode_scan_cursor into (total_segments, pending), raising ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor = json.loads(base64.urlsafe_b64decode(padded))
+        total_segments = cursor['segments']
+        pending = {segment: key for segment, key in cursor['pending']}
+    except (TypeError, ValueError, KeyError) as e:
+        raise ValueError(f'Invalid cursor: {token}') from e
+    # Start keys go to DynamoDB as they are, so anything but a table key would fail the scan
+    if (not isinstance(total_segments, int) or not 1 <= total_segments <= MAX_CURSOR_SEGMENTS or not pending
+            or any(not isinstance(segment, int) or not 0 <= segment < total_segments
+                   or not (key is None or is_table_key(key)) for segment, key in pending.items())):
+        raise ValueError(f'Invalid cursor: {token}')
+    return total_segments, pending
+
+def parse_page_params(params):
+    """Parse limit/cursor/fields query parameters, raising ValueError on bad input"""
+    limit = params.get('limit')
+    if limit is not None:
         try:
-            print("3. Checking if table exists...")
-            table.load() # This performs a describe_table call to verify existence and access
-            print("4. Table exists and is accessible")
-        except Exception as e:
-            print(f"5. Error accessing table: {str(e)}")
-            # If table load fails, it's a severe config error
-            return error_response(500, f'DynamoDB table error: {str(e)}')
-            
-        # Try to scan the table to get all items
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    cursor = params.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+
+    fields = params.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in CERTIFICATE_FIELDS]
+        if unknown:
+            raise ValueError(f'Unknown field(s): {", ".join(unknown)}')
+    else:
+        fields = None
+
+    return limit, after, fields
+
+def parse_expiring_within(value):
+    """Days in an `expiring_within` parameter such as "30d" or "30", raising ValueError on bad input"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*d?\s*', value or '')
+    if not match:
+        raise ValueError('expiring_within must be a number of days, e.g. 30d')
+    days = float(match.group(1))
+    if days > MAX_EXPIRING_WITHIN_DAYS:
+        raise ValueError(f'expiring_within must be at most {MAX_EXPIRING_WITHIN_DAYS} days')
+    return days
+
+def query_expiry_bucket(bucket, cutoff, query_kwargs):
+    """Every item in one expiry bucket expiring before `cutoff`, following LastEvaluatedKey"""
+    client = get_table().meta.client
+    names = dict(query_kwargs.get('ExpressionAttributeNames', {}), **{'#bucket': 'expiry_bucket',
+                                                                      '#expires': 'expires_at'})
+    kwargs = dict(query_kwargs, TableName=table_name, IndexName=EXPIRY_INDEX,
+                  KeyConditionExpression='#bucket = :bucket AND #expires < :cutoff',
+                  ExpressionAttributeNames=names,
+                  ExpressionAttributeValues={':bucket': bucket, ':cutoff': cutoff})
+    items = []
+    while True:
+        response = client.query(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def recorded_expiry_months():
+    """Month -> epoch of its last recorded write, from the counter item"""
+    counter = get_table().get_item(Key=COUNTER_KEY, ConsistentRead=True).get('Item') or {}
+    return {name[len(EXPIRY_MONTH_PREFIX):]: int(stamp) for name, stamp in counter.items()
+            if name.startswith(EXPIRY_MONTH_PREFIX)}
+
+def prune_expiry_months(stamps):
+    """
+    Drop months found empty from the counter item. Only months last written more
+    than EXPIRY_MONTH_GRACE seconds ago are dropped, so writes the index hasn't
+    shown yet aren't lost, and only while their stamp is unchanged, so a month
+    that a concurrent write has just used again stays.
+    """
+    client = get_table().meta.client
+    settled = now_epoch() - EXPIRY_MONTH_GRACE
+    for month, stamp in stamps.items():
+        if stamp > settled:
+            continue
         try:
-            print("6. Attempting to scan table...")
-            response = table.scan()
-            # This line caused the error when dumping 'response' directly due to Decimal objects.
-            # We will now handle Decimal serialization in the success_response helper.
-            print(f"7. Scan response received. Items count: {response.get('Count', 0)}") 
-            
-            items = response.get('Items', [])
-            print(f"8. Found {len(items)} items")
-            
-            # Recalculate status for each certificate based on current date
-            for item in items:
-                try:
-                    print(f"\nProcessing certificate: {item.get('certificate_id', 'unknown')}")
-                    print(f"Current status in DB: {item.get('status', 'not set')}")
-                    print(f"Valid from: {item.get('valid_from', 'not set')}")
-                    print(f"Valid until: {item.get('valid_until', 'not set')}")
-                    
-                    # Update the status based on current date and validity period
-                    item['status'] = calculate_status(
-                        item.get('valid_from', ''),
-                        item.get('valid_until', '')
-                    )
-                    print(f"New calculated status: {item['status']}")
-                except Exception as e:
-                    print(f"Error updating status for certificate {item.get('certificate_id', 'unknown')}: {str(e)}")
-                    item['status'] = 'active'  # Default to active if there's an error
-            
-            return success_response(200, items) # `items` will now be properly serialized by success_response
+            get_table().update_item(Key=COUNTER_KEY, UpdateExpression='REMOVE #month',
+                                    ConditionExpression='#month = :stamp',
+                                    ExpressionAttributeNames={'#month': EXPIRY_MONTH_PREFIX + month},
+                                    ExpressionAttributeValues={':stamp': stamp})
+            print(f"Pruned empty expiry month {month}")
+        except client.exceptions.ClientError as e:
+            # Written again meanwhile, or pruning failed; the month is read again next time
+            print(f"Expiry month {month} not pruned: {str(e)}")
+
+def query_expiring(cutoff, query_kwargs=None):
+    """
+    Certificates expiring before epoch `cutoff` (already expired ones included),
+    read from the expiry index: one range Query per shard of every recorded month
+    up to the cutoff's, run in parallel. Read cost follows the matches, not the table.
+    Months before the cutoff's that turn out empty (their certificates expired
+    through TTL or were deleted) are pruned, so they aren't queried again.
+    """
+    stamps = recorded_expiry_months()
+    last_month = datetime.fromtimestamp(cutoff, timezone.utc).strftime('%Y-%m')
+    months = sorted(month for month in stamps if month <= last_month)
+    buckets = [f'{month}#{shard}' for month in months for shard in range(EXPIRY_SHARDS)]
+    if not buckets:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(buckets), DYNAMODB_MAX_CONNECTIONS)) as executor:
+        pages = list(executor.map(lambda bucket: query_expiry_bucket(bucket, int(cutoff), query_kwargs or {}),
+                                  buckets))
+    # Earlier months are read in full, so no items means no certificates; the
+    # cutoff's own month was only read up to the cutoff
+    found = {month for month, page in zip((bucket.split('#', 1)[0] for bucket in buckets), pages) if page}
+    prune_expiry_months({month: stamps[month] for month in months if month < last_month and month not in found})
+    return [item for page in pages for item in page]
+
+def expiry_page(items, limit, after, fields):
+    """
+    Sort items by expiry, keep the page after the `after` cursor key, and set each
+    item's current status. Returns (items, next_cursor).
+    """
+    # Keyset pagination over the expiry order: skip everything up to the cursor
+    keyed = sorted(((expiry_sort_key(item), item) for item in items), key=lambda pair: pair[0])
+    if after is not None:
+        keyed = [pair for pair in keyed if pair[0] > after]
+    next_cursor = None
+    if limit is not None and len(keyed) > limit:
+        keyed = keyed[:limit]
+        next_cursor = encode_cursor(keyed[-1][0])
+    items = [item for _, item in keyed]
+    
+    # Recalculate every status in one vectorized pass against one clock reading,
+    # reusing the expiry epochs parsed for the sort keys
+    statuses = evaluate_statuses(
+        to_epoch_array([key[1] if key[0] == 0 else None for key, _ in keyed]),
+        now_epoch(),
+        STATUS_WARNING_DAYS
+    )
+    for item, status in zip(items, statuses):
+        item['status'] = status
+
+    if fields is not None:
+        items = [{field: item[field] for field in fields if field in item} for item in items]
+    return items, next_cursor
+
+def get_all_certificates(params=None):
+    """
+    Retrieve certificates from DynamoDB ordered by expiry date.
+    Supports the same `limit`, `cursor` and `fields` contract as the Flask API.
+    The whole table is read by a parallel, paginated scan; with `order=scan` pages
+    come in table order instead and each call reads only one page per segment,
+    for tables too large to read in one invocation. `expiring_within=30d` lists only
+    certificates expiring within that many days (expired ones included) by querying
+    the expiry index instead of scanning.
+    """
+    params = params or {}
+    order = params.get('order', 'expiry')
+    if order not in LIST_ORDERS:
+        return error_response(400, f'order must be one of: {", ".join(LIST_ORDERS)}')
+    try:
+        within = parse_expiring_within(params['expiring_within']) if 'expiring_within' in params else None
+        if within is not None and order == 'scan':
+            raise ValueError('expiring_within can only be used with order=expiry')
+        if order == 'scan':
+            # The cursor is a scan continuation token rather than an expiry position
+            limit, _, fields = parse_page_params({key: value for key, value in params.items() if key != 'cursor'})
+            cursor = params.get('cursor')
+            total_segments, pending = decode_scan_cursor(cursor) if cursor else (SCAN_SEGMENTS, None)
+        else:
+            limit, after, fields = parse_page_params(params)
+    except ValueError as e:
+        return error_response(400, str(e))
+
+    try:
+        # No DescribeTable check first: a missing table or missing access fails the
+        # scan itself, which is reported below, without an extra round trip per request
+        try:
+            print(f"Reading table {table_name}...")
+            # Only read the requested attributes plus what ordering and status need
+            scan_kwargs = projection_kwargs(fields)
+            if order == 'scan':
+                return get_certificates_scan_page(scan_kwargs, limit, fields, total_segments, pending)
+
+            if within is not None:
+                items = query_expiring(now_epoch() + within * 86400, scan_kwargs)
+                print(f"Queried expiry index, found {len(items)} items expiring within {within:g} days")
+            else:
+                # Every page of every segment, so nothing past the first 1 MB is dropped
+                items, _ = parallel_scan(scan_kwargs, SCAN_SEGMENTS)
+                print(f"Scanned {SCAN_SEGMENTS} segments, found {len(items)} items")
+
+            items, next_cursor = expiry_page(items, limit, after, fields)
+            return success_response(200, items, next_cursor=next_cursor) # `items` will now be properly serialized by success_response
             
         except Exception as e:
-            print(f"9. Error during scan: {str(e)}")
+            print(f"Error during scan: {str(e)}")
             return error_response(500, f'Scan failed: {str(e)}')
             
     except Exception as e:
-        print(f"10. Unexpected error in get_all_certificates: {str(e)}")
+        print(f"Unexpected error in get_all_certificates: {str(e)}")
         return error_response(500, 'Unexpected error occurred')
 
+def get_certificates_scan_page(scan_kwargs, limit, fields, total_segments, pending):
+    """
+    One order=scan page: a single scan page from each unfinished segment (at most
+    `limit` items in total) and the cursor to resume from, None once the table is done.
+    """
+    if pending is None:
+        pending = {segment: None for segment in range(total_segments)}
+    reading = dict(sorted(pending.items())[:limit] if limit is not None else pending.items())
+    carried = {segment: key for segment, key in pending.items() if segment not in reading}
+    if limit is not None:
+        # DynamoDB's Limit counts items per page, so split the page size across segments
+        scan_kwargs = dict(scan_kwargs, Limit=limit // len(reading))
+    items, remaining = parallel_scan(scan_kwargs, total_segments, reading, max_pages=1)
+    remaining.update(carried)
+    print(f"Scan page read {len(reading)} segments, found {len(items)} items, {len(remaining)} segments left")
+
+    statuses = evaluate_statuses(
+        to_epoch_array([parse_timestamp(item.get('valid_until')) for item in items]),
+        now_epoch(),
+        STATUS_WARNING_DAYS
+    )
+    for item, status in zip(items, statuses):
+        item['status'] = status
+    if fields is not None:
+        items = [{field: item[field] for field in fields if field in item} for item in items]
+
+    next_cursor = encode_scan_cursor(total_segments, remaining) if remaining else None
+    return success_response(200, items, next_cursor=next_cursor)
+
+def query_certificate_id(certificate_id):
+    """Items with this certificate_id, looked up through the CertificateIdIndex GSI"""
+    from boto3.dynamodb.conditions import Key
+    response = get_table().query(
+        IndexName='CertificateIdIndex',
+        KeyConditionExpression=Key('certificate_id').eq(certificate_id)
+    )
+    return [item for item in response.get('Items', []) if item['user_id'] != COUNTER_KEY['user_id']]
+
+class CertificateCache:
+    """
+    LRU cache of certificate items by ID for one warm container. Entries expire
+    `ttl` seconds after they were read; a Lambda container handles one invocation
+    at a time, so there is no locking.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, cert_id):
+        """The cached item for `cert_id`, or None if absent or expired"""
+        entry = self._entries.get(cert_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[cert_id]
+            return None
+        self._entries.move_to_end(cert_id)
+        return entry[1]
+
+    def put(self, cert_id, item):
+        if self.max_entries <= 0:
+            return
+        self._entries[cert_id] = (time.monotonic() + self.ttl, item)
+        self._entries.move_to_end(cert_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, cert_id):
+        self._entries.pop(cert_id, None)
+
+certificate_cache = CertificateCache(CERTIFICATE_CACHE_SIZE, CERTIFICATE_CACHE_TTL)
+
+def lookup_certificate(certificate_id, user_id=DEFAULT_USER_ID, consistent=False):
+    """
+    The certificate with this ID, or None. A direct get_item on the primary key
+    when `user_id` is known; the CertificateIdIndex GSI (eventually consistent)
+    only for IDs not under that user.
+    """
+    response = get_table().get_item(Key={'user_id': user_id, 'certificate_id': certificate_id},
+                                    ConsistentRead=consistent)
+    item = response.get('Item')
+    if item is not None:
+        return item
+    items = query_certificate_id(certificate_id)
+    return items[0] if items else None
+
 def get_certificate(certificate_id):
-    """Retrieve a single certificate by ID using the GSI"""
+    """
+    Retrieve a single certificate by ID, served from the warm container's cache when
+    possible. The X-Cache response header is HIT or MISS.
+    """
     try:
         print(f"Attempting to retrieve certificate with ID: {certificate_id}")
-        response = table.query(
-            IndexName='CertificateIdIndex', # Querying the GSI
-            KeyConditionExpression=Key('certificate_id').eq(certificate_id)
-        )
-        
-        items = response.get('Items', [])
-        if not items:
-            print(f"Certificate with ID {certificate_id} not found.")
-            return error_response(404, 'Certificate not found')
+        item = certificate_cache.get(certificate_id)
+        cache_status = 'HIT' if item is not None else 'MISS'
+        if item is None:
+            item = lookup_certificate(certificate_id)
+            if item is None:
+                print(f"Certificate with ID {certificate_id} not found.")
+                return error_response(404, 'Certificate not found')
+            certificate_cache.put(certificate_id, item)
             
-        # `items[0]` might contain Decimal, so we rely on success_response to handle it.
-        print(f"Found certificate: {json.dumps(items[0], default=decimal_default_encoder)}") 
-        return success_response(200, items[0])
+        # `item` might contain Decimal, so we rely on success_response to handle it.
+        response = success_response(200, item)
+        response['headers']['X-Cache'] = cache_status
+        return response
     except Exception as e:
         print(f"Error getting certificate {certificate_id}: {str(e)}")
         return error_response(500, 'Failed to retrieve certificate')
 
+def expiry_attributes(cert_id, valid_until):
+    """`expires_at` and `expiry_bucket` for the expiry index; empty when valid_until doesn't parse"""
+    expires_at = parse_timestamp(valid_until)
+    if expires_at is None:
+        return {}
+    month = datetime.fromtimestamp(expires_at, timezone.utc).strftime('%Y-%m')
+    shard = zlib.crc32(cert_id.encode('utf-8')) % EXPIRY_SHARDS
+    return {'expires_at': int(expires_at), 'expiry_bucket': f'{month}#{shard}'}
+
+def expiry_months(items):
+    """Expiry months of items that are in the expiry index"""
+    return {item['expiry_bucket'].split('#', 1)[0] for item in items if 'expiry_bucket' in item}
+
+def expiry_month_stamps(months):
+    """SET clauses, attribute names and values stamping `months` on the counter item with the current time"""
+    names = {f'#month{i}': EXPIRY_MONTH_PREFIX + month for i, month in enumerate(sorted(months))}
+    clauses = [f'{name} = :stamp' for name in names]
+    return clauses, names, ({':stamp': int(now_epoch())} if names else {})
+
+def record_expiry_months(months):
+    """Record months on the counter item for the expiry index (a no-op for none)"""
+    clauses, names, values = expiry_month_stamps(months)
+    if clauses:
+        get_table().update_item(Key=COUNTER_KEY, UpdateExpression='SET ' + ', '.join(clauses),
+                                ExpressionAttributeNames=names, ExpressionAttributeValues=values)
+
+def build_certificate_item(cert_data, now_utc):
+    """Build the DynamoDB item for a new certificate, including its 1 hour TTL"""
+    cert_id = str(uuid.uuid4())
+    
+    # --- START: TTL Logic - set ttl_timestamp for 1 hour from now ---
+    expiry_time = now_utc + timedelta(hours=1) # Set to 1 hour
+    # Convert to Unix epoch timestamp in seconds (integer)
+    ttl_timestamp_seconds = int(expiry_time.timestamp())
+    # --- END: TTL Logic ---
+
+    # Get the validity dates
+    valid_from = cert_data.get('valid_from', now_utc.isoformat())
+    valid_until = cert_data.get('valid_until', (now_utc + timedelta(days=365)).isoformat())
+    
+    # Calculate the status based on the provided dates
+    status = calculate_status(valid_from, valid_until)
+    
+    return {
+        'user_id': DEFAULT_USER_ID, # Using 'default' as partition key, adjust if users are implemented
+        'certificate_id': cert_id,
+        'domain_name': cert_data['domain_name'],
+        'common_name': cert_data.get('common_name', cert_data['domain_name']),
+        'issuer': cert_data.get('issuer', 'Let\'s Encrypt'),
+        'valid_from': valid_from,
+        'valid_until': valid_until,
+        'status': status,
+        'created_at': now_utc.isoformat(),
+        'updated_at': now_utc.isoformat(),
+        'metadata': cert_data.get('metadata', {}),
+        'ttl_timestamp': ttl_timestamp_seconds, # TTL attribute for automatic deletion
+        **expiry_attributes(cert_id, valid_until)
+    }
+
+def get_certificate_count():
+    """The counter item's value, or None if the counter hasn't been seeded yet"""
+    response = get_table().get_item(Key=COUNTER_KEY, ConsistentRead=True)
+    item = response.get('Item') or {}
+    return int(item['item_count']) if 'item_count' in item else None
+
+def count_certificates():
+    """Certificates in the table, from a COUNT scan that leaves out the counter item"""
+    client = get_table().meta.client
+    kwargs = dict(TableName=table_name, Select='COUNT', **without_counter({}))
+    count = 0
+    while True:
+        response = client.scan(**kwargs)
+        count += response.get('Count', 0)
+        if 'LastEvaluatedKey' not in response:
+            return count
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def seed_certificate_counter():
+    """
+    Create the counter item from a COUNT scan of the table. Runs once per table,
+    the first time a write finds no counter; a counter another invocation seeded
+    first is kept.
+    """
+    client = get_table().meta.client
+    count = count_certificates()
+    try:
+        # An update rather than a put keeps expiry months recorded before the seed
+        get_table().update_item(Key=COUNTER_KEY, UpdateExpression='SET item_count = :count',
+                                ConditionExpression='attribute_not_exists(item_count)',
+                                ExpressionAttributeValues={':count': count})
+        print(f"Seeded certificate counter with {count} certificates")
+    except client.exceptions.ConditionalCheckFailedException:
+        pass
+
+def recount_certificates(seen):
+    """
+    Correct a counter that reports the table full. TTL deletions only reach the
+    counter through the table's stream (handle_stream_records), so without that
+    mapping the counter never goes down; a full counter is re-checked with a COUNT
+    scan before a write is refused. The correction only applies while the counter
+    still reads `seen`, so concurrent creates and deletes aren't overwritten.
+    Returns the number of free slots.
+    """
+    client = get_table().meta.client
+    count = count_certificates()
+    if count < seen:
+        try:
+            get_table().update_item(Key=COUNTER_KEY, UpdateExpression='SET item_count = :count',
+                                    ConditionExpression='item_count = :seen',
+                                    ExpressionAttributeValues={':count': count, ':seen': seen})
+            print(f"Recounted certificates: counter corrected from {seen} to {count}")
+        except client.exceptions.ConditionalCheckFailedException:
+            # Changed under us; the caller's next attempt sees the new value
+            count = get_certificate_count() or 0
+    return max(MAX_CERTIFICATES - count, 0)
+
+def counter_increment(months):
+    """UpdateExpression, attribute names and values adding :n to the counter and recording `months`"""
+    clauses, names, values = expiry_month_stamps(months)
+    return 'SET ' + ', '.join(['#count = #count + :n'] + clauses), dict(names, **{'#count': 'item_count'}), values
+
+def reserve_certificate_slots(wanted, months=()):
+    """
+    Atomically add up to `wanted` to the counter without passing MAX_CERTIFICATES,
+    recording `months` for the expiry index in the same update.
+    Returns how many slots were reserved (0 when the table is full).
+    """
+    client = get_table().meta.client
+    requested = wanted
+    recounted = False
+    update_expression, names, values = counter_increment(months)
+    while requested > 0:
+        try:
+            get_table().update_item(
+                Key=COUNTER_KEY,
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames=names,
+                ConditionExpression='item_count <= :room',
+                ExpressionAttributeValues=dict(values, **{':n': requested, ':room': MAX_CERTIFICATES - requested})
+            )
+            return requested
+        except client.exceptions.ConditionalCheckFailedException:
+            # Either no counter yet or not enough room: look at which, then retry
+            count = get_certificate_count()
+            if count is None:
+                seed_certificate_counter()
+                continue
+            requested = min(wanted, MAX_CERTIFICATES - count)
+            if requested < wanted and not recounted:
+                # Short of room by the counter; make sure before refusing any
+                recounted = True
+                requested = min(wanted, recount_certificates(count))
+    return 0
+
+def release_certificate_slots(count):
+    """Take `count` off the counter for certificates that are gone or were never written; False if it couldn't"""
+    client = get_table().meta.client
+    try:
+        get_table().update_item(
+            Key=COUNTER_KEY,
+            UpdateExpression='SET item_count = item_count - :n',
+            ConditionExpression='item_count >= :n',
+            ExpressionAttributeValues={':n': count}
+        )
+        return True
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def write_reserved_items(items):
+    """
+    Put `items` (at most 25, already counted on the counter) with BatchWriteItem,
+    resubmitting the ones DynamoDB leaves unprocessed with exponential backoff.
+    Counter slots of items that end up unwritten are released, also when a call
+    raises. Returns the IDs of the unwritten certificates.
+    """
+    client = get_table().meta.client
+    remaining = [{'PutRequest': {'Item': item}} for item in items]
+    try:
+        for attempt in range(BATCH_WRITE_ATTEMPTS):
+            if attempt:
+                time.sleep(0.05 * 2 ** attempt)
+            response = client.batch_write_item(RequestItems={table_name: remaining})
+            remaining = response.get('UnprocessedItems', {}).get(table_name, [])
+            if not remaining:
+                break
+    finally:
+        if remaining and not release_certificate_slots(len(remaining)):
+            print(f"Counter not released for {len(remaining)} certificates that were not written")
+    return {request['PutRequest']['Item']['certificate_id'] for request in remaining}
+
 def create_certificate(cert_data):
     """
     Create a new certificate in DynamoDB.
     Enforces a maximum number of certificates and sets a TTL for 1 hour.
+    The certificate is written in one transaction with a conditional increment of
+    the counter item, so concurrent creates can't exceed the limit and the cost
+    doesn't depend on the size of the table. A counter at the limit is recounted
+    once (recount_certificates) before the create is refused.
     """
     try:
         if not isinstance(cert_data, dict) or not cert_data.get('domain_name'):
             return error_response(400, 'domain_name is required')
 
-        # --- START: Enforce 10-item limit ---
-        print("Checking current item count in table for creation limit...")
-        response = table.scan(
-            Select='COUNT' # Only retrieve the count, not the actual items
-        )
-        current_item_count = response.get('Count', 0)
-        print(f"Current item count: {current_item_count}")
-
-        if current_item_count >= MAX_CERTIFICATES:
-            print(f"Limit of {MAX_CERTIFICATES} certificates reached. Cannot create new certificate.")
-            return error_response(400, f'Maximum of {MAX_CERTIFICATES} certificates reached. Please delete an existing certificate before creating a new one.')
-        # --- END: Enforce 10-item limit ---
-
-        cert_id = str(uuid.uuid4())
-        now_utc = datetime.now(timezone.utc)
-        
-        # --- START: TTL Logic - set ttl_timestamp for 1 hour from now ---
-        expiry_time = now_utc + timedelta(hours=1) # Set to 1 hour
-        # Convert to Unix epoch timestamp in seconds (integer)
-        ttl_timestamp_seconds = int(expiry_time.timestamp())
-        print(f"New certificate will expire at (TTL): {expiry_time.isoformat()} ({ttl_timestamp_seconds} Unix epoch seconds)")
-        # --- END: TTL Logic ---
-
-        # Get the validity dates
-        valid_from = cert_data.get('valid_from', now_utc.isoformat())
-        valid_until = cert_data.get('valid_until', (now_utc + timedelta(days=365)).isoformat())
+        certificate = build_certificate_item(cert_data, datetime.now(timezone.utc))
+        cert_id = certificate['certificate_id']
+        print(f"Creating certificate with dates - valid_from: {certificate['valid_from']}, "
+              f"valid_until: {certificate['valid_until']}, status: {certificate['status']}, "
+              f"TTL: {certificate['ttl_timestamp']}")
         
-        # Log the dates being used for status calculation
-        print(f"Creating certificate with dates - valid_from: {valid_from}, valid_until: {valid_until}")
-        
-        # Calculate the status based on the provided dates
-        status = calculate_status(valid_from, valid_until)
-        print(f"Calculated status for new certificate: {status}")
-        
-        certificate = {
-            'user_id': 'default', # Using 'default' as partition key, adjust if users are implemented
-            'certificate_id': cert_id,
-            'domain_name': cert_data['domain_name'],
-            'common_name': cert_data.get('common_name', cert_data['domain_name']),
-            'issuer': cert_data.get('issuer', 'Let\'s Encrypt'),
-            'valid_from': valid_from,
-            'valid_until': valid_until,
-            'status': status,
-            'created_at': now_utc.isoformat(),
-            'updated_at': now_utc.isoformat(),
-            'metadata': cert_data.get('metadata', {}),
-            'ttl_timestamp': ttl_timestamp_seconds # TTL attribute for automatic deletion
-        }
-        
-        table.put_item(Item=certificate)
+        client = get_table().meta.client
+        update_expression, names, values = counter_increment(expiry_months([certificate]))
+        transaction = [
+            {'Update': {
+                'TableName': table_name,
+                'Key': COUNTER_KEY,
+                'UpdateExpression': update_expression,
+                'ExpressionAttributeNames': names,
+                # Also fails while the counter doesn't exist yet
+                'ConditionExpression': 'item_count < :max',
+                'ExpressionAttributeValues': dict(values, **{':n': 1, ':max': MAX_CERTIFICATES})
+            }},
+            {'Put': {
+                'TableName': table_name,
+                'Item': certificate,
+                'ConditionExpression': 'attribute_not_exists(certificate_id)'
+            }}
+        ]
+        seeded = recounted = False
+        while True:
+            try:
+                client.transact_write_items(TransactItems=transaction)
+                break
+            except client.exceptions.TransactionCanceledException as e:
+                reasons = e.response.get('CancellationReasons', [])
+                if not reasons or reasons[0].get('Code') != 'ConditionalCheckFailed':
+                    raise
+                count = get_certificate_count()
+                if count is None and not seeded:
+                    seeded = True
+                    seed_certificate_counter()
+                    continue
+                if count is not None and not recounted:
+                    # The counter says full; make sure before refusing
+                    recounted = True
+                    if recount_certificates(count) > 0:
+                        continue
+                print(f"Limit of {MAX_CERTIFICATES} certificates reached. Cannot create new certificate.")
+                return error_response(400, f'Maximum of {MAX_CERTIFICATES} certificates reached. Please delete an existing certificate before creating a new one.')
         print(f"Successfully created certificate: {cert_id}")
         return success_response(201, certificate) # Return 201 Created for new resources
         
@@ -270,70 +962,148 @@ def create_certificate(cert_data):
         print(f"Error creating certificate: {str(e)}")
         return error_response(500, 'Failed to create certificate')
 
+def bulk_import_certificates(body, record_format):
+    """
+    Import certificates from an NDJSON or CSV body with BatchWriteItem calls of up
+    to 25 items. Returns a per-row error report; rows beyond MAX_CERTIFICATES are
+    rejected. Valid rows are written IMPORT_RESERVE_SIZE at a time, each group only
+    after reserving that many slots on the counter item; slots of rows that could
+    not be written are released again (write_reserved_items).
+    """
+    try:
+        now_utc = datetime.now(timezone.utc)
+        received = imported = 0
+        errors = []
+        pending = []
+        full = False
+
+        def flush():
+            nonlocal imported, full
+            reserved = reserve_certificate_slots(len(pending), expiry_months(item for _, item in pending))
+            unwritten = write_reserved_items([item for _, item in pending[:reserved]]) if reserved else set()
+            for row_number, item in pending[:reserved]:
+                if item['certificate_id'] in unwritten:
+                    errors.append({'row': row_number, 'message': 'Write was throttled; retry this row'})
+            for row_number, item in pending[reserved:]:
+                errors.append({'row': row_number, 'message': f'Maximum of {MAX_CERTIFICATES} certificates reached'})
+            full = reserved < len(pending)
+            written = reserved - len(unwritten)
+            if (imported + written) // BULK_IMPORT_BATCH_SIZE > imported // BULK_IMPORT_BATCH_SIZE:
+                print(f"Bulk import progress: {imported + written} certificates written")
+            imported += written
+            pending.clear()
+
+        for row_number, cert_data, error in iter_records(io.BytesIO(body), record_format):
+            received += 1
+            if not error and not cert_data.get('domain_name'):
+                error = 'domain_name is required'
+            if not error and full:
+                error = f'Maximum of {MAX_CERTIFICATES} certificates reached'
+            if error:
+                errors.append({'row': row_number, 'message': error})
+                continue
+            pending.append((row_number, build_certificate_item(cert_data, now_utc)))
+            if len(pending) == IMPORT_RESERVE_SIZE:
+                flush()
+        if pending:
+            flush()
+
+        errors.sort(key=lambda error: error['row'])
+        print(f"Bulk import finished: {imported} imported, {len(errors)} failed")
+        return success_response(200, {
+            'received': received,
+            'imported': imported,
+            'failed': len(errors),
+            'errors': errors
+        })
+
+    except Exception as e:
+        print(f"Error during bulk import: {str(e)}")
+        return error_response(500, 'Failed to import certificates')
+
+def build_rotated_item(old_cert, now_utc):
+    """Build the replacement item for a rotated certificate: same subject, new ID and dates, 1 hour TTL"""
+    # --- START: TTL Logic for the new rotated certificate ---
+    expiry_time = now_utc + timedelta(hours=1) # Set to 1 hour
+    ttl_timestamp_seconds = int(expiry_time.timestamp())
+    # --- END: TTL Logic ---
+
+    # Calculate the new validity period (1 year from now)
+    new_valid_from = now_utc.isoformat()
+    new_valid_until = (now_utc + timedelta(days=365)).isoformat()
+    
+    cert_id = str(uuid.uuid4())
+    return {
+        'user_id': old_cert['user_id'],
+        'certificate_id': cert_id,
+        'domain_name': old_cert['domain_name'],
+        'common_name': old_cert.get('common_name', old_cert['domain_name']),
+        'issuer': old_cert.get('issuer', 'Let\'s Encrypt'),
+        'valid_from': new_valid_from,
+        'valid_until': new_valid_until,
+        'status': calculate_status(new_valid_from, new_valid_until),
+        'created_at': now_utc.isoformat(),
+        'updated_at': now_utc.isoformat(),
+        'metadata': old_cert.get('metadata', {}),
+        'ttl_timestamp': ttl_timestamp_seconds, # TTL attribute for rotated item
+        **expiry_attributes(cert_id, new_valid_until)
+    }
+
+def swap_certificate(old_cert, new_cert):
+    """
+    Replace `old_cert` with `new_cert` in one TransactWriteItems call. The delete is
+    conditioned on the old item still existing, so a certificate deleted or rotated
+    concurrently is never rotated twice; returns False when that condition fails.
+    The counter is untouched: one certificate goes, one comes.
+    """
+    client = get_table().meta.client
+    try:
+        client.transact_write_items(TransactItems=[
+            {'Delete': {
+                'TableName': table_name,
+                'Key': {'user_id': old_cert['user_id'], 'certificate_id': old_cert['certificate_id']},
+                'ConditionExpression': 'attribute_exists(certificate_id)'
+            }},
+            {'Put': {
+                'TableName': table_name,
+                'Item': new_cert,
+                'ConditionExpression': 'attribute_not_exists(certificate_id)'
+            }}
+        ])
+    except client.exceptions.TransactionCanceledException as e:
+        codes = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+        if codes[:1] == ['ConditionalCheckFailed']:
+            return False
+        raise
+    finally:
+        certificate_cache.invalidate(old_cert['certificate_id'])
+    return True
+
 def rotate_certificate(certificate_id):
     """
     Rotate a certificate by creating a new one with updated dates and deleting the old one.
     Also sets a TTL for the new certificate.
     """
     try:
-        # Get the existing certificate to copy its details
+        # Get the existing certificate to copy its details; read from the table
+        # rather than the cache so a stale copy is never rotated
         print(f"Attempting to rotate certificate with ID: {certificate_id}")
-        response = table.query(
-            IndexName='CertificateIdIndex',
-            KeyConditionExpression=Key('certificate_id').eq(certificate_id)
-        )
-        
-        items = response.get('Items', [])
-        if not items:
+        old_cert = lookup_certificate(certificate_id, consistent=True)
+        if old_cert is None:
             print(f"Certificate with ID {certificate_id} not found for rotation.")
             return error_response(404, 'Certificate not found')
             
-        old_cert = items[0]
-        now_utc = datetime.now(timezone.utc)
-        
-        # --- START: TTL Logic for the new rotated certificate ---
-        expiry_time = now_utc + timedelta(hours=1) # Set to 1 hour
-        ttl_timestamp_seconds = int(expiry_time.timestamp())
-        print(f"New rotated certificate will expire at (TTL): {expiry_time.isoformat()} ({ttl_timestamp_seconds} Unix epoch seconds)")
-        # --- END: TTL Logic ---
-
-        # Calculate the new validity period (1 year from now)
-        new_valid_from = now_utc.isoformat()
-        new_valid_until = (now_utc + timedelta(days=365)).isoformat()
-        
-        # Log the dates being used for status calculation
-        print(f"Rotating certificate with dates - valid_from: {new_valid_from}, valid_until: {new_valid_until}")
-        
-        # Calculate the status based on the new dates
-        status = calculate_status(new_valid_from, new_valid_until)
-        print(f"Calculated status for rotated certificate: {status}")
+        new_cert = build_rotated_item(old_cert, datetime.now(timezone.utc))
+        new_cert_id = new_cert['certificate_id']
+        print(f"Rotating certificate with dates - valid_from: {new_cert['valid_from']}, "
+              f"valid_until: {new_cert['valid_until']}, status: {new_cert['status']}, "
+              f"TTL: {new_cert['ttl_timestamp']}")
         
-        new_cert_id = str(uuid.uuid4())
-        new_cert = {
-            'user_id': old_cert['user_id'],
-            'certificate_id': new_cert_id,
-            'domain_name': old_cert['domain_name'],
-            'common_name': old_cert.get('common_name', old_cert['domain_name']),
-            'issuer': old_cert.get('issuer', 'Let\'s Encrypt'),
-            'valid_from': new_valid_from,
-            'valid_until': new_valid_until,
-            'status': status,
-            'created_at': now_utc.isoformat(),
-            'updated_at': now_utc.isoformat(),
-            'metadata': old_cert.get('metadata', {}),
-            'ttl_timestamp': ttl_timestamp_seconds # TTL attribute for rotated item
-        }
-        
-        # Use a transaction (batch_writer) for atomic put and delete
-        with table.batch_writer() as batch:
-            batch.put_item(Item=new_cert)
-            # Ensure the old item is deleted using its complete primary key
-            batch.delete_item(
-                Key={
-                    'user_id': old_cert['user_id'], 
-                    'certificate_id': certificate_id
-                }
-            )
+        record_expiry_months(expiry_months([new_cert]))
+        # Delete the old item and put the new one atomically
+        if not swap_certificate(old_cert, new_cert):
+            print(f"Certificate with ID {certificate_id} was deleted or rotated concurrently.")
+            return error_response(404, 'Certificate not found')
         
         print(f"Successfully rotated certificate. Old ID: {certificate_id}, New ID: {new_cert_id}")
         return success_response(200, new_cert, 'Certificate rotated successfully')
@@ -342,85 +1112,123 @@ def rotate_certificate(certificate_id):
         print(f"Error rotating certificate {certificate_id}: {str(e)}")
         return error_response(500, 'Failed to rotate certificate')
 
+def rotate_certificates_batch(body):
+    """
+    Rotate every certificate matching a selector (status, expiring_within_days, issuer,
+    domain_suffix; optional limit). Matches come from one parallel scan instead of a
+    GSI query per certificate. Each rotation is an atomic delete-and-put
+    (swap_certificate); a batch runs its rotations concurrently, and certificates
+    deleted or rotated since the scan are counted as skipped.
+    With "dry_run": true only the matches are returned.
+    """
+    try:
+        selector = parse_rotation_selector(body)
+    except ValueError as e:
+        return error_response(400, str(e))
+
+    try:
+        now = now_epoch()
+        matches = []
+        items, _ = parallel_scan({}, SCAN_SEGMENTS)
+        for item in items:
+            expires_at = parse_timestamp(item.get('valid_until'))
+            status = status_for(expires_at, now, STATUS_WARNING_DAYS)
+            names = (item.get('domain_name'), item.get('common_name'))
+            if selector_matches(selector, expires_at, status, item.get('issuer'), names, now):
+                item['status'] = status
+                matches.append(item)
+        # Same order as the listing, so `limit` takes the soonest-expiring matches
+        matches.sort(key=expiry_sort_key)
+        if selector['limit'] is not None:
+            matches = matches[:selector['limit']]
+        print(f"Rotate batch matched {len(matches)} certificates (dry run: {selector['dry_run']})")
+
+        if selector['dry_run']:
+            return success_response(200, {'dry_run': True, 'matched': len(matches), 'certificates': matches})
+
+        now_utc = datetime.now(timezone.utc)
+        batches = []
+        swaps = []
+        skipped = 0
+        for start in range(0, len(matches), ROTATE_BATCH_SIZE):
+            chunk = matches[start:start + ROTATE_BATCH_SIZE]
+            new_certs = [build_rotated_item(old_cert, now_utc) for old_cert in chunk]
+            record_expiry_months(expiry_months(new_certs))
+            with ThreadPoolExecutor(max_workers=min(len(chunk), DYNAMODB_MAX_CONNECTIONS)) as executor:
+                swapped = list(executor.map(swap_certificate, chunk, new_certs))
+            for old_cert, new_cert, done in zip(chunk, new_certs, swapped):
+                if done:
+                    swaps.append({'old_id': old_cert['certificate_id'], 'id': new_cert['certificate_id']})
+                else:
+                    skipped += 1
+            batches.append({'batch': len(batches) + 1, 'rotated': len(swaps), 'matched': len(matches)})
+            print(f"Rotate batch progress: {len(swaps)}/{len(matches)} certificates rotated")
+
+        return success_response(200, {
+            'dry_run': False,
+            'matched': len(matches),
+            'rotated': len(swaps),
+            'skipped': skipped,
+            'batches': batches,
+            'certificates': swaps
+        })
+
+    except Exception as e:
+        print(f"Error during batch rotation: {str(e)}")
+        return error_response(500, 'Failed to rotate certificates')
+
 def calculate_status(valid_from_str, valid_until_str):
     """
     Calculate the status of a certificate based on current date and validity period.
     Returns:
     - 'expired' if the current date is after valid_until
-    - 'warning' if the certificate expires within 90 days
-    - 'active' for all other valid certificates
+    - 'warning' if the certificate expires within STATUS_WARNING_DAYS (90 by default)
+    - 'active' for all other valid certificates, including unparseable dates
     """
-    try:
-        # Get current time in UTC with timezone
-        now = datetime.now(timezone.utc)
-        print(f"Current time (UTC): {now.isoformat()}")
-        print(f"Valid until string: {valid_until_str}")
-        
-        # Parse the valid_until date and ensure it's timezone-aware in UTC
-        valid_until_str = valid_until_str.replace('Z', '+00:00')  # Handle 'Z' timezone
-        try:
-            valid_until = datetime.fromisoformat(valid_until_str)
-            # If the datetime is naive (no timezone), assume it's in UTC
-            if valid_until.tzinfo is None:
-                valid_until = valid_until.replace(tzinfo=timezone.utc)
-                print(f"Assumed timezone-naive date as UTC: {valid_until.isoformat()}")
-            else:
-                print(f"Parsed timezone-aware date: {valid_until.isoformat()}")
-        except ValueError as e:
-            print(f"Error paarsing date {valid_until_str}: {str(e)}")
-            return 'active'  # Default to active on parse error
-            
-        # Ensure both datetimes are timezone-aware before comparison
-        if valid_until.tzinfo is None:
-            valid_until = valid_until.replace(tzinfo=timezone.utc)
-            
-        # Calculate days until expiry
-        time_until_expiry = valid_until - now
-        days_until_expiry = time_until_expiry.days
-        
-        # Log the comparison
-        print(f"Now (UTC): {now.isoformat()}")
-        print(f"Valid until: {valid_until.isoformat()}")
-        print(f"Days until expiry: {days_until_expiry}")
-        
-        # Check if certificate is expired
-        if now > valid_until:
-            print("Status: expired")
-            return 'expired'
-            
-        # Check if certificate is expiring soon (within 90 days)
-        if days_until_expiry <= 90:
-            print("Status: warning - expiring soon")
-            return 'warning'
-            
-        print("Status: active")
-        return 'active'
-    except Exception as e:
-        print(f"Error calculating status: {str(e)}")
-        return 'active'  # Default to active if there's an error
+    return status_for(parse_timestamp(valid_until_str), now_epoch(), STATUS_WARNING_DAYS)
 
 def delete_certificate(certificate_id):
     """Delete a certificate from DynamoDB"""
     try:
         print(f"Attempting to delete certificate with ID: {certificate_id}")
         # First get the certificate to verify it exists and get the user_id (Partition Key)
-        response = table.query(
-            IndexName='CertificateIdIndex', # Querying the GSI by certificate_id
-            KeyConditionExpression=Key('certificate_id').eq(certificate_id)
-        )
-        
-        items = response.get('Items', [])
-        if not items:
+        certificate_cache.invalidate(certificate_id)
+        item = lookup_certificate(certificate_id, consistent=True)
+        if item is None:
             print(f"Certificate with ID {certificate_id} not found for deletion.")
             return error_response(404, 'Certificate not found')
             
-        # Delete the certificate using its primary key (user_id and certificate_id)
-        table.delete_item(
-            Key={
-                'user_id': items[0]['user_id'], # Get user_id from the retrieved item
-                'certificate_id': certificate_id
-            }
-        )
+        # Delete the certificate using its primary key (user_id and certificate_id),
+        # decrementing the counter in the same transaction
+        key = {
+            'user_id': item['user_id'], # Get user_id from the retrieved item
+            'certificate_id': certificate_id
+        }
+        client = get_table().meta.client
+        try:
+            client.transact_write_items(TransactItems=[
+                {'Delete': {
+                    'TableName': table_name,
+                    'Key': key,
+                    'ConditionExpression': 'attribute_exists(certificate_id)'
+                }},
+                {'Update': {
+                    'TableName': table_name,
+                    'Key': COUNTER_KEY,
+                    'UpdateExpression': 'SET item_count = item_count - :one',
+                    'ConditionExpression': 'item_count >= :one',
+                    'ExpressionAttributeValues': {':one': 1}
+                }}
+            ])
+        except client.exceptions.TransactionCanceledException as e:
+            codes = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if codes[:1] == ['ConditionalCheckFailed']:
+                print(f"Certificate with ID {certificate_id} was deleted concurrently.")
+                return error_response(404, 'Certificate not found')
+            if codes[1:2] != ['ConditionalCheckFailed']:
+                raise
+            # No counter to keep in step yet; seeding it later counts what is left
+            get_table().delete_item(Key=key)
         
         print(f"Certificate with ID {certificate_id} deleted successfully.")
         # 204 No Content for successful deletion (as per REST best practices)
@@ -0,0 +1 @@
+../backend/utils/records.py
\ No newline at end of file
@@ -0,0 +1 @@
+../backend/utils/rotation_policy.py
\ No newline at end of file
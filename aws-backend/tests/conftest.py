@@ -0,0 +1,45 @@
+import importlib.util
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# lambda.py imports its helper modules (records, rotation_policy, ...) from its own directory
+sys.path.insert(0, HERE)
+
+
+@pytest.fixture
+def lambda_module(monkeypatch):
+    """lambda.py loaded against a moto DynamoDB table shaped like the deployed one"""
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.delenv('DYNAMODB_ENDPOINT_URL', raising=False)
+    with mock_aws():
+        boto3.resource('dynamodb').create_table(
+            TableName='Certificates',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'certificate_id', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'certificate_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'expiry_bucket', 'AttributeType': 'S'},
+                                  {'AttributeName': 'expires_at', 'AttributeType': 'N'}],
+            GlobalSecondaryIndexes=[
+                {'IndexName': 'CertificateIdIndex',
+                 'KeySchema': [{'AttributeName': 'certificate_id', 'KeyType': 'HASH'}],
+                 'Projection': {'ProjectionType': 'ALL'}},
+                {'IndexName': 'ExpiryIndex',
+                 'KeySchema': [{'AttributeName': 'expiry_bucket', 'KeyType': 'HASH'},
+                               {'AttributeName': 'expires_at', 'KeyType': 'RANGE'}],
+                 'Projection': {'ProjectionType': 'ALL'}},
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        spec = importlib.util.spec_from_file_location('certificates_lambda', os.path.join(HERE, 'lambda.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        yield module
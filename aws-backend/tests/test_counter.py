@@ -0,0 +1,102 @@
+"""The certificate counter item through creates, deletes, bulk imports and TTL expiry, against moto"""
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+
+@pytest.fixture(autouse=True)
+def room(lambda_module, monkeypatch):
+    # Room for an import of more than one reserved group
+    monkeypatch.setattr(lambda_module, 'MAX_CERTIFICATES', 100)
+
+
+def request(lambda_module, method, path, body=None, headers=None):
+    event = {'httpMethod': method, 'path': path, 'headers': headers or {}}
+    if body is not None:
+        event['body'] = body
+    response = lambda_module.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def create(lambda_module, name):
+    status, body = request(lambda_module, 'POST', '/certificates', json.dumps({'domain_name': name}))
+    assert status == 201
+    return body['data']
+
+
+def bulk_import(lambda_module, names):
+    body = '\n'.join(json.dumps({'domain_name': name}) for name in names)
+    return request(lambda_module, 'POST', '/certificates:bulk', body, {'Content-Type': 'application/x-ndjson'})
+
+
+def ttl_removal(cert_id):
+    """A DynamoDB stream record for a TTL deletion of `cert_id`"""
+    return {
+        'eventName': 'REMOVE',
+        'userIdentity': {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'},
+        'dynamodb': {'Keys': {'user_id': {'S': 'default'}, 'certificate_id': {'S': cert_id}}}
+    }
+
+
+def stored_ids(lambda_module):
+    items = lambda_module.get_table().scan()['Items']
+    return {item['certificate_id'] for item in items if item['user_id'] != lambda_module.COUNTER_KEY['user_id']}
+
+
+def test_counter_follows_creates_deletes_imports_and_ttl(lambda_module):
+    first = create(lambda_module, 'a.example.com')
+    create(lambda_module, 'b.example.com')
+    assert lambda_module.get_certificate_count() == 2
+
+    status, _ = request(lambda_module, 'DELETE', f"/certificates/{first['certificate_id']}")
+    assert status == 204
+    assert lambda_module.get_certificate_count() == 1
+
+    status, report = bulk_import(lambda_module, [f'host{i}.example.com' for i in range(30)])
+    assert (status, report['data']['imported']) == (200, 30)
+    assert lambda_module.get_certificate_count() == 31
+
+    # TTL deletes the item itself; the stream record is what reaches the counter
+    expired = sorted(stored_ids(lambda_module))[0]
+    lambda_module.get_table().delete_item(Key={'user_id': 'default', 'certificate_id': expired})
+    assert lambda_module.handle_stream_records([ttl_removal(expired)]) == {'expired': 1}
+    assert lambda_module.get_certificate_count() == 30 == len(stored_ids(lambda_module))
+
+
+def test_failed_import_write_releases_its_slots(lambda_module, monkeypatch):
+    create(lambda_module, 'a.example.com')
+    client = lambda_module.get_table().meta.client
+    writes = client.batch_write_item
+    calls = []
+
+    def fail_second_group(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2:
+            raise ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'boom'}}, 'BatchWriteItem')
+        return writes(**kwargs)
+
+    monkeypatch.setattr(client, 'batch_write_item', fail_second_group)
+    status, _ = bulk_import(lambda_module, [f'host{i}.example.com' for i in range(40)])
+    assert status == 500
+    # The first group of 25 was written before the failure; the second group's slots are released
+    assert lambda_module.get_certificate_count() == 26 == len(stored_ids(lambda_module))
+
+
+def test_unprocessed_import_items_are_reported_and_released(lambda_module, monkeypatch):
+    monkeypatch.setattr(lambda_module, 'BATCH_WRITE_ATTEMPTS', 2)
+    monkeypatch.setattr(lambda_module.time, 'sleep', lambda seconds: None)
+    client = lambda_module.get_table().meta.client
+    writes = client.batch_write_item
+
+    def leave_one_unprocessed(RequestItems):
+        requests = RequestItems[lambda_module.table_name]
+        response = writes(RequestItems={lambda_module.table_name: requests[1:]}) if len(requests) > 1 else {}
+        return dict(response, UnprocessedItems={lambda_module.table_name: requests[:1]})
+
+    monkeypatch.setattr(client, 'batch_write_item', leave_one_unprocessed)
+    status, body = bulk_import(lambda_module, [f'host{i}.example.com' for i in range(3)])
+    report = body['data']
+    assert (status, report['imported'], report['failed']) == (200, 2, 1)
+    assert report['errors'][0]['row'] == 1
+    assert lambda_module.get_certificate_count() == 2 == len(stored_ids(lambda_module))
@@ -0,0 +1,89 @@
+"""Listing by expiry window through the expiry index, against moto"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Days from now until each imported certificate expires, spread over several months
+EXPIRY_DAYS = [-40, -10, -1, 2, 5, 9, 14, 20, 29, 31, 44, 50, 75, 120, 400]
+
+
+@pytest.fixture
+def imported(lambda_module, monkeypatch):
+    """IDs by days to expiry, imported through the API so the counter records their months"""
+    monkeypatch.setattr(lambda_module, 'MAX_CERTIFICATES', 100)
+    now = datetime.now(timezone.utc)
+    rows = [{'domain_name': f'host{days}.example.com', 'valid_from': now.isoformat(),
+             'valid_until': (now + timedelta(days=days)).isoformat()} for days in EXPIRY_DAYS]
+    status, body = request(lambda_module, 'POST', '/certificates:bulk', '\n'.join(map(json.dumps, rows)),
+                           headers={'Content-Type': 'application/x-ndjson'})
+    assert (status, body['data']['imported']) == (200, len(rows))
+    items = lambda_module.get_table().scan()['Items']
+    by_name = {item['domain_name']: item['certificate_id'] for item in items if 'domain_name' in item}
+    return {days: by_name[f'host{days}.example.com'] for days in EXPIRY_DAYS}
+
+
+def request(lambda_module, method, path, body=None, params=None, headers=None):
+    event = {'httpMethod': method, 'path': path, 'queryStringParameters': params, 'headers': headers or {}}
+    if body is not None:
+        event['body'] = body
+    response = lambda_module.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def test_expiring_within_pages_through_every_match_in_expiry_order(lambda_module, imported):
+    ids = []
+    params = {'expiring_within': '45d', 'limit': '4'}
+    while True:
+        status, body = request(lambda_module, 'GET', '/certificates', params=params)
+        assert status == 200
+        assert len(body['data']) <= 4
+        ids.extend(item['certificate_id'] for item in body['data'])
+        if not body.get('next_cursor'):
+            break
+        params = dict(params, cursor=body['next_cursor'])
+    assert ids == [imported[days] for days in EXPIRY_DAYS if days < 45]
+
+
+def test_expiring_within_statuses_and_fields(lambda_module, imported):
+    status, body = request(lambda_module, 'GET', '/certificates',
+                           params={'expiring_within': '3', 'fields': 'certificate_id,status'})
+    assert status == 200
+    assert body['data'] == [{'certificate_id': imported[-40], 'status': 'expired'},
+                            {'certificate_id': imported[-10], 'status': 'expired'},
+                            {'certificate_id': imported[-1], 'status': 'expired'},
+                            {'certificate_id': imported[2], 'status': 'warning'}]
+
+
+@pytest.mark.parametrize('params', [
+    {'expiring_within': 'soon'},
+    {'expiring_within': '36501d'},
+    {'expiring_within': '30d', 'order': 'scan'},
+])
+def test_bad_expiring_within_is_rejected(lambda_module, params):
+    status, _ = request(lambda_module, 'GET', '/certificates', params=params)
+    assert status == 400
+
+
+def test_months_found_empty_are_pruned(lambda_module, imported, monkeypatch):
+    table = lambda_module.get_table()
+    oldest = table.get_item(Key={'user_id': 'default', 'certificate_id': imported[-40]})['Item']
+    oldest_month = oldest['expiry_bucket'].split('#', 1)[0]
+    months = lambda_module.recorded_expiry_months()
+    assert oldest_month in months
+    for days in (-40, -10, -1):
+        table.delete_item(Key={'user_id': 'default', 'certificate_id': imported[days]})
+
+    # Within the grace period an empty month is kept: the index may still be catching up
+    request(lambda_module, 'GET', '/certificates', params={'expiring_within': '45d'})
+    assert lambda_module.recorded_expiry_months() == months
+
+    monkeypatch.setattr(lambda_module, 'EXPIRY_MONTH_GRACE', -60)
+    status, body = request(lambda_module, 'GET', '/certificates', params={'expiring_within': '45d'})
+    assert status == 200
+    assert [item['certificate_id'] for item in body['data']] == [imported[days] for days in EXPIRY_DAYS
+                                                                 if 0 < days < 45]
+    live_months = {table.get_item(Key={'user_id': 'default', 'certificate_id': imported[days]})['Item']
+                   ['expiry_bucket'].split('#', 1)[0] for days in EXPIRY_DAYS if days > 0}
+    assert oldest_month not in live_months
+    assert set(lambda_module.recorded_expiry_months()) == live_months
@@ -0,0 +1,101 @@
+"""Listing the table through the parallel scan and order=scan cursors, against moto"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+CERTIFICATES = 60
+
+
+@pytest.fixture
+def stored_ids(lambda_module):
+    now = datetime.now(timezone.utc)
+    ids = []
+    with lambda_module.get_table().batch_writer() as batch:
+        for i in range(CERTIFICATES):
+            cert_id = f'cert-{i:03d}'
+            valid_until = (now + timedelta(days=(i * 37) % 400 - 30)).isoformat()
+            batch.put_item(Item={
+                'user_id': 'default', 'certificate_id': cert_id, 'domain_name': f'host{i}.example.com',
+                'common_name': f'host{i}.example.com', 'issuer': 'Test CA',
+                'valid_from': now.isoformat(), 'valid_until': valid_until,
+                **lambda_module.expiry_attributes(cert_id, valid_until)
+            })
+            ids.append(cert_id)
+        # The counter item must never show up in a listing
+        batch.put_item(Item=dict(lambda_module.COUNTER_KEY, item_count=CERTIFICATES))
+    return ids
+
+
+def list_certificates(lambda_module, params):
+    response = lambda_module.lambda_handler(
+        {'httpMethod': 'GET', 'path': '/certificates', 'queryStringParameters': params}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def encode(cursor):
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode().rstrip('=')
+
+
+def test_parallel_scan_reads_every_page_of_every_segment(lambda_module, stored_ids):
+    # A small Limit splits each segment into several pages
+    items, pending = lambda_module.parallel_scan({'Limit': 4}, 4)
+    ids = [item['certificate_id'] for item in items if item['user_id'] == 'default']
+    assert sorted(ids) == stored_ids
+    assert pending == {}
+
+
+def test_parallel_scan_resumes_from_pending_keys(lambda_module, stored_ids):
+    seen = []
+    items, pending = lambda_module.parallel_scan({'Limit': 4}, 4, max_pages=1)
+    seen.extend(items)
+    assert pending and all(lambda_module.is_table_key(key) for key in pending.values())
+    while pending:
+        items, pending = lambda_module.parallel_scan({'Limit': 4}, 4, pending, max_pages=1)
+        seen.extend(items)
+    ids = [item['certificate_id'] for item in seen if item['user_id'] == 'default']
+    assert sorted(ids) == stored_ids
+
+
+def test_expiry_listing_covers_the_whole_table(lambda_module, stored_ids):
+    status, body = list_certificates(lambda_module, None)
+    assert status == 200
+    assert sorted(item['certificate_id'] for item in body['data']) == stored_ids
+    expiries = [item['valid_until'] for item in body['data']]
+    assert expiries == sorted(expiries)
+
+
+def test_scan_order_cursor_round_trips(lambda_module, stored_ids):
+    seen = []
+    params = {'order': 'scan', 'limit': '7', 'fields': 'certificate_id,status'}
+    pages = 0
+    while True:
+        status, body = list_certificates(lambda_module, params)
+        assert status == 200, body
+        assert len(body['data']) <= 7
+        assert all(set(item) == {'certificate_id', 'status'} for item in body['data'])
+        seen.extend(item['certificate_id'] for item in body['data'])
+        pages += 1
+        if not body.get('next_cursor'):
+            break
+        params['cursor'] = body['next_cursor']
+    assert pages > 2
+    assert len(seen) == len(set(seen))
+    assert sorted(seen) == stored_ids
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    encode({'segments': 4, 'pending': []}),
+    encode({'segments': 4, 'pending': [[4, None]]}),
+    encode({'segments': 10 ** 6, 'pending': [[0, None]]}),
+    encode({'segments': 4, 'pending': [[0, {'certificate_id': 'cert-001'}]]}),
+    encode({'segments': 4, 'pending': [[0, {'user_id': 5, 'certificate_id': 'cert-001'}]]}),
+    encode({'segments': 4, 'pending': [[0, {'user_id': 'default', 'certificate_id': 'cert-001', 'x': '1'}]]}),
+    encode({'segments': 4, 'pending': [[0, ['default', 'cert-001']]]}),
+])
+def test_malformed_scan_cursors_are_rejected(lambda_module, stored_ids, cursor):
+    status, body = list_certificates(lambda_module, {'order': 'scan', 'cursor': cursor})
+    assert status == 400
+    assert 'Invalid cursor' in body['error']
@@ -24,12 +24,20 @@ def create_app(config_class=Config):
     })
 
     
-    # Initialize database connection here (we'll add this later)
+    # Initialize the certificate store selected by CERTIFICATE_STORE
+    from storage import create_store
+    from routes import main, configure_store, scan_jobs
+    configure_store(create_store(app.config), app.config['STATUS_WARNING_DAYS'])
+    scan_jobs.max_queued = app.config['SCAN_MAX_QUEUED_JOBS']
+    scan_jobs.history = app.config['SCAN_JOB_HISTORY']
     
     # Register blueprints (routes)
-    from routes import main
     app.register_blueprint(main)
     
+    # Per-route latency, status codes and in-flight requests, served at /metrics
+    from .metrics import init_metrics
+    init_metrics(app)
+    
     # Simple route to test if the app is working
     @app.route('/test')
     def test_route():
@@ -0,0 +1,94 @@
+"""
+Serve the Flask app over ASGI.
+
+Requests run through a2wsgi's WSGIMiddleware: the event loop owns the connections
+and each Flask dispatch runs on a bounded thread pool, so idle keep-alive clients
+cost a socket instead of a thread. Server-sent event streams (the change feed)
+can stay open indefinitely, so they don't get a pool thread for their lifetime:
+EventStreams pulls each chunk from the pool and waits for the next change on the
+event loop (ChangeFeed.wait_async), holding no thread in between.
+"""
+import asyncio
+import contextvars
+import io
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+
+from routes import EVENT_LOOP_WAITS, change_feed
+from storage import FeedWait
+
+
+def create_asgi_app(flask_app, workers=None):
+    """ASGI application for `flask_app`; `workers` bounds the request threads (default ASGI_WORKER_THREADS)"""
+    workers = workers or flask_app.config['ASGI_WORKER_THREADS']
+    return EventStreams(WSGIMiddleware(flask_app, workers=workers), flask_app)
+
+
+def wants_event_stream(scope):
+    return scope['type'] == 'http' and scope['method'] == 'GET' and any(
+        name == b'accept' and b'text/event-stream' in value for name, value in scope['headers'])
+
+
+class EventStreams:
+    """
+    ASGI middleware sending `Accept: text/event-stream` requests through the WSGI
+    app one chunk at a time, waiting out FeedWait markers on the event loop;
+    everything else goes to `app` (the WSGIMiddleware wrapping `wsgi_app`).
+    """
+
+    def __init__(self, app, wsgi_app):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.executor = app.executor
+
+    async def __call__(self, scope, receive, send):
+        if wants_event_stream(scope):
+            await self.stream(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def stream(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        # Every step runs in this request's context, so Flask's request context
+        # (stream_with_context) follows the stream from one pool thread to the next
+        context = contextvars.copy_context()
+
+        def run(function, *args):
+            return loop.run_in_executor(self.executor, context.run, function, *args)
+
+        environ = build_environ(scope, io.BytesIO())
+        environ[EVENT_LOOP_WAITS] = True
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                  for name, value in headers]
+
+        iterable = await run(self.wsgi_app, environ, start_response)
+        iterator = iter(iterable)
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            chunk = await run(next, iterator, None)
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            while chunk is not None and not disconnected.done():
+                if isinstance(chunk, FeedWait):
+                    waiting = asyncio.ensure_future(change_feed.wait_async(chunk.version, chunk.timeout))
+                    await asyncio.wait({waiting, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                    waiting.cancel()
+                elif chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await run(next, iterator, None)
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            disconnected.cancel()
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                # Runs the generator's cleanup and Flask's teardown off the loop
+                await run(close)
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
@@ -12,9 +12,62 @@ class Config:
     # Database configuration (we'll add DynamoDB settings later)
     DYNAMODB_REGION = os.environ.get('DYNAMODB_REGION')
     
+    # Certificate storage backend: 'memory' (default) or 'sql'
+    CERTIFICATE_STORE = os.environ.get('CERTIFICATE_STORE', 'memory')
+    
+    # Directory for the 'memory' store's write-ahead log and snapshots; unset keeps it memory-only
+    STORE_DATA_DIR = os.environ.get('STORE_DATA_DIR')
+    
+    # Log fsync policy: 'always' (every write), 'interval' (every STORE_FSYNC_INTERVAL seconds) or 'never'
+    STORE_FSYNC = os.environ.get('STORE_FSYNC', 'interval')
+    STORE_FSYNC_INTERVAL = float(os.environ.get('STORE_FSYNC_INTERVAL', 1.0))
+    
+    # Logged mutations between snapshots (each snapshot lets older log segments be deleted)
+    STORE_SNAPSHOT_EVERY = int(os.environ.get('STORE_SNAPSHOT_EVERY', 100_000))
+    
+    # SQLAlchemy settings used by the 'sql' store
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, '../certificates.db')
+    SQLALCHEMY_POOL_SIZE = int(os.environ.get('SQLALCHEMY_POOL_SIZE', 5))
+    SQLALCHEMY_MAX_OVERFLOW = int(os.environ.get('SQLALCHEMY_MAX_OVERFLOW', 10))
+    
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-123'
     JWT_ALGORITHM = 'HS256'
     
     # API Version
-    API_VERSION = 'v1'
\ No newline at end of file
+    API_VERSION = 'v1'
+    
+    # Upper bound for the `limit` query parameter on list endpoints
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 1000))
+    
+    # Certificates expiring within this many days are reported as 'warning'
+    STATUS_WARNING_DAYS = int(os.environ.get('STATUS_WARNING_DAYS', 90))
+    
+    # Number of rows validated and inserted together by the bulk import endpoint
+    BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 500))
+    
+    # Certificates swapped per store write by the rotate-batch endpoint
+    ROTATE_BATCH_SIZE = int(os.environ.get('ROTATE_BATCH_SIZE', 100))
+    
+    # Processes used to parse large PEM bundles (0 or 1 parses inline; unset uses every CPU)
+    CERTIFICATE_PARSE_WORKERS = int(os.environ['CERTIFICATE_PARSE_WORKERS']) if os.environ.get('CERTIFICATE_PARSE_WORKERS') else None
+    
+    # TLS scanner: handshakes in flight, per-attempt timeout (seconds), retries and targets per request
+    SCAN_CONCURRENCY = int(os.environ.get('SCAN_CONCURRENCY', 200))
+    SCAN_TIMEOUT = float(os.environ.get('SCAN_TIMEOUT', 5))
+    SCAN_RETRIES = int(os.environ.get('SCAN_RETRIES', 1))
+    SCAN_MAX_TARGETS = int(os.environ.get('SCAN_MAX_TARGETS', 5000))
+    
+    # Bearer token required by the scan endpoints; scanning is disabled while it is unset
+    SCAN_API_TOKEN = os.environ.get('SCAN_API_TOKEN')
+    
+    # Comma-separated hosts, '*.domain' wildcards and IP networks that may be scanned (empty allows nothing).
+    # Private and loopback addresses are only dialled when their network is listed.
+    SCAN_ALLOWED_TARGETS = os.environ.get('SCAN_ALLOWED_TARGETS', '')
+    
+    # Scan jobs waiting to run before new ones are refused, and finished jobs kept for polling
+    SCAN_MAX_QUEUED_JOBS = int(os.environ.get('SCAN_MAX_QUEUED_JOBS', 10))
+    SCAN_JOB_HISTORY = int(os.environ.get('SCAN_JOB_HISTORY', 100))
+    
+    # Threads running requests under the ASGI server (main.py); connections themselves cost no thread
+    ASGI_WORKER_THREADS = int(os.environ.get('ASGI_WORKER_THREADS', 32))
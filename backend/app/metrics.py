@@ -0,0 +1,44 @@
+import time
+
+from flask import g, request
+
+from utils.metrics import registry, request_duration, requests_in_flight, requests_total
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def init_metrics(app):
+    """Time every request and serve the collected metrics at /metrics in Prometheus text format"""
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        requests_in_flight.inc()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            # Label by route template so certificate IDs don't explode the series count
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            request_duration.observe((request.method, route), time.perf_counter() - started)
+            requests_total.inc((request.method, route, str(response.status_code)))
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        # Runs after streamed responses finish, so long-lived streams count as in flight.
+        # stream_with_context pushes the request context a second time, so teardown can
+        # run twice for one request; popping the marker decrements only once
+        if g.pop('request_started', None) is not None:
+            requests_in_flight.dec()
+
+    def store_size():
+        import routes
+        return len(routes.certificates_store)
+
+    registry.callback_gauge('certificates_stored', 'Certificates in the configured store.', store_size)
+
+    @app.route('/metrics')
+    def metrics():
+        return app.response_class(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
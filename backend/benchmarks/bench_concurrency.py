@@ -0,0 +1,148 @@
+"""
+Concurrency stress test for the in-memory certificate store: worker threads
+rotate, read and list certificates concurrently, with many rotations
+racing on the same IDs. Reports throughput per thread count and verifies that
+no certificate was lost or duplicated.
+
+Each thread count runs twice, with the store's 64 ID lock stripes and with a
+single stripe (one lock for every rotation), to show what striping buys. That
+only shows under I/O: a rotation's build step (issuing the new certificate) runs
+holding its ID's stripe, and by default waits `--build-ms` milliseconds there,
+releasing the GIL as real network I/O would. With --build-ms 0 the workload is
+pure CPU, so the GIL caps throughput whatever the locking.
+
+Run from the backend directory:
+    python -m benchmarks.bench_concurrency --count 2000 --ops 4000
+    python -m benchmarks.bench_concurrency --ops 20000 --build-ms 0
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from models.certificate import Certificate
+from storage import CertificateStore, sort_key
+
+
+def seed(store, count):
+    base = datetime.now(timezone.utc)
+    store.add_many(
+        Certificate(id=str(uuid.uuid4()), domain_name=f'host{i}.example.com', common_name=f'host{i}.example.com',
+                    issuer='DigiCert', valid_from=base.isoformat(),
+                    valid_until=(base + timedelta(days=i % 700)).isoformat(), fingerprint_sha256=f'{i:064x}')
+        for i in range(count)
+    )
+
+
+def rotated_copy(old):
+    return Certificate(id=str(uuid.uuid4()), domain_name=old.domain_name, common_name=old.common_name,
+                       issuer=old.issuer, valid_from=old.valid_from, valid_until=old.valid_until,
+                       fingerprint_sha256=old.fingerprint_sha256)
+
+
+def issuing(build_seconds):
+    """Rotation build step that first waits on simulated issuance I/O"""
+    if not build_seconds:
+        return rotated_copy
+
+    def build(old):
+        time.sleep(build_seconds)
+        return rotated_copy(old)
+    return build
+
+
+def worker(store, ops, hot_ids, results, index, start_barrier, build):
+    rng = random.Random(index)
+    rotated = missed = 0
+    start_barrier.wait()
+    for _ in range(ops):
+        roll = rng.random()
+        if roll < 0.5:
+            # Rotations target a small hot set so threads constantly race on the same IDs
+            slot = rng.randrange(len(hot_ids))
+            cert_id = hot_ids[slot]
+            try:
+                hot_ids[slot] = store.rotate(cert_id, build).id
+                rotated += 1
+            except KeyError:
+                missed += 1
+        elif roll < 0.9:
+            store.get(hot_ids[rng.randrange(len(hot_ids))])
+        else:
+            store.page(limit=50)
+    results[index] = (rotated, missed)
+
+
+def check_invariants(store, count):
+    """Every seeded domain must exist exactly once and the index must match the data"""
+    domains = Counter(certificate.domain_name for certificate in store.values())
+    problems = []
+    if len(store) != count:
+        problems.append(f'expected {count} certificates, found {len(store)}')
+    duplicated = [domain for domain, seen in domains.items() if seen > 1]
+    if duplicated:
+        problems.append(f'{len(duplicated)} duplicated domains')
+    if len(domains) != count:
+        problems.append(f'{count - len(domains)} lost domains')
+    if store._index != sorted(sort_key(certificate) for certificate in store.values()):
+        problems.append('expiry index out of sync')
+    return problems
+
+
+def run(threads, count, ops, stripes, build_seconds):
+    store = CertificateStore(stripes=stripes)
+    seed(store, count)
+    # Shared mutable list of IDs; workers overwrite slots with the IDs they rotate to
+    hot_ids = [certificate.id for certificate in list(store.values())[:32]]
+    results = [None] * threads
+    barrier = threading.Barrier(threads + 1)
+    build = issuing(build_seconds)
+    workers = [threading.Thread(target=worker, args=(store, ops // threads, hot_ids, results, i, barrier, build))
+               for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    rotated = sum(result[0] for result in results)
+    missed = sum(result[1] for result in results)
+    return (ops // threads) * threads / elapsed, rotated, missed, check_invariants(store, count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--ops', type=int, default=4000)
+    parser.add_argument('--threads', default='1,2,4,8,16')
+    parser.add_argument('--build-ms', type=float, default=2.0,
+                        help='simulated issuance I/O per rotation, waited out holding the stripe (0: CPU only)')
+    args = parser.parse_args()
+
+    if args.build_ms:
+        print(f'workload: I/O-bound - each rotation waits {args.build_ms:g} ms on simulated issuance '
+              f'while holding its ID lock (GIL released)')
+    else:
+        print('workload: CPU-bound - no I/O under the ID locks, so the GIL caps throughput for any locking')
+    print('mix: 50% rotations on 32 hot IDs, 40% reads, 10% pages; striped = 64 stripes, single = 1 stripe\n')
+
+    failed = False
+    print(f"{'threads':>7} {'striped ops/s':>14} {'single ops/s':>13} {'speedup':>8} {'rotated':>8} "
+          f"{'lost races':>10}  invariants")
+    for threads in (int(value) for value in args.threads.split(',')):
+        striped, rotated, missed, problems = run(threads, args.count, args.ops, 64, args.build_ms / 1000)
+        single, _, _, single_problems = run(threads, args.count, args.ops, 1, args.build_ms / 1000)
+        problems += single_problems
+        failed = failed or bool(problems)
+        print(f"{threads:>7} {striped:>14,.0f} {single:>13,.0f} {striped / single:>7.1f}x {rotated:>8} "
+              f"{missed:>10}  {'; '.join(problems) or 'ok'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Memory and throughput comparison between the slots-based Certificate model and
+the previous dict-backed implementation that re-parsed valid_until on every
+status access.
+
+Run from the backend directory:
+    python -m benchmarks.bench_model --count 100000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from models.certificate import Certificate, now_epoch
+
+
+class LegacyCertificate:
+    """The Certificate model as it was before __slots__ and pre-parsed expiry"""
+
+    def __init__(self, **kwargs):
+        self.id = kwargs.get('id')
+        self.domain_name = kwargs.get('domain_name')
+        self.common_name = kwargs.get('common_name')
+        self.issuer = kwargs.get('issuer')
+        self.valid_from = kwargs.get('valid_from')
+        self.valid_until = kwargs.get('valid_until')
+        self.fingerprint_sha256 = kwargs.get('fingerprint_sha256')
+
+    @property
+    def status(self):
+        if not self.valid_until:
+            return 'active'
+        try:
+            expiry_date = datetime.fromisoformat(self.valid_until.replace('Z', '+00:00'))
+            if expiry_date.tzinfo is None:
+                expiry_date = expiry_date.replace(tzinfo=timezone.utc)
+            today = datetime.now(timezone.utc)
+            warning_threshold = today + timedelta(days=90)
+            if expiry_date < today:
+                return 'expired'
+            elif expiry_date < warning_threshold:
+                return 'warning'
+            return 'active'
+        except (ValueError, AttributeError):
+            return 'active'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'domain_name': self.domain_name,
+            'common_name': self.common_name,
+            'issuer': self.issuer,
+            'valid_from': self.valid_from,
+            'valid_until': self.valid_until,
+            'status': self.status,
+            'fingerprint_sha256': self.fingerprint_sha256
+        }
+
+
+def make_rows(count, seed=1):
+    """Build constructor kwargs shared by both models so only the class differs"""
+    rng = random.Random(seed)
+    base = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        valid_until = base + timedelta(days=rng.randint(-200, 800), seconds=rng.randint(0, 86399))
+        rows.append({
+            'id': f'cert-{i:08d}',
+            'domain_name': f'host{i}.example.com',
+            'common_name': f'host{i}.example.com',
+            'issuer': rng.choice(("Let's Encrypt", 'DigiCert', 'Sectigo')),
+            'valid_from': base.isoformat(),
+            'valid_until': valid_until.isoformat(),
+            'fingerprint_sha256': f'{i:064x}',
+        })
+    return rows
+
+
+def measure(cls, rows):
+    # Memory is traced on a separate build because tracemalloc slows allocation down.
+    # Only the instances themselves are counted; the shared field strings are not.
+    gc.collect()
+    tracemalloc.start()
+    instances = [cls(**row) for row in rows]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del instances
+
+    gc.collect()
+    start = time.perf_counter()
+    instances = [cls(**row) for row in rows]
+    construct = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if cls is Certificate:
+        now = now_epoch()
+        for cert in instances:
+            cert.status_at(now)
+    else:
+        for cert in instances:
+            cert.status
+    status = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if cls is Certificate:
+        now = now_epoch()
+        for cert in instances:
+            cert.to_dict(now)
+    else:
+        for cert in instances:
+            cert.to_dict()
+    to_dict = time.perf_counter() - start
+    return {'construct_s': construct, 'memory_bytes': memory, 'status_s': status, 'to_dict_s': to_dict}
+
+
+def compare(legacy, slots, better, worse):
+    """Ratio of two costs, worded by which way it goes (e.g. '1.2x smaller' or '1.2x larger')"""
+    if slots <= legacy:
+        return f'{legacy / slots:.2f}x {better}'
+    return f'{slots / legacy:.2f}x {worse}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.count)
+    results = {'legacy': measure(LegacyCertificate, rows), 'slots': measure(Certificate, rows)}
+
+    print(f"{'model':<8} {'memory MiB':>11} {'construct s':>12} {'status s':>10} {'to_dict s':>10} {'status/s':>12}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['memory_bytes'] / 2**20:>11.1f} {r['construct_s']:>12.3f} "
+              f"{r['status_s']:>10.3f} {r['to_dict_s']:>10.3f} {args.count / r['status_s']:>12,.0f}")
+    legacy, slots = results['legacy'], results['slots']
+    print(f"slots vs legacy - memory: {compare(legacy['memory_bytes'], slots['memory_bytes'], 'smaller', 'larger')}, "
+          f"status: {compare(legacy['status_s'], slots['status_s'], 'faster', 'slower')}, "
+          f"to_dict: {compare(legacy['to_dict_s'], slots['to_dict_s'], 'faster', 'slower')}")
+
+
+if __name__ == '__main__':
+    main()
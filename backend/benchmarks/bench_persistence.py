@@ -0,0 +1,124 @@
+"""
+Benchmark the in-memory store's write-ahead log and snapshot recovery.
+
+Write throughput: single-certificate creates against a logged store, once per
+fsync mode. Startup: a snapshot of `--count` certificates plus `--tail` logged
+mutations after it, restored with open_store, which is all create_app waits for
+before serving (median of `--repeat` runs), with the snapshot read, object build
+and index load timed separately. The work deferred past startup - the status
+summary load create_app runs in the background, and the lookup structures built
+by the first query that needs them - is timed on its own.
+
+Run from the backend directory:
+    python -m benchmarks.bench_persistence --count 1000000
+    python -m benchmarks.bench_persistence --count 100000 --writes 50000 --modes interval never
+"""
+import argparse
+import gc
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_storage import make_certificates
+from models.certificate_status import now_epoch
+from storage import CertificateStore, StatusSummary, open_store
+from storage.snapshot import certificates_from_columns, read_snapshot, snapshot_path
+from storage.wal import FSYNC_MODES
+
+
+def write_throughput(mode, writes):
+    """Creates per second with every mutation logged under fsync `mode`"""
+    certificates = make_certificates(writes, seed=2)
+    with tempfile.TemporaryDirectory() as directory:
+        store, log = open_store(directory, fsync=mode, snapshot_every=10 ** 9)
+        start = time.perf_counter()
+        for certificate in certificates:
+            store.add(certificate)
+        elapsed = time.perf_counter() - start
+        log.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    return writes / elapsed, size / writes
+
+
+def prepare(directory, count, tail):
+    """Snapshot `count` certificates, then log `tail` mutations (creates and deletes) after it"""
+    certificates = make_certificates(count)
+    store, log = open_store(directory, fsync='never', snapshot_every=10 ** 9)
+    store.add_many(certificates)
+    log.snapshot()
+    for i, certificate in enumerate(make_certificates(tail, seed=3)):
+        if i % 4 == 3:
+            store.remove(certificates[i].id)
+        else:
+            store.add(certificate)
+    log.close()
+    return store.version, len(store)
+
+
+def timed(operation):
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = operation()
+        return time.perf_counter() - start, result
+    finally:
+        gc.enable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1_000_000, help='certificates in the snapshot')
+    parser.add_argument('--tail', type=int, default=10_000, help='logged mutations after the snapshot')
+    parser.add_argument('--writes', type=int, default=20_000, help='creates per fsync mode (a tenth for always)')
+    parser.add_argument('--modes', nargs='+', choices=FSYNC_MODES, default=list(FSYNC_MODES))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('write throughput')
+    for mode in args.modes:
+        writes = max(args.writes // 10, 1) if mode == 'always' else args.writes
+        rate, record_bytes = write_throughput(mode, writes)
+        print(f'  fsync={mode:<9} {rate:>10,.0f} writes/s  {record_bytes:,.0f} bytes/record  ({writes} writes)')
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f'\npreparing {args.count:,} certificates + {args.tail:,} logged mutations...')
+        version, expected = prepare(directory, args.count, args.tail)
+        snapshot = snapshot_path(directory, version - args.tail)
+        print(f'snapshot: {os.path.getsize(snapshot) / 1e6:,.1f} MB')
+
+        # Breakdown of the snapshot half of a restore
+        read_time, (_, columns) = timed(lambda: read_snapshot(snapshot))
+        build_time, certificates = timed(lambda: certificates_from_columns(columns))
+        store = CertificateStore()
+        load_time, _ = timed(lambda: store.load(certificates))
+        del columns, certificates, store
+        print(f'  read snapshot (mmap+unpickle)  {read_time * 1000:>9.1f} ms')
+        print(f'  build certificates             {build_time * 1000:>9.1f} ms')
+        print(f'  load index                     {load_time * 1000:>9.1f} ms')
+
+        runs = []
+        store = None
+        for _ in range(args.repeat):
+            store = None  # Keep one restored store in memory at a time
+            elapsed, (store, log) = timed(lambda: open_store(directory, fsync='never'))
+            log.close()
+            if len(store) != expected or store.version != version:
+                raise AssertionError(f'restored {len(store)} certificates at version {store.version}, '
+                                     f'expected {expected} at {version}')
+            runs.append(elapsed)
+        print(f'startup (restore, ready to serve) {statistics.median(runs) * 1000:>8.1f} ms  '
+              f'({len(store):,} certificates, median of {args.repeat})')
+
+        print('deferred past startup')
+        summary_time, _ = timed(lambda: StatusSummary().rebuild(store.ordered(), now_epoch()))
+        fingerprint_time, _ = timed(lambda: store.find_fingerprints(['0' * 64]))
+        domain_time, _ = timed(lambda: list(store.scan(domain='host1.example.com')))
+        print(f'  status summary (background)    {summary_time * 1000:>9.1f} ms')
+        print(f'  first fingerprint lookup       {fingerprint_time * 1000:>9.1f} ms')
+        print(f'  first domain query (trie)      {domain_time * 1000:>9.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Benchmark the Flask API routes through the test client and fail on regressions.
+
+Each size seeds a fresh in-memory store, then times the list, get, create, rotate
+and delete routes plus serialization microbenchmarks (to_dict/jsonify against
+joining cached per-certificate fragments). Results are
+written as JSON; with --baseline, any operation whose median latency grew by more
+than --tolerance (and by more than --min-delta-ms) is reported and the exit code is 1.
+
+Run from the backend directory:
+    python -m benchmarks.bench_routes --baseline benchmarks/baseline_routes.json
+    python -m benchmarks.bench_routes --sizes 1000 10000 --output results.json
+    python -m benchmarks.bench_routes --update-baseline benchmarks/baseline_routes.json
+
+Latencies depend on the machine, so refresh the baseline when the hardware changes.
+Sub-millisecond routes jitter by tens of percent between runs on shared hosts, which
+is what the default tolerance and --min-delta-ms absorb; a 2x slowdown still fails.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from flask import jsonify
+
+import routes
+from app import create_app
+from benchmarks.bench_storage import make_certificates
+from models.certificate_status import now_epoch
+from storage import CertificateStore
+
+DEFAULT_SIZES = (1000, 10_000, 100_000)
+
+
+def measure(operation, repeat, warmup=True):
+    """
+    Call `operation(i)` `repeat` times; return latency stats in milliseconds and
+    throughput. A few untimed calls warm caches first (skip them for operations
+    that consume input), and the GC is paused so collections don't land in samples.
+    """
+    if warmup:
+        for i in range(max(repeat // 10, 1)):
+            operation(i)
+    latencies = []
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            start = time.perf_counter()
+            operation(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+    latencies.sort()
+    return {
+        'mean_ms': round(statistics.fmean(latencies), 4),
+        'p50_ms': round(latencies[len(latencies) // 2], 4),
+        'p95_ms': round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 4),
+        'ops_per_sec': round(1000 / statistics.fmean(latencies), 1),
+        'repeat': repeat,
+    }
+
+
+def checked(response, status=200):
+    """Fail fast if a route errors: a benchmark of error responses measures nothing"""
+    if response.status_code != status:
+        raise AssertionError(f'expected {status}, got {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return response
+
+
+def run_size(app, count, repeat):
+    """Seed `count` certificates and time every route against them"""
+    store = CertificateStore()
+    certificates = make_certificates(count)
+    store.add_many(certificates)
+    routes.configure_store(store, app.config['STATUS_WARNING_DAYS'])
+    client = app.test_client()
+    ids = [certificate.id for certificate in certificates]
+    rng = random.Random(3)
+    # Full listings grow with the store; keep their total time bounded
+    slow_repeat = max(3, repeat * 1000 // count // 2)
+    results = {}
+
+    def list_page_cold(i):
+        routes.response_cache.clear()
+        checked(client.get('/api/v1/certificates?limit=100'))
+    results['get_certificates page'] = measure(list_page_cold, repeat)
+
+    def list_warning_cold(i):
+        routes.response_cache.clear()
+        checked(client.get('/api/v1/certificates?limit=100&status=warning'))
+    results['get_certificates status page'] = measure(list_warning_cold, repeat)
+
+    # Response cache cleared each time; fragments stay warm after the warmup calls
+    def list_full_cold(i):
+        routes.response_cache.clear()
+        checked(client.get('/api/v1/certificates'))
+    results['get_certificates full'] = measure(list_full_cold, slow_repeat)
+
+    def list_full_no_fragments(i):
+        routes.response_cache.clear()
+        routes.fragment_cache.clear()
+        checked(client.get('/api/v1/certificates'))
+    results['get_certificates full uncached'] = measure(list_full_no_fragments, slow_repeat)
+
+    results['get_certificates full cached'] = measure(
+        lambda i: checked(client.get('/api/v1/certificates')), repeat)
+
+    results['get_certificate'] = measure(
+        lambda i: checked(client.get(f'/api/v1/certificates/{rng.choice(ids)}')), repeat)
+
+    payload = {'domain_name': 'bench.example.com', 'common_name': 'bench.example.com',
+               'issuer': 'DigiCert', 'valid_until': '2030-01-01T00:00:00+00:00'}
+    results['create_certificate'] = measure(
+        lambda i: checked(client.post('/api/v1/certificates', json=payload), 201), repeat)
+
+    # Rotate and delete consume distinct seeded certificates
+    rotate_ids = ids[:min(repeat, count // 2)]
+    delete_ids = ids[len(rotate_ids):len(rotate_ids) * 2]
+    results['rotate_certificate'] = measure(
+        lambda i: checked(client.post(f'/api/v1/certificates/{rotate_ids[i]}/rotate'), 201),
+        len(rotate_ids), warmup=False)
+    results['delete_certificate'] = measure(
+        lambda i: checked(client.delete(f'/api/v1/certificates/{delete_ids[i]}')), len(delete_ids), warmup=False)
+
+    # Serialization alone: one page of to_dict + jsonify, and the whole store
+    now = now_epoch()
+    page = certificates[:100]
+    with app.app_context():
+        results['serialize page (to_dict+jsonify)'] = measure(
+            lambda i: jsonify([cert.to_dict(now) for cert in page]).get_data(), repeat)
+        results['serialize full (to_dict+jsonify)'] = measure(
+            lambda i: jsonify([cert.to_dict(now) for cert in certificates]).get_data(), slow_repeat)
+        dumps = routes.fragment_encoder()
+        routes.fragment_cache.fragments(certificates, now, dumps)
+        results['serialize full (fragments)'] = measure(
+            lambda i: b','.join(routes.fragment_cache.fragments(certificates, now, dumps)), slow_repeat)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Return (rows, regressions) comparing median latencies against the baseline"""
+    rows = []
+    regressions = []
+    for size, operations in results.items():
+        for operation, current in operations.items():
+            reference = baseline.get(size, {}).get(operation)
+            if reference is None:
+                rows.append((size, operation, current['p50_ms'], None, None))
+                continue
+            delta = current['p50_ms'] - reference['p50_ms']
+            ratio = current['p50_ms'] / reference['p50_ms'] if reference['p50_ms'] else float('inf')
+            rows.append((size, operation, current['p50_ms'], reference['p50_ms'], ratio))
+            if ratio > 1 + tolerance and delta > min_delta_ms:
+                regressions.append((size, operation, current['p50_ms'], reference['p50_ms'], ratio))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', help='compare against this results JSON and exit 1 on regressions')
+    parser.add_argument('--update-baseline', metavar='PATH', help='write results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed median slowdown (0.5 = 50%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.25,
+                        help='ignore slowdowns smaller than this, which are timer noise')
+    args = parser.parse_args()
+
+    app = create_app()
+    results = {}
+    for count in args.sizes:
+        print(f'seeding {count} certificates...', file=sys.stderr)
+        results[str(count)] = run_size(app, count, args.repeat)
+
+    document = {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    for path in filter(None, (args.output, args.update_baseline)):
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    rows, regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+
+    print(f"{'size':>7}  {'operation':<36} {'p50 ms':>9} {'base ms':>9} {'change':>8}")
+    for size, operation, current, reference, ratio in rows:
+        change = f'{(ratio - 1) * 100:+.0f}%' if ratio is not None else ''
+        base = f'{reference:.3f}' if reference is not None else '-'
+        print(f'{size:>7}  {operation:<36} {current:>9.3f} {base:>9} {change:>8}')
+
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:')
+        for size, operation, current, reference, ratio in regressions:
+            print(f'  REGRESSION {size:>7} {operation}: {reference:.3f} ms -> {current:.3f} ms ({ratio:.2f}x)')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Scan local self-signed TLS servers and report endpoints scanned per minute.
+
+The servers run in a child process so the scanner has the benchmark's core to
+itself. Every result is checked against the fingerprint each server was given,
+and the results are upserted into a fresh store to check deduplication.
+
+Run from the backend directory:
+    python -m benchmarks.bench_scanner --servers 20 --count 3000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import ssl
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from models.certificate import Certificate
+from scanner import scan_targets, scanned_fields
+from storage import CertificateStore
+
+
+def write_self_signed(directory, name):
+    """Write a self-signed certificate and key for `name`; return (cert path, key path, fingerprint)"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=30))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName(name)]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, f'{name}.crt')
+    key_path = os.path.join(directory, f'{name}.key')
+    with open(cert_path, 'wb') as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path, certificate.fingerprint(hashes.SHA256()).hex()
+
+
+def serve(credentials, connection):
+    """Child process: one TLS server per credential pair, reporting the ports back"""
+    async def handle(reader, writer):
+        writer.close()
+
+    async def main():
+        servers = []
+        for cert_path, key_path in credentials:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert_path, key_path)
+            servers.append(await asyncio.start_server(handle, '127.0.0.1', 0, ssl=context, backlog=1024))
+        connection.send([server.sockets[0].getsockname()[1] for server in servers])
+        # Serve until the parent closes its end of the pipe
+        await asyncio.get_running_loop().run_in_executor(None, connection.recv_bytes)
+
+    try:
+        asyncio.run(main())
+    except EOFError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', type=int, default=20)
+    parser.add_argument('--count', type=int, default=3000, help='endpoints to scan (targets cycle over the servers)')
+    parser.add_argument('--dead', type=int, default=10, help='extra targets on closed ports')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        generated = [write_self_signed(directory, f'server{i}.test') for i in range(args.servers)]
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=serve, args=([g[:2] for g in generated], child), daemon=True)
+        process.start()
+        ports = parent.recv()
+
+    fingerprints = {port: g[2] for port, g in zip(ports, generated)}
+    targets = [f'127.0.0.1:{ports[i % len(ports)]}' for i in range(args.count)]
+    # Port 1 is privileged and unused here, so these are refused immediately
+    targets += ['127.0.0.1:1'] * args.dead
+
+    start = time.perf_counter()
+    results = scan_targets(targets, args.concurrency, args.timeout, retries=0)
+    elapsed = time.perf_counter() - start
+    parent.close()
+    process.join(5)
+
+    succeeded = [result for result in results if result.ok]
+    mismatched = [result for result in succeeded
+                  if scanned_fields(result)['fingerprint_sha256'] != fingerprints[result.port]]
+    print(f'scanned {len(results)} targets in {elapsed:.2f}s: {len(results) / elapsed * 60:,.0f} per minute')
+    print(f'succeeded: {len(succeeded)}  failed: {len(results) - len(succeeded)}  '
+          f'fingerprint mismatches: {len(mismatched)}')
+
+    store = CertificateStore()
+    added, _ = store.add_unique(
+        Certificate(id=str(i), fingerprint_sha256=fields['fingerprint_sha256'], domain_name=fields['domain_name'],
+                    common_name=fields['common_name'], issuer=fields['issuer'], valid_from=fields['valid_from'],
+                    valid_until=fields['valid_until'])
+        for i, fields in enumerate(scanned_fields(result) for result in succeeded)
+    )
+    print(f'upserted: {len(added)} distinct certificates from {len(succeeded)} handshakes')
+
+    ok = (len(succeeded) == args.count and not mismatched and len(added) == args.servers
+          and all(not result.ok for result in results[args.count:]))
+    print('invariants: ok' if ok else 'invariants: FAILED')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
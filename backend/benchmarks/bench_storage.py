@@ -0,0 +1,97 @@
+"""
+Compare the in-memory and SQLite/SQLAlchemy certificate stores on the operations
+behind the list, get and rotate routes.
+
+Run from the backend directory:
+    python -m benchmarks.bench_storage --count 10000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from models.certificate import Certificate
+from models.certificate_status import now_epoch
+from storage import CertificateStore, status_key_ranges
+from storage.sql import SQLCertificateStore
+
+
+def make_certificates(count, seed=1):
+    rng = random.Random(seed)
+    base = datetime.now(timezone.utc)
+    return [
+        Certificate(
+            id=str(uuid.UUID(int=rng.getrandbits(128))),
+            domain_name=f'host{i}.example.com',
+            common_name=f'host{i}.example.com',
+            issuer=rng.choice(("Let's Encrypt", 'DigiCert', 'Sectigo')),
+            valid_from=base.isoformat(),
+            valid_until=(base + timedelta(days=rng.randint(-200, 800))).isoformat(),
+            fingerprint_sha256=f'{i:064x}',
+        )
+        for i in range(count)
+    ]
+
+
+def timed(operation, repeat):
+    """Run `operation(i)` `repeat` times and return (mean ms, ops per second)"""
+    start = time.perf_counter()
+    for i in range(repeat):
+        operation(i)
+    elapsed = time.perf_counter() - start
+    return elapsed / repeat * 1000, repeat / elapsed
+
+
+def run(store, certificates, repeat):
+    store.add_many(certificates)
+    ids = [certificate.id for certificate in certificates]
+    rng = random.Random(2)
+    now = now_epoch()
+    warning_ranges = status_key_ranges({'warning'}, now, 90)
+    results = {}
+
+    results['list page (100)'] = timed(lambda i: store.page(limit=100), repeat)
+    results['list warning page (100)'] = timed(lambda i: store.page(limit=100, ranges=warning_ranges), repeat)
+    results['list issuer page (100)'] = timed(lambda i: store.page(limit=100, issuer='DigiCert'), repeat)
+    results['list full'] = timed(lambda i: store.page(), max(repeat // 20, 1))
+    results['get'] = timed(lambda i: store[rng.choice(ids)], repeat)
+    results['next_transition'] = timed(lambda i: store.next_transition(now, 90), repeat)
+
+    def rotate(i):
+        old_id = ids[i]
+        old = store[old_id]
+        new = Certificate(id=str(uuid.uuid4()), domain_name=old.domain_name, common_name=old.common_name,
+                          issuer=old.issuer, valid_from=old.valid_from,
+                          valid_until=(datetime.now(timezone.utc) + timedelta(days=365)).isoformat())
+        store.replace(old_id, new)
+    results['rotate'] = timed(rotate, min(repeat, len(ids)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    certificates = make_certificates(args.count)
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {
+            'memory': CertificateStore(),
+            'sqlite': SQLCertificateStore('sqlite:///' + os.path.join(directory, 'bench.db')),
+        }
+        results = {name: run(store, certificates, args.repeat) for name, store in stores.items()}
+        stores['sqlite'].engine.dispose()
+
+    print(f'{args.count} certificates, {args.repeat} iterations')
+    print(f"{'operation':<26} {'memory ms':>10} {'sqlite ms':>10} {'memory ops/s':>13} {'sqlite ops/s':>13}")
+    for operation in results['memory']:
+        memory, sqlite = results['memory'][operation], results['sqlite'][operation]
+        print(f'{operation:<26} {memory[0]:>10.3f} {sqlite[0]:>10.3f} {memory[1]:>13,.0f} {sqlite[1]:>13,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Measure PEM bundle parsing throughput, inline versus on the process pool.
+
+Run from the backend directory:
+    python -m benchmarks.bench_x509 --count 5000 --workers 4
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from utils.x509_parser import parse_upload, shutdown_parser_pool
+
+
+def make_bundle(count):
+    """Build a PEM bundle of `count` certificates signed by one throwaway CA key"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    issuer = x509.Name([
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, 'Benchmark CA'),
+        x509.NameAttribute(NameOID.COMMON_NAME, 'Benchmark Root'),
+    ])
+    base = datetime.now(timezone.utc)
+    blocks = []
+    for i in range(count):
+        name = f'host{i}.example.com'
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)]))
+            .issuer_name(issuer)
+            .public_key(key.public_key())
+            .serial_number(i + 1)
+            .not_valid_before(base)
+            .not_valid_after(base + timedelta(days=30 + i % 700))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(name), x509.DNSName(f'www.{name}')]),
+                           critical=False)
+            .sign(key, hashes.SHA256())
+        )
+        blocks.append(certificate.public_bytes(serialization.Encoding.PEM))
+    return b''.join(blocks)
+
+
+def timed(data, workers, repeat):
+    """Parse `data` `repeat` times and return (mean seconds, certificates per second)"""
+    parse_upload(data, workers)  # warm up, and start the pool outside the timing
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = parse_upload(data, workers)
+    elapsed = (time.perf_counter() - start) / repeat
+    assert all(error is None for _, error in results)
+    return elapsed, len(results) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'building a bundle of {args.count} certificates...')
+    data = make_bundle(args.count)
+    print(f'bundle size: {len(data) / 1024 / 1024:.1f} MiB')
+
+    serial, serial_rate = timed(data, 0, args.repeat)
+    print(f'inline:            {serial * 1000:8.1f} ms  {serial_rate:10.0f} certs/s')
+    parallel, parallel_rate = timed(data, args.workers, args.repeat)
+    print(f'pool ({args.workers:2d} workers): {parallel * 1000:8.1f} ms  {parallel_rate:10.0f} certs/s'
+          f'  ({serial / parallel:.1f}x)')
+    shutdown_parser_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Load-test the API under the WSGI server (app.run) and the ASGI server (main.py).
+
+For each mode a server runs in a child process with a seeded in-memory store, and
+`--clients` concurrent keep-alive clients issue a mix of list-page, get-by-id and
+summary requests for `--duration` seconds. Requests finishing during the first
+`--warmup` seconds are left out. Reports requests per second, p50/p99 latency
+(connection setup included) and errors per mode.
+
+Run from the backend directory:
+    python -m benchmarks.load_test --clients 1000 --duration 20
+    python -m benchmarks.load_test --modes asgi --clients 200 --output load.json
+
+Client and server share the machine, so compare the modes against each other
+rather than reading the absolute numbers as capacity.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import platform
+import random
+import socket
+import sys
+import time
+
+from app import create_app
+from app.asgi import create_asgi_app
+from benchmarks.bench_storage import make_certificates
+from storage import CertificateStore
+
+MODES = ('wsgi', 'asgi')
+
+# Per-request deadline, so a stuck connection shows up as an error instead of a hang
+REQUEST_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(mode, port, count, workers):
+    """Child process: seed `count` certificates and serve them until terminated"""
+    import routes
+    app = create_app()
+    store = CertificateStore()
+    store.add_many(make_certificates(count))
+    routes.configure_store(store, app.config['STATUS_WARNING_DAYS'])
+
+    if mode == 'wsgi':
+        # What app.py does, minus the debugger and reloader; silence per-request logging
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        app.run(host='127.0.0.1', port=port, debug=False, use_reloader=False)
+    else:
+        import uvicorn
+        uvicorn.run(create_asgi_app(app, workers),
+                    host='127.0.0.1', port=port, log_level='warning', access_log=False, backlog=2048)
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; return (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split(b' ', 2)[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.partition(b':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if headers.get(b'transfer-encoding') == b'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get(b'content-length', 0)))
+    return status, headers.get(b'connection') != b'close'
+
+
+async def client(port, paths, rng, warm_until, deadline, latencies, errors):
+    """One keep-alive client issuing requests back to back until `deadline`"""
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        request = f'GET {rng.choice(paths)} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n\r\n'.encode()
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), REQUEST_TIMEOUT)
+            writer.write(request)
+            status, keep_alive = await asyncio.wait_for(read_response(reader), REQUEST_TIMEOUT)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            errors['connection'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        finished = time.perf_counter()
+        if status != 200:
+            errors['status'] += 1
+        elif started >= warm_until:
+            latencies.append(finished - started)
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, paths, clients, duration, warmup):
+    latencies = []
+    errors = {'connection': 0, 'status': 0}
+    start = time.perf_counter()
+    warm_until = start + warmup
+    deadline = warm_until + duration
+    await asyncio.gather(*(client(port, paths, random.Random(i), warm_until, deadline, latencies, errors)
+                           for i in range(clients)))
+    return latencies, errors, time.perf_counter() - warm_until
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def run_mode(mode, args, paths):
+    port = free_port()
+    process = multiprocessing.Process(target=serve, args=(mode, port, args.certificates, args.workers), daemon=True)
+    process.start()
+    try:
+        wait_for_port(port)
+        latencies, errors, elapsed = asyncio.run(drive(port, paths, args.clients, args.duration, args.warmup))
+    finally:
+        process.terminate()
+        process.join(10)
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+        'connection_errors': errors['connection'],
+        'status_errors': errors['status'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds per mode')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before that')
+    parser.add_argument('--certificates', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, help='ASGI request threads (default ASGI_WORKER_THREADS)')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    # The child seeds the same deterministic certificates, so their IDs are known here
+    ids = [certificate.id for certificate in make_certificates(args.certificates)]
+    sample = random.Random(7).sample(ids, min(100, len(ids)))
+    # Equal shares of list pages, summaries and single certificates
+    paths = (['/api/v1/certificates?limit=100'] * len(sample) + ['/api/v1/certificates/summary'] * len(sample)
+             + [f'/api/v1/certificates/{cert_id}' for cert_id in sample])
+
+    results = {}
+    for mode in args.modes:
+        print(f'{mode}: {args.clients} clients for {args.duration:g}s...', file=sys.stderr)
+        results[mode] = run_mode(mode, args, paths)
+
+    print(f"{'mode':<6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'conn err':>9} {'non-200':>8}")
+    for mode, result in results.items():
+        print(f"{mode:<6} {result['requests_per_sec']:>9.1f} {result['p50_ms'] or 0:>9.2f} "
+              f"{result['p99_ms'] or 0:>9.2f} {result['max_ms'] or 0:>9.2f} "
+              f"{result['connection_errors']:>9} {result['status_errors']:>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'platform': platform.platform(),
+                    'clients': args.clients,
+                    'duration': args.duration,
+                    'certificates': args.certificates,
+                },
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
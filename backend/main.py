@@ -0,0 +1,7 @@
+from app import create_app
+from app.asgi import create_asgi_app
+
+# ASGI entry point: the same routes as app.py, served from an event loop
+#   uvicorn main:app --host 0.0.0.0 --port 5000
+flask_app = create_app()
+app = create_asgi_app(flask_app)
@@ -1,5 +1,6 @@
 # Import the Certificate model
 from .certificate import Certificate
+from .certificate_status import evaluate_statuses, next_transition, now_epoch, parse_timestamp, to_epoch_array
 
 # Make the Certificate model available when importing from this package
-__all__ = ['Certificate']
+__all__ = ['Certificate', 'evaluate_statuses', 'next_transition', 'now_epoch', 'parse_timestamp', 'to_epoch_array']
@@ -1,8 +1,25 @@
-from datetime import datetime, timedelta, timezone
+from .certificate_status import DEFAULT_WARNING_DAYS, now_epoch, parse_timestamp, status_for
 
 class Certificate:
     """Certificate model to represent SSL/TLS certificates"""
     
+    # Slots keep instances compact; expires_at caches valid_until as an epoch
+    # so status checks are integer comparisons instead of ISO parsing
+    __slots__ = ('id', 'domain_name', 'common_name', 'issuer', 'valid_from',
+                 '_valid_until', 'expires_at', 'fingerprint_sha256')
+    
+    # DNS names from the subjectAltName extension, in certificate order, and the
+    # "host:port" the TLS scanner captured it from (a later scan of that target
+    # replaces it). Only certificates that have either get slots for them (see
+    # _CertificateWithExtras); the rest share these defaults
+    subject_alt_names = ()
+    scan_target = None
+    
+    def __new__(cls, **kwargs):
+        if cls is Certificate and (kwargs.get('subject_alt_names') or kwargs.get('scan_target') is not None):
+            cls = _CertificateWithExtras
+        return object.__new__(cls)
+    
     def __init__(self, **kwargs):
         self.id = kwargs.get('id')
         self.domain_name = kwargs.get('domain_name')
@@ -11,31 +28,39 @@ class Certificate:
         self.valid_from = kwargs.get('valid_from')
         self.valid_until = kwargs.get('valid_until')
         self.fingerprint_sha256 = kwargs.get('fingerprint_sha256') or self._generate_fingerprint()
+        subject_alt_names = kwargs.get('subject_alt_names')
+        scan_target = kwargs.get('scan_target')
+        if _has_extras(subject_alt_names, scan_target):
+            self.subject_alt_names = tuple(subject_alt_names or ())
+            self.scan_target = scan_target
+    
+    @property
+    def valid_until(self):
+        return self._valid_until
+    
+    @valid_until.setter
+    def valid_until(self, value):
+        # Parse once on assignment; None means undated or unparseable
+        self._valid_until = value
+        self.expires_at = parse_timestamp(value)
+        
+    def domain_names(self):
+        """Every name the certificate covers: domain_name, common_name and the SANs"""
+        return (self.domain_name, self.common_name) + self.subject_alt_names
+        
+    def content_key(self):
+        """Every stored field as a tuple: certificates with equal keys serialize the same, bar status"""
+        return (self.id, self.domain_name, self.common_name, self.issuer, self.valid_from, self._valid_until,
+                self.fingerprint_sha256, self.subject_alt_names, self.scan_target)
         
+    def status_at(self, now, warning_days=DEFAULT_WARNING_DAYS):
+        """Determine status relative to `now` (epoch seconds)"""
+        return status_for(self.expires_at, now, warning_days)
+    
     @property
     def status(self):
         """Dynamically determine status based on valid_until date"""
-        if not self.valid_until:
-            return 'active'
-            
-        try:
-            # Parse the expiry date and make it timezone-aware if it's not
-            expiry_date = datetime.fromisoformat(self.valid_until.replace('Z', '+00:00'))
-            if expiry_date.tzinfo is None:
-                expiry_date = expiry_date.replace(tzinfo=timezone.utc)
-                
-            # Get current time in UTC with timezone info
-            today = datetime.now(timezone.utc)
-            warning_threshold = today + timedelta(days=90)
-            
-            if expiry_date < today:
-                return 'expired'
-            elif expiry_date < warning_threshold:
-                return 'warning'
-            return 'active'
-        except (ValueError, AttributeError) as e:
-            print(f"Error determining certificate status: {e}")
-            return 'active'
+        return self.status_at(now_epoch())
     
     def _generate_fingerprint(self):
         """Generate a SHA-256 fingerprint for the certificate"""
@@ -45,20 +70,56 @@ class Certificate:
         unique_str = f"{self.domain_name}:{self.common_name}:{self.issuer}:{secrets.token_hex(8)}"
         return hashlib.sha256(unique_str.encode()).hexdigest()
     
-    def to_dict(self):
-        """Convert certificate object to dictionary"""
+    def to_dict(self, now=None, status=None):
+        """
+        Convert certificate object to dictionary. Pass `now` to share one clock per
+        request, or a precomputed `status` from evaluate_statuses.
+        """
+        if status is None:
+            status = self.status_at(now_epoch() if now is None else now)
         return {
             'id': self.id,
             'domain_name': self.domain_name,
             'common_name': self.common_name,
             'issuer': self.issuer,
             'valid_from': self.valid_from,
-            'valid_until': self.valid_until,
-            'status': self.status,
-            'fingerprint_sha256': self.fingerprint_sha256
+            'valid_until': self._valid_until,
+            'status': status,
+            'fingerprint_sha256': self.fingerprint_sha256,
+            'subject_alt_names': list(self.subject_alt_names),
+            'scan_target': self.scan_target
         }
     #convert json into dictionary
     @classmethod
     def from_dict(cls, data):
         """Create Certificate from dictionary"""
-        return cls(**data)
\ No newline at end of file
+        return cls(**data)
+    
+    @classmethod
+    def from_storage(cls, id, domain_name, common_name, issuer, valid_from, valid_until,
+                     fingerprint_sha256, expires_at, subject_alt_names=(), scan_target=None):
+        """Rebuild a stored certificate without re-parsing valid_until"""
+        extras = _has_extras(subject_alt_names, scan_target)
+        certificate = object.__new__(_CertificateWithExtras if extras and cls is Certificate else cls)
+        certificate.id = id
+        certificate.domain_name = domain_name
+        certificate.common_name = common_name
+        certificate.issuer = issuer
+        certificate.valid_from = valid_from
+        certificate._valid_until = valid_until
+        certificate.expires_at = expires_at
+        certificate.fingerprint_sha256 = fingerprint_sha256
+        if extras:
+            certificate.subject_alt_names = tuple(subject_alt_names or ())
+            certificate.scan_target = scan_target
+        return certificate
+
+
+class _CertificateWithExtras(Certificate):
+    """A Certificate with SANs or a scan target; Certificate() picks it when either is given"""
+    
+    __slots__ = ('subject_alt_names', 'scan_target')
+
+
+def _has_extras(subject_alt_names, scan_target):
+    return bool(subject_alt_names) or scan_target is not None
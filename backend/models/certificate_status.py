@@ -0,0 +1,88 @@
+"""
+Certificate status evaluation shared by the Flask backend and the Lambda.
+
+The Lambda package ships this file as aws-backend/certificate_status.py (a
+symlink), so it must only depend on the standard library and NumPy.
+"""
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Certificates expiring within this many days are reported with 'warning' status
+DEFAULT_WARNING_DAYS = 90
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Epoch used for undated/unparseable certificates: never expires, always 'active'
+NO_EXPIRY = np.iinfo(np.int64).max
+
+# Status codes index into this table: 0 active, 1 warning, 2 expired
+STATUS_LABELS = np.array(['active', 'warning', 'expired'], dtype=object)
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 string into a UTC epoch (seconds), or None if it is missing/invalid"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+    # Timezone-naive values are treated as UTC
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def now_epoch():
+    """Current UTC time as an epoch (seconds); take it once per request and pass it around"""
+    return int(time.time())
+
+def warning_window(warning_days=DEFAULT_WARNING_DAYS):
+    """Length of the warning window in seconds"""
+    return int(warning_days * SECONDS_PER_DAY)
+
+def status_for(expires_at, now, warning_days=DEFAULT_WARNING_DAYS):
+    """Status of a single certificate given its expiry epoch (None if undated)"""
+    if expires_at is None:
+        return 'active'
+    if expires_at < now:
+        return 'expired'
+    if expires_at < now + warning_days * SECONDS_PER_DAY:
+        return 'warning'
+    return 'active'
+
+def to_epoch_array(expiries):
+    """Build an int64 array from expiry epochs, mapping None to NO_EXPIRY"""
+    if isinstance(expiries, np.ndarray):
+        return expiries.astype(np.int64, copy=False)
+    values = [NO_EXPIRY if expires_at is None else expires_at for expires_at in expiries]
+    return np.fromiter(values, dtype=np.int64, count=len(values))
+
+def evaluate_statuses(expires_at, now=None, warning_days=DEFAULT_WARNING_DAYS):
+    """
+    Evaluate the status of a batch of certificates in one vectorized pass.
+    `expires_at` is an int64 array of expiry epochs (NO_EXPIRY for undated ones);
+    returns an object array of status labels in the same order.
+    """
+    expires_at = to_epoch_array(expires_at)
+    if now is None:
+        now = now_epoch()
+    codes = (expires_at < now + warning_window(warning_days)).astype(np.int8)
+    codes += expires_at < now
+    return STATUS_LABELS[codes]
+
+def next_transition(expires_at, now, warning_days=DEFAULT_WARNING_DAYS):
+    """
+    Epoch at which a certificate's status next changes after `now`, or None if it
+    never will (undated or already expired). Status is 'expired' once expires_at < now
+    and 'warning' once expires_at < now + window, so the boundaries sit one second
+    after expires_at - window and after expires_at.
+    """
+    if expires_at is None:
+        return None
+    window = warning_window(warning_days)
+    if expires_at >= now + window:
+        return expires_at - window + 1
+    if expires_at >= now:
+        return expires_at + 1
+    return None
@@ -1,58 +1,457 @@
-from flask import Blueprint, jsonify, request
-from models.certificate import Certificate
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from models import Certificate, evaluate_statuses, next_transition, now_epoch, to_epoch_array
+from storage import (DOMAIN_MATCH_MODES, CertificateStore, ChangeFeed, FeedWait, StatusSummary, decode_cursor, encode_cursor,
+                     intersect_key_ranges, status_key_ranges, transition_key_ranges)
+from utils import (RECORD_FORMATS, X509_CONTENT_TYPES, FragmentCache, ResponseCache, batched, detect_format, iter_lines,
+                   iter_records, parse_upload)
+from utils.metrics import serialization_duration
+from utils.rotation_policy import expiry_cutoff, parse_rotation_selector
+from scanner import JobQueueFull, ScanJobs, TargetPolicy, parse_target, scan_targets, scanned_fields
+import hmac
+import threading
+import json
+import time
 import uuid
+from itertools import islice
 from datetime import datetime, timedelta
 from dateutil import tz
 
 # Create a Blueprint for our main routes
 main = Blueprint('main', __name__)
 
-# In-memory storage (we'll replace this with DynamoDB later)
-certificates_store = {}
+# Certificate storage; create_app swaps in the backend selected by CERTIFICATE_STORE
+certificates_store = CertificateStore()
+
+# Serialized list payloads, reused until the store version or a status boundary changes
+response_cache = ResponseCache()
+
+# Encoded JSON per certificate, reused until the certificate changes or crosses a status boundary
+fragment_cache = FragmentCache()
+
+# Per-status and per-issuer counts, maintained incrementally from store changes
+status_summary = StatusSummary()
+
+# Recent store mutations by version, for the change stream and ?since= deltas
+change_feed = ChangeFeed()
+
+# Background TLS scan jobs started by POST /api/v1/scans
+scan_jobs = ScanJobs()
+
+# Longest a change stream stays silent; a comment line keeps proxies from closing it
+SSE_HEARTBEAT_SECONDS = 15
+
+# WSGI environ key set by servers (app.asgi) that wait out change streams on their
+# event loop: the stream then yields FeedWait markers instead of blocking a thread
+EVENT_LOOP_WAITS = 'certificates.event_loop_waits'
+
+def configure_store(store, warning_days=90):
+    """Use `store` (any storage.CertificateRepository) for all routes"""
+    global certificates_store
+    certificates_store = store
+    response_cache.clear()
+    fragment_cache.clear()
+    fragment_cache.warning_days = warning_days
+    store.subscribe(fragment_cache.store_changed)
+    
+    # Store notifications keep the summary current; its initial load runs in the
+    # background (or on the first summary request) so a large store serves at once
+    status_summary.warning_days = warning_days
+    status_summary.attach(store)
+    threading.Thread(target=status_summary.warm, name='summary-warm', daemon=True).start()
+    change_feed.attach(store)
 
 @main.route('/')
 def index():
     """Root endpoint - redirect to certificates endpoint"""
     return get_certificates()
 
+# Fields that can be requested through the `fields` projection parameter
+CERTIFICATE_FIELDS = ('id', 'domain_name', 'common_name', 'issuer', 'valid_from',
+                      'valid_until', 'status', 'fingerprint_sha256', 'subject_alt_names',
+                      'scan_target')
+
+def parse_page_args(args):
+    """Parse limit/cursor/fields query parameters, raising ValueError on bad input"""
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        max_page_size = current_app.config['MAX_PAGE_SIZE']
+        if limit < 1 or limit > max_page_size:
+            raise ValueError(f'limit must be between 1 and {max_page_size}')
+    
+    cursor = args.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+    
+    return limit, after, parse_fields_arg(args)
+
+# Status labels accepted by the `status` filter
+CERTIFICATE_STATUSES = ('active', 'warning', 'expired')
+
+def parse_fields_arg(args):
+    """Parse the `fields` projection parameter, raising ValueError on unknown fields"""
+    fields = args.get('fields')
+    if not fields:
+        return None
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in CERTIFICATE_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown field(s): {", ".join(unknown)}')
+    return fields
+
+def parse_filter_args(args):
+    """
+    Parse the `status`, `domain`/`match` and `issuer` filters, raising ValueError on
+    bad input. `match` is exact, suffix or wildcard; it defaults to wildcard for
+    '*.' patterns and to exact otherwise.
+    """
+    statuses = args.get('status')
+    if statuses:
+        statuses = {status.strip() for status in statuses.split(',') if status.strip()}
+        unknown = statuses - set(CERTIFICATE_STATUSES)
+        if unknown:
+            raise ValueError(f'Unknown status(es): {", ".join(sorted(unknown))}')
+    else:
+        statuses = None
+    
+    domain = args.get('domain', '').strip().lower() or None
+    domain_match = args.get('match') or ('wildcard' if domain and domain.startswith('*.') else 'exact')
+    if domain_match not in DOMAIN_MATCH_MODES:
+        raise ValueError(f'match must be one of: {", ".join(DOMAIN_MATCH_MODES)}')
+    
+    issuer = args.get('issuer', '').strip() or None
+    return {'statuses': statuses, 'domain': domain, 'domain_match': domain_match, 'issuer': issuer}
+
+def store_query(filters, now):
+    """
+    Turn parsed filters into keyword arguments for the store's page/scan. Status
+    filters become ranges of the expiry order, so non-matching expiries are never visited.
+    """
+    statuses = filters['statuses']
+    return {
+        'ranges': status_key_ranges(statuses, now, current_app.config['STATUS_WARNING_DAYS']) if statuses else None,
+        'domain': filters['domain'],
+        'domain_match': filters['domain_match'],
+        'issuer': filters['issuer'],
+    }
+
+def with_statuses(certificates, now):
+    """Pair certificates with statuses evaluated in one vectorized pass"""
+    statuses = evaluate_statuses(
+        to_epoch_array([cert.expires_at for cert in certificates]),
+        now,
+        current_app.config['STATUS_WARNING_DAYS']
+    )
+    return zip(certificates, statuses)
+
+def make_etag(next_change):
+    """
+    ETag for the current store version. Status is derived from the clock, so the
+    next status transition is folded in too: once it passes, the ETag changes.
+    """
+    return f'{certificates_store.version}-{next_change or 0}'
+
+def not_modified(etag):
+    """304 response for a matching If-None-Match, sent without serializing anything"""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+def json_response(body, etag):
+    """Wrap an already serialized JSON body and tag it with `etag`"""
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+def project(cert_dict, fields):
+    """Reduce a certificate dict to the requested fields"""
+    if fields is None:
+        return cert_dict
+    return {field: cert_dict[field] for field in fields}
+
+def compact_json():
+    """Whether jsonify writes compact JSON; it indents when compact is False, or unset in debug mode"""
+    compact = current_app.json.compact
+    return compact if compact is not None else not current_app.debug
+
+def fragment_encoder():
+    """
+    Encoder matching the app's JSON provider in compact mode, built once per request:
+    json.dumps would construct a new encoder for every certificate fragment.
+    """
+    provider = current_app.json
+    return json.JSONEncoder(sort_keys=provider.sort_keys, ensure_ascii=provider.ensure_ascii,
+                            default=provider.default, separators=(',', ':')).encode
+
 @main.route('/api/v1/certificates', methods=['GET'])
 def get_certificates():
-    """Get all certificates, sorted by expiration date (ascending)"""
-    # Convert certificates to list of dicts
-    certs_list = [cert.to_dict() for cert in certificates_store.values()]
-    
-    # Sort by valid_until date (None values will be placed at the end)
-    def get_sort_key(cert):
-        valid_until = cert.get('valid_until')
-        if not valid_until:
-            return (1, '')  # Push certificates without expiration date to the end
-        try:
-            # Return a sortable tuple (0 for valid dates, then the date itself)
-            return (0, datetime.fromisoformat(valid_until.replace('Z', '+00:00')))
-        except (ValueError, AttributeError):
-            return (1, '')  # Push invalid dates to the end
+    """Get certificates sorted by expiration date (ascending), optionally filtered and paginated"""
+    try:
+        limit, after, fields = parse_page_args(request.args)
+        filters = parse_filter_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    now = now_epoch()  # One clock reading for filtering and every status in the response
+    etag = make_etag(certificates_store.next_transition(now, current_app.config['STATUS_WARNING_DAYS']))
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
     
-    # Sort the certificates
-    sorted_certs = sorted(certs_list, key=get_sort_key)
+    cache_key = request.query_string
+    body = response_cache.get(cache_key, etag)
+    if body is None:
+        # The store keeps certificates ordered by valid_until (undated/invalid ones last),
+        # so a page is a slice of the index starting right after the cursor key
+        page, next_key = certificates_store.page(after=after, limit=limit, **store_query(filters, now))
+        serialize_started = time.perf_counter()
+        next_cursor = encode_cursor(next_key) if next_key else None
+        if fields is None and compact_json():
+            # Full certificates: splice cached per-certificate JSON into the envelope
+            # (the same bytes jsonify would produce)
+            encode = fragment_encoder()
+            body = b''.join((
+                b'{"data":[',
+                b','.join(fragment_cache.fragments(page, now, encode)),
+                b'],"next_cursor":',
+                encode(next_cursor).encode(),
+                b',"status":"success"}\n'
+            ))
+        else:
+            body = jsonify({
+                'status': 'success',
+                'data': [project(cert.to_dict(status=status), fields) for cert, status in with_statuses(page, now)],
+                'next_cursor': next_cursor
+            }).get_data()
+        serialization_duration.observe((request.url_rule.rule,), time.perf_counter() - serialize_started)
+        response_cache.put(cache_key, etag, body)
     
+    return json_response(body, etag)
+
+@main.route('/api/v1/certificates/summary', methods=['GET'])
+def get_certificate_summary():
+    """Get certificate counts per status and per issuer without touching the certificates"""
     return jsonify({
         'status': 'success',
-        'data': sorted_certs
+        'data': status_summary.snapshot(now_epoch())
     })
 
+def change_payload(event, now):
+    """JSON-ready form of a change feed event"""
+    return {
+        'version': event['version'],
+        'action': event['action'],
+        'certificates': [cert.to_dict(status=status) for cert, status in with_statuses(event['added'], now)],
+        'removed_ids': list(event['removed_ids'])
+    }
+
+def status_transitions(start, end):
+    """Certificates whose status changed in (start, end], with their status at `end`"""
+    ranges = transition_key_ranges(start, end, current_app.config['STATUS_WARNING_DAYS'])
+    if not ranges:
+        return []
+    certs = [cert for _, cert in certificates_store.scan(ranges=ranges)]
+    return [cert.to_dict(status=status) for cert, status in with_statuses(certs, end)]
+
+def parse_since(value):
+    """Parse a ?since= / Last-Event-ID store version"""
+    try:
+        since = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('since must be a store version (integer)')
+    if since < 0:
+        raise ValueError('since must be a store version (integer)')
+    return since
+
+def sse_message(event, data, event_id=None):
+    """Format one server-sent event"""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+@main.route('/api/v1/certificates/changes', methods=['GET'])
+def get_certificate_changes():
+    """
+    Changes after a store version, so clients can apply deltas instead of reloading.
+
+    With `Accept: text/event-stream` (EventSource) this is a server-sent event
+    stream of `change` events (create, import, delete, rotate, clear) and `status`
+    events for certificates crossing into warning/expired; it resumes from
+    Last-Event-ID or ?since=. Otherwise ?since= is required and the changes are
+    returned as one JSON delta. A version older than the retained history gets
+    410 (JSON) or a `reset` event (stream): the client must reload the list.
+    """
+    streaming = request.accept_mimetypes.best == 'text/event-stream'
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    # A fresh stream starts at the current version and the current time
+    resumed = since is not None
+    try:
+        if since is None and not streaming:
+            raise ValueError('since is required')
+        since = change_feed.version if since is None else parse_since(since)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    if not streaming:
+        changes = change_feed.since(since)
+        if changes is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Version is no longer available, reload the full list',
+                'version': change_feed.version
+            }), 410
+        events, reached_at = changes
+        now = now_epoch()
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'version': events[-1]['version'] if events else since,
+                'changes': [change_payload(event, now) for event in events],
+                'transitions': status_transitions(reached_at, now)
+            }
+        })
+    
+    warning_days = current_app.config['STATUS_WARNING_DAYS']
+    
+    def generate_events():
+        version = since
+        checked_at = None if resumed else now_epoch()
+        yield 'retry: 3000\n\n'
+        while True:
+            changes = change_feed.since(version)
+            if changes is None:
+                yield sse_message('reset', {'version': change_feed.version})
+                return
+            events, reached_at = changes
+            if checked_at is None:
+                checked_at = reached_at
+            now = now_epoch()
+            for event in events:
+                version = event['version']
+                yield sse_message('change', change_payload(event, now), version)
+            if now > checked_at:
+                transitions = status_transitions(checked_at, now)
+                checked_at = now
+                if transitions:
+                    yield sse_message('status', {'version': version, 'certificates': transitions}, version)
+            
+            # Sleep until the next change, status transition or heartbeat
+            next_change = certificates_store.next_transition(now, warning_days)
+            timeout = SSE_HEARTBEAT_SECONDS
+            if next_change is not None:
+                timeout = min(timeout, max(next_change - time.time(), 0.05))
+            yield FeedWait(version, timeout)
+            if change_feed.version == version and timeout == SSE_HEARTBEAT_SECONDS:
+                yield ': keep-alive\n\n'
+    
+    def blocking_waits(events):
+        # Plain WSGI servers give each stream its own thread, which can block here
+        for event in events:
+            if isinstance(event, FeedWait):
+                change_feed.wait(event.version, event.timeout)
+            else:
+                yield event
+    
+    events = generate_events()
+    if not request.environ.get(EVENT_LOOP_WAITS):
+        events = blocking_waits(events)
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@main.route('/api/v1/certificates/export', methods=['GET'])
+def export_certificates():
+    """
+    Stream certificates in expiry order as NDJSON (default) or CSV (?format=csv).
+    Accepts the same status/domain/issuer filters and field projection as the list endpoint.
+    Rows are produced by a generator, so memory stays flat regardless of inventory size.
+    """
+    record_format = request.args.get('format', 'ndjson')
+    try:
+        if record_format not in RECORD_FORMATS:
+            raise ValueError(f'Unsupported format, expected one of: {", ".join(RECORD_FORMATS)}')
+        filters = parse_filter_args(request.args)
+        fields = parse_fields_arg(request.args) or list(CERTIFICATE_FIELDS)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    now = now_epoch()
+    matches = (cert for _, cert in certificates_store.scan(**store_query(filters, now)))
+    
+    def generate_records():
+        for chunk in batched(matches, 1000):
+            for cert, status in with_statuses(chunk, now):
+                yield project(cert.to_dict(status=status), fields)
+    
+    mimetype = RECORD_FORMATS[record_format][0]
+    return Response(
+        stream_with_context(iter_lines(generate_records(), record_format, fields)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=certificates.{record_format}'}
+    )
+
 @main.route('/api/v1/certificates/<cert_id>', methods=['GET'])
 def get_certificate(cert_id):
     """Get a single certificate by ID"""
-    if cert_id not in certificates_store:
+    # One read, so a concurrent delete can't land between a check and the lookup
+    certificate = certificates_store.get(cert_id)
+    if certificate is None:
         return jsonify({
             'status': 'error',
             'message': 'Certificate not found'
         }), 404
     
-    return jsonify({
+    now = now_epoch()
+    etag = make_etag(next_transition(certificate.expires_at, now, current_app.config['STATUS_WARNING_DAYS']))
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    
+    status = certificate.status_at(now, current_app.config['STATUS_WARNING_DAYS'])
+    return json_response(jsonify({
         'status': 'success',
-        'data': certificates_store[cert_id].to_dict()
-    })
+        'data': certificate.to_dict(status=status)
+    }).get_data(), etag)
+
+# Fields every new certificate must provide
+REQUIRED_FIELDS = ('domain_name', 'common_name', 'issuer', 'valid_until')
+# Fields a create or import may leave out or set to null
+OPTIONAL_FIELDS = ('valid_from', 'fingerprint_sha256')
+
+def validate_certificate_data(data):
+    """Return an error message for an invalid create payload, or None if it is valid"""
+    if not isinstance(data, dict):
+        return 'Certificate data must be a JSON object'
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return f'Missing required field: {field}'
+        if not isinstance(data[field], str):
+            return f'Field {field} must be a string'
+    for field in OPTIONAL_FIELDS:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return f'Field {field} must be a string'
+    alt_names = data.get('subject_alt_names')
+    if alt_names is not None and not isinstance(alt_names, str) and not (
+            isinstance(alt_names, list) and all(isinstance(name, str) for name in alt_names)):
+        return 'Field subject_alt_names must be a list of strings'
+    return None
+
+def subject_alt_names(data):
+    """SANs of a validated payload: a JSON list, or a space-separated string (CSV)"""
+    alt_names = data.get('subject_alt_names') or ()
+    return alt_names.split() if isinstance(alt_names, str) else alt_names
 
 @main.route('/api/v1/certificates', methods=['POST'])
 def create_certificate():
@@ -60,13 +459,12 @@ def create_certificate():
     data = request.get_json()
     
     # Basic validation
-    required_fields = ['domain_name', 'common_name', 'issuer', 'valid_until']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({
-                'status': 'error',
-                'message': f'Missing required field: {field}'
-            }), 400
+    error = validate_certificate_data(data)
+    if error:
+        return jsonify({
+            'status': 'error',
+            'message': error
+        }), 400
     
     # Create new certificate
     cert_id = str(uuid.uuid4())
@@ -79,69 +477,400 @@ def create_certificate():
         issuer=data['issuer'],
         valid_from=now,  # Always use current time for new certs
         valid_until=data['valid_until'],
+        subject_alt_names=subject_alt_names(data),
         status='active'
     )
     
     # Store the certificate (in-memory for now)
-    certificates_store[cert_id] = certificate
+    certificates_store.add(certificate)
     
     return jsonify({
         'status': 'success',
         'data': certificate.to_dict()
     }), 201
 
-@main.route('/api/v1/certificates/<cert_id>', methods=['DELETE'])
-def delete_certificate(cert_id):
-    """Delete a certificate"""
-    if cert_id not in certificates_store:
+@main.route('/api/v1/certificates:bulk', methods=['POST'])
+def bulk_import_certificates():
+    """
+    Import certificates from an NDJSON or CSV body (chosen by Content-Type or ?format=).
+    The body is read as a stream and inserted in batches; the response reports
+    every row that failed validation.
+    """
+    record_format = detect_format(request.content_type, request.args.get('format'))
+    if record_format is None:
         return jsonify({
             'status': 'error',
-            'message': 'Certificate not found'
-        }), 404
+            'message': f'Unsupported format, expected one of: {", ".join(RECORD_FORMATS)}'
+        }), 415
+    
+    now = datetime.utcnow().isoformat()
+    batch_size = current_app.config['BULK_IMPORT_BATCH_SIZE']
+    received = imported = 0
+    errors = []
     
-    # Delete the certificate
-    del certificates_store[cert_id]
+    for rows in batched(iter_records(request.stream, record_format), batch_size):
+        certificates = []
+        for row_number, data, error in rows:
+            received += 1
+            error = error or validate_certificate_data(data)
+            if error:
+                errors.append({'row': row_number, 'message': error})
+                continue
+            certificates.append(Certificate(
+                id=str(uuid.uuid4()),
+                domain_name=data['domain_name'],
+                common_name=data['common_name'],
+                issuer=data['issuer'],
+                valid_from=data.get('valid_from') or now,  # Keep the original issue date when known
+                valid_until=data['valid_until'],
+                fingerprint_sha256=data.get('fingerprint_sha256'),
+                subject_alt_names=subject_alt_names(data)
+            ))
+        certificates_store.add_many(certificates)
+        imported += len(certificates)
     
     return jsonify({
         'status': 'success',
-        'message': 'Certificate deleted successfully'
+        'data': {
+            'received': received,
+            'imported': imported,
+            'failed': len(errors),
+            'errors': errors
+        }
     })
 
-@main.route('/api/v1/certificates/<cert_id>/rotate', methods=['POST'])
-def rotate_certificate(cert_id):
-    """Rotate a certificate (create new with new dates, delete old)"""
-    if cert_id not in certificates_store:
+def certificate_from_fields(fields):
+    """Build a new certificate from fields read out of an X.509 certificate"""
+    return Certificate(
+        id=str(uuid.uuid4()),
+        domain_name=fields['domain_name'],
+        common_name=fields['common_name'],
+        issuer=fields['issuer'],
+        valid_from=fields['valid_from'],
+        valid_until=fields['valid_until'],
+        fingerprint_sha256=fields['fingerprint_sha256'],
+        subject_alt_names=fields['subject_alt_names'],
+        scan_target=fields.get('scan_target')
+    )
+
+@main.route('/api/v1/certificates:upload', methods=['POST'])
+def upload_certificates():
+    """
+    Import X.509 certificates from PEM bundles or DER files, sent as multipart
+    `file` fields or as the raw body. Fields and the fingerprint come from the
+    certificate itself; certificates whose fingerprint is already stored (or
+    repeated in the upload) are skipped.
+    """
+    if request.files:
+        uploads = [upload.read() for upload in request.files.getlist('file')]
+    elif request.mimetype in X509_CONTENT_TYPES:
+        uploads = [request.get_data()]
+    else:
+        return jsonify({
+            'status': 'error',
+            'message': 'Send certificates as multipart "file" fields or a PEM/DER request body'
+        }), 415
+    
+    workers = current_app.config['CERTIFICATE_PARSE_WORKERS']
+    parsed = [result for data in uploads for result in parse_upload(data, workers)]
+    if not parsed:
+        return jsonify({
+            'status': 'error',
+            'message': 'No certificates found in upload'
+        }), 400
+    
+    positions = []
+    certificates = []
+    errors = []
+    for position, (fields, error) in enumerate(parsed):
+        if error:
+            errors.append({'index': position, 'message': error})
+            continue
+        positions.append(position)
+        certificates.append(certificate_from_fields(fields))
+    
+    # Batches are checked against the store one at a time, so later batches
+    # also see fingerprints added by earlier ones
+    batch_size = current_app.config['BULK_IMPORT_BATCH_SIZE']
+    imported = []
+    duplicates = []
+    for start in range(0, len(certificates), batch_size):
+        batch = certificates[start:start + batch_size]
+        added, existing_ids = certificates_store.add_unique(batch)
+        imported.extend(added)
+        for position, certificate, existing_id in zip(positions[start:start + batch_size], batch, existing_ids):
+            if existing_id is not None:
+                duplicates.append({
+                    'index': position,
+                    'fingerprint_sha256': certificate.fingerprint_sha256,
+                    'id': existing_id
+                })
+    
+    now = now_epoch()
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'received': len(parsed),
+            'imported': len(imported),
+            'duplicates': duplicates,
+            'failed': len(errors),
+            'errors': errors,
+            'certificates': [certificate.to_dict(now) for certificate in imported]
+        }
+    }), 201 if imported else 200
+
+def scan_auth_error():
+    """Error response unless the request carries the SCAN_API_TOKEN bearer token"""
+    token = current_app.config['SCAN_API_TOKEN']
+    if not token:
+        return jsonify({
+            'status': 'error',
+            'message': 'Scanning is disabled; set SCAN_API_TOKEN to enable it'
+        }), 403
+    scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(supplied.strip().encode(), token.encode()):
+        response = jsonify({
+            'status': 'error',
+            'message': 'A valid bearer token is required'
+        })
+        response.headers['WWW-Authenticate'] = 'Bearer'
+        return response, 401
+    return None
+
+def run_scan(targets, store, policy, config):
+    """Scan `targets` and record what they serve in `store`; the result of a scan job"""
+    results = scan_targets(targets, config['SCAN_CONCURRENCY'], config['SCAN_TIMEOUT'], config['SCAN_RETRIES'],
+                           policy=policy)
+    
+    reports = []
+    scanned = []
+    for result in results:
+        report = {'target': result.target, 'attempts': result.attempts}
+        reports.append(report)
+        if result.ok:
+            try:
+                scanned.append((report, certificate_from_fields(scanned_fields(result))))
+                continue
+            except ValueError as exc:
+                result.error = f'Invalid certificate: {exc}'
+        report.update(status='failed', error=result.error)
+    
+    outcomes = store.record_scans(certificate for _, certificate in scanned)
+    counts = {'imported': 0, 'renewed': 0, 'unchanged': 0}
+    for (report, certificate), (outcome, cert_id, replaced_id) in zip(scanned, outcomes):
+        counts[outcome] += 1
+        report.update(status=outcome, id=cert_id, fingerprint_sha256=certificate.fingerprint_sha256)
+        if replaced_id is not None:
+            report['replaced_id'] = replaced_id
+    
+    return dict(scanned=len(results), failed=len(results) - len(scanned), results=reports, **counts)
+
+@main.route('/api/v1/scans', methods=['POST'])
+def scan_endpoints():
+    """
+    Queue a job connecting to each "host[:port]" in `targets` and recording the leaf
+    certificate it presents: a new fingerprint replaces the record last captured
+    from the same target ('renewed') or is added ('imported'). Needs the scan bearer
+    token, and every target must be in SCAN_ALLOWED_TARGETS. Returns 202 with the
+    job, to be polled at GET /api/v1/scans/<job_id>.
+    """
+    auth_error = scan_auth_error()
+    if auth_error:
+        return auth_error
+    data = request.get_json(silent=True)
+    targets = data.get('targets') if isinstance(data, dict) else None
+    if not isinstance(targets, list) or not targets or not all(isinstance(t, str) for t in targets):
+        return jsonify({
+            'status': 'error',
+            'message': 'targets must be a non-empty list of "host[:port]" strings'
+        }), 400
+    config = current_app.config
+    max_targets = config['SCAN_MAX_TARGETS']
+    if len(targets) > max_targets:
+        return jsonify({
+            'status': 'error',
+            'message': f'At most {max_targets} targets can be scanned per request'
+        }), 400
+    
+    policy = TargetPolicy.from_setting(config['SCAN_ALLOWED_TARGETS'])
+    rejected = []
+    for target in targets:
+        try:
+            host, _ = parse_target(target)
+        except ValueError as exc:
+            return jsonify({
+                'status': 'error',
+                'message': f'Invalid target {target!r}: {exc}'
+            }), 400
+        if not policy.allows_host(host):
+            rejected.append(target)
+    if rejected:
+        return jsonify({
+            'status': 'error',
+            'message': 'Targets are not in the scan allow-list',
+            'rejected': rejected
+        }), 403
+    
+    store = certificates_store
+    settings = {name: config[name] for name in ('SCAN_CONCURRENCY', 'SCAN_TIMEOUT', 'SCAN_RETRIES')}
+    try:
+        job = scan_jobs.submit(lambda _: run_scan(targets, store, policy, settings), targets)
+    except JobQueueFull as exc:
+        return jsonify({
+            'status': 'error',
+            'message': str(exc)
+        }), 429
+    
+    response = jsonify({'status': 'success', 'data': job})
+    response.headers['Location'] = f"/api/v1/scans/{job['id']}"
+    return response, 202
+
+@main.route('/api/v1/scans/<job_id>', methods=['GET'])
+def get_scan_job(job_id):
+    """Status of a scan job; `result` holds the per-target reports once it is done"""
+    auth_error = scan_auth_error()
+    if auth_error:
+        return auth_error
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Scan job not found'
+        }), 404
+    return jsonify({'status': 'success', 'data': job})
+
+@main.route('/api/v1/certificates/<cert_id>', methods=['DELETE'])
+def delete_certificate(cert_id):
+    """Delete a certificate"""
+    # Removal is the existence check, so concurrent deletes can't both succeed
+    try:
+        certificates_store.remove(cert_id)
+    except KeyError:
         return jsonify({
             'status': 'error',
             'message': 'Certificate not found'
         }), 404
     
-    # Get the existing certificate
-    old_cert = certificates_store[cert_id]
-    
+    return jsonify({
+        'status': 'success',
+        'message': 'Certificate deleted successfully'
+    })
+
+def rotated_copy(old_cert):
+    """Build the replacement for a rotated certificate: same subject, new ID and dates"""
     # Generate new ID and timestamps with timezone info
     new_id = str(uuid.uuid4())
     now = datetime.now(tz.tzutc()).isoformat()
     valid_until = (datetime.now(tz.tzutc()) + timedelta(days=365)).isoformat()  # 1 year from now
     
     # Create new certificate with same data but new ID and dates
-    new_cert = Certificate(
+    return Certificate(
         id=new_id,
         domain_name=old_cert.domain_name,
         common_name=old_cert.common_name,
         issuer=old_cert.issuer,
         valid_from=now,  # Set to current time on rotation
         valid_until=valid_until,
-        fingerprint_sha256=None  # Will be auto-generated
+        fingerprint_sha256=None,  # Will be auto-generated
+        subject_alt_names=old_cert.subject_alt_names,
+        scan_target=old_cert.scan_target
     )
+
+@main.route('/api/v1/certificates/<cert_id>/rotate', methods=['POST'])
+def rotate_certificate(cert_id):
+    """Rotate a certificate (create new with new dates, delete old)"""
+    # The store swaps old for new atomically; a concurrent rotation or delete of the
+    # same ID makes this one fail with KeyError instead of duplicating the certificate
+    try:
+        new_cert = certificates_store.rotate(cert_id, rotated_copy)
+    except KeyError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Certificate not found'
+        }), 404
     
-    # Store the new certificate
-    certificates_store[new_id] = new_cert
+    return jsonify({
+        'status': 'success',
+        'data': new_cert.to_dict()
+    }), 201
+
+def rotation_query(selector, now):
+    """Translate a rotate-batch selector into scan() arguments that use the store's indexes"""
+    ranges = None
+    if selector['statuses'] is not None:
+        ranges = status_key_ranges(selector['statuses'], now, current_app.config['STATUS_WARNING_DAYS'])
+    cutoff = expiry_cutoff(selector, now)
+    if cutoff is not None:
+        ranges = intersect_key_ranges(ranges, None, (0, cutoff))
+    query = {'ranges': ranges, 'issuer': selector['issuer']}
+    if selector['domain_suffix'] is not None:
+        query.update(domain=selector['domain_suffix'], domain_match='suffix')
+    return query
+
+@main.route('/api/v1/certificates/rotate-batch', methods=['POST'])
+def rotate_certificates_batch():
+    """
+    Rotate every certificate matching a selector (status, expiring_within_days,
+    issuer, domain_suffix; optional limit) in batched store writes. With
+    "dry_run": true only the matches are reported. Progress is reported per batch,
+    streamed as NDJSON lines when the client accepts application/x-ndjson.
+    """
+    try:
+        selector = parse_rotation_selector(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    now = now_epoch()
+    query = rotation_query(selector, now)
+    # Matches are collected before rotating, so replacements never match again
+    matches = [cert for _, cert in islice(certificates_store.scan(**query), selector['limit'])]
+    
+    if selector['dry_run']:
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'dry_run': True,
+                'matched': len(matches),
+                'certificates': [cert.to_dict(status=status) for cert, status in with_statuses(matches, now)]
+            }
+        })
     
-    # Delete the old certificate
-    del certificates_store[cert_id]
+    batch_size = current_app.config['ROTATE_BATCH_SIZE']
     
+    def rotate_batches():
+        rotated = skipped = 0
+        for number, batch in enumerate(batched(matches, batch_size), 1):
+            replacements = [(cert.id, rotated_copy(cert)) for cert in batch]
+            done = {cert.id for cert in certificates_store.replace_many(replacements)}
+            # Certificates deleted or rotated concurrently since matching are skipped
+            swaps = [{'old_id': old_id, 'id': cert.id} for old_id, cert in replacements if cert.id in done]
+            rotated += len(swaps)
+            skipped += len(batch) - len(swaps)
+            yield {'batch': number, 'rotated': rotated, 'skipped': skipped, 'matched': len(matches),
+                   'certificates': swaps}
+    
+    if request.accept_mimetypes.best == RECORD_FORMATS['ndjson'][0]:
+        def generate_progress():
+            progress = {'rotated': 0, 'skipped': 0}
+            for progress in rotate_batches():
+                yield json.dumps(progress) + '\n'
+            yield json.dumps({'done': True, 'matched': len(matches), 'rotated': progress['rotated'],
+                              'skipped': progress['skipped']}) + '\n'
+        return Response(stream_with_context(generate_progress()), mimetype=RECORD_FORMATS['ndjson'][0])
+    
+    batches = list(rotate_batches())
     return jsonify({
         'status': 'success',
-        'data': new_cert.to_dict()
-    }), 201
\ No newline at end of file
+        'data': {
+            'dry_run': False,
+            'matched': len(matches),
+            'rotated': batches[-1]['rotated'] if batches else 0,
+            'skipped': batches[-1]['skipped'] if batches else 0,
+            'batches': [{key: value for key, value in progress.items() if key != 'certificates'}
+                        for progress in batches],
+            'certificates': [swap for progress in batches for swap in progress['certificates']]
+        }
+    })
@@ -0,0 +1,8 @@
+# Import the asyncio TLS scanner
+from .tls_scanner import (ScanResult, TargetNotAllowed, TargetPolicy, canonical_target, parse_target, scan_targets,
+                          scan_targets_async, scanned_fields)
+from .jobs import JobQueueFull, ScanJobs
+
+# Make the scanner available when importing from this package
+__all__ = ['JobQueueFull', 'ScanJobs', 'ScanResult', 'TargetNotAllowed', 'TargetPolicy', 'canonical_target',
+           'parse_target', 'scan_targets', 'scan_targets_async', 'scanned_fields']
@@ -0,0 +1,77 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(Exception):
+    """Too many scan jobs are waiting to run"""
+
+
+class ScanJobs:
+    """
+    Runs scan jobs in the background, one at a time (each job already scans its
+    targets concurrently), so a scan request returns as soon as its job is queued.
+    Jobs are kept by ID for polling; the oldest finished ones are dropped once more
+    than `history` have finished.
+    """
+
+    def __init__(self, max_queued=10, history=100):
+        self.max_queued = max_queued
+        self.history = history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, work, targets):
+        """
+        Queue `work(job)` for a new job scanning `targets` and return a copy of the
+        job. Raises JobQueueFull if max_queued jobs are already waiting.
+        """
+        job = {
+            'id': str(uuid.uuid4()),
+            'status': 'queued',
+            'targets': len(targets),
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        with self._lock:
+            if sum(queued['status'] == 'queued' for queued in self._jobs.values()) >= self.max_queued:
+                raise JobQueueFull(f'{self.max_queued} scan jobs are already waiting')
+            self._jobs[job['id']] = job
+            self._prune()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scan-job')
+            self._executor.submit(self._run, job, work)
+            return dict(job)
+
+    def get(self, job_id):
+        """Copy of a job by ID, or None if it is unknown or was pruned"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _run(self, job, work):
+        with self._lock:
+            job.update(status='running', started_at=time.time())
+        try:
+            result = work(job)
+        except Exception as exc:
+            with self._lock:
+                job.update(status='failed', error=str(exc), finished_at=time.time())
+        else:
+            with self._lock:
+                job.update(status='done', result=result, finished_at=time.time())
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
@@ -0,0 +1,225 @@
+"""
+Discover certificates by connecting to TLS endpoints.
+
+Handshakes run on one asyncio event loop with a semaphore bounding how many are
+in flight, so thousands of endpoints can be scanned from a single thread. The
+scanner only records what a server presents: the leaf is fetched without
+verification, since expired or self-signed certificates are exactly the ones the
+inventory needs to know about.
+
+Scans started through the API are limited by a TargetPolicy: only allow-listed
+hosts are scanned, and each connection goes to an address checked after
+resolution, so an allowed name can't be pointed at internal services.
+"""
+import asyncio
+import ipaddress
+import socket
+import ssl
+
+from utils.x509_parser import certificate_fields
+
+DEFAULT_PORT = 443
+
+
+class ScanResult:
+    """Outcome of scanning one target: the leaf certificate as DER, or an error"""
+
+    __slots__ = ('target', 'host', 'port', 'der', 'error', 'attempts')
+
+    def __init__(self, target, host, port, der=None, error=None, attempts=0):
+        self.target = target
+        self.host = host
+        self.port = port
+        self.der = der
+        self.error = error
+        self.attempts = attempts
+
+    @property
+    def ok(self):
+        return self.der is not None
+
+
+class TargetNotAllowed(Exception):
+    """A target, or every address it resolves to, is outside the scan allow-list"""
+
+
+class TargetPolicy:
+    """
+    Allow-list for scan targets. Entries are host names ('example.com'), domain
+    wildcards ('*.example.com': any name below example.com) and IP networks or
+    addresses ('10.0.0.0/8', '192.0.2.10'). A target's host must be a listed name
+    or an address in a listed network, and the address it is reached at must be
+    public or in a listed network: private, loopback and link-local addresses
+    (cloud metadata services included) are only scanned when listed explicitly.
+    """
+
+    def __init__(self, entries=()):
+        self.names = set()
+        self.suffixes = []
+        self.networks = []
+        for entry in entries:
+            entry = entry.strip().lower().rstrip('.')
+            if not entry:
+                continue
+            try:
+                self.networks.append(ipaddress.ip_network(entry, strict=False))
+                continue
+            except ValueError:
+                pass
+            if entry.startswith('*.'):
+                self.suffixes.append(entry[1:])
+            else:
+                self.names.add(entry)
+
+    @classmethod
+    def from_setting(cls, value):
+        """Policy from a comma-separated list of entries (an empty setting allows nothing)"""
+        return cls((value or '').split(','))
+
+    def __bool__(self):
+        return bool(self.names or self.suffixes or self.networks)
+
+    def in_networks(self, address):
+        address = ipaddress.ip_address(address)
+        return any(address in network for network in self.networks)
+
+    def allows_host(self, host):
+        """Whether `host` (a name or an IP literal) may be scanned at all"""
+        try:
+            return self.in_networks(host)
+        except ValueError:
+            pass
+        host = host.lower().rstrip('.')
+        return host in self.names or any(host.endswith(suffix) for suffix in self.suffixes)
+
+    def allows_address(self, address):
+        """Whether a connection may be made to `address`, the host resolved"""
+        return ipaddress.ip_address(address).is_global or self.in_networks(address)
+
+
+def parse_target(target, default_port=DEFAULT_PORT):
+    """Split 'host', 'host:port' or '[v6addr]:port' into (host, port); raises ValueError"""
+    target = target.strip()
+    if target.startswith('['):
+        host, _, rest = target[1:].partition(']')
+        port = rest[1:] if rest.startswith(':') else ''
+    elif target.count(':') == 1:
+        host, port = target.split(':')
+    else:
+        host, port = target, ''
+    if not host:
+        raise ValueError(f'Invalid target: {target!r}')
+    port = int(port) if port else default_port
+    if not 0 < port < 65536:
+        raise ValueError(f'Invalid port in target: {target!r}')
+    return host, port
+
+
+def canonical_target(host, port):
+    """'host:port' form a scanned certificate is linked to ('[v6addr]:port' for IPv6)"""
+    host = host.lower().rstrip('.')
+    return f'[{host}]:{port}' if ':' in host else f'{host}:{port}'
+
+
+def scanner_ssl_context():
+    """Client context that accepts any certificate; the scanner inspects, it does not trust"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def resolve_address(host, port, policy, timeout):
+    """First address of `host` the policy allows connecting to; raises TargetNotAllowed if there is none"""
+    loop = asyncio.get_running_loop()
+    infos = await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+    for info in infos:
+        address = info[4][0]
+        if policy.allows_address(address):
+            return address
+    raise TargetNotAllowed(f'{host} only resolves to addresses outside the scan allow-list')
+
+
+async def fetch_leaf_certificate(host, port, context, timeout, policy=None):
+    """
+    Perform one TLS handshake and return the server's leaf certificate as DER. With
+    a `policy`, the host is resolved first and only an allowed address is dialled.
+    """
+    # SNI is only sent for names, not IP literals
+    try:
+        ipaddress.ip_address(host)
+        server_hostname = None
+    except ValueError:
+        server_hostname = host
+    address = host if policy is None else await resolve_address(host, port, policy, timeout)
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(address, port, ssl=context, server_hostname=server_hostname),
+        timeout
+    )
+    try:
+        der = writer.get_extra_info('ssl_object').getpeercert(binary_form=True)
+    finally:
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), timeout)
+        except (OSError, asyncio.TimeoutError, ssl.SSLError):
+            pass
+    if not der:
+        raise ssl.SSLError('Server presented no certificate')
+    return der
+
+
+async def scan_target(target, semaphore, context, timeout, retries, backoff, policy=None):
+    """Scan one target, retrying connection failures and timeouts with exponential backoff"""
+    try:
+        host, port = parse_target(target)
+    except ValueError as exc:
+        return ScanResult(target, None, None, error=str(exc))
+    result = ScanResult(target, host, port)
+    if policy is not None and not policy.allows_host(host):
+        result.error = 'Target is not in the scan allow-list'
+        return result
+    for attempt in range(retries + 1):
+        result.attempts = attempt + 1
+        async with semaphore:
+            try:
+                result.der = await fetch_leaf_certificate(host, port, context, timeout, policy)
+                result.error = None
+                return result
+            except TargetNotAllowed as exc:
+                result.error = str(exc)
+                return result
+            except asyncio.TimeoutError:
+                result.error = f'Timed out after {timeout}s'
+            except (OSError, ssl.SSLError) as exc:
+                result.error = str(exc) or exc.__class__.__name__
+        if attempt < retries:
+            # Back off outside the semaphore so waiting does not hold a slot
+            await asyncio.sleep(backoff * 2 ** attempt)
+    return result
+
+
+async def scan_targets_async(targets, concurrency=200, timeout=5.0, retries=1, backoff=0.5, policy=None):
+    """
+    Scan every target concurrently; results keep the order of `targets`. With a
+    TargetPolicy, targets it doesn't allow fail without a connection being made.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    context = scanner_ssl_context()
+    return await asyncio.gather(*(
+        scan_target(target, semaphore, context, timeout, retries, backoff, policy) for target in targets
+    ))
+
+
+def scan_targets(targets, concurrency=200, timeout=5.0, retries=1, backoff=0.5, policy=None):
+    """Blocking wrapper around scan_targets_async for background jobs and scripts"""
+    return asyncio.run(scan_targets_async(targets, concurrency, timeout, retries, backoff, policy))
+
+
+def scanned_fields(result):
+    """Certificate record fields for a successful scan, falling back to the host as the domain"""
+    fields = certificate_fields(result.der)
+    fields['domain_name'] = fields['domain_name'] or result.host
+    fields['common_name'] = fields['common_name'] or result.host
+    fields['scan_target'] = canonical_target(result.host, result.port)
+    return fields
@@ -0,0 +1,14 @@
+# Import the certificate repositories and cursor helpers
+from .base import CertificateRepository, intersect_key_ranges, sort_key, status_key_ranges, transition_key_ranges
+from .memory import CertificateStore
+from .domain_index import DOMAIN_MATCH_MODES, DomainIndex
+from .summary import StatusSummary
+from .change_feed import ChangeFeed, FeedWait
+from .wal import WriteAheadLog, open_store
+from .factory import create_store
+from .cursor import encode_cursor, decode_cursor
+
+# Make the stores available when importing from this package
+__all__ = ['CertificateRepository', 'CertificateStore', 'ChangeFeed', 'DOMAIN_MATCH_MODES', 'DomainIndex', 'FeedWait',
+           'StatusSummary', 'WriteAheadLog', 'create_store', 'intersect_key_ranges', 'sort_key', 'status_key_ranges',
+           'transition_key_ranges', 'encode_cursor', 'decode_cursor', 'open_store']
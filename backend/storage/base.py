@@ -0,0 +1,284 @@
+from abc import ABC, abstractmethod
+
+from models.certificate_status import warning_window
+
+from .domain_index import domain_matches
+
+
+def sort_key(certificate):
+    """
+    Position of a certificate in expiry order: (group, expires_at, id). Group 0 holds
+    certificates with a parseable valid_until, group 1 keeps undated/invalid ones at
+    the end. The ID breaks ties so the order is total, which keyset pagination relies on.
+    """
+    expires_at = certificate.expires_at
+    if expires_at is None:
+        return (1, 0, certificate.id)
+    return (0, expires_at, certificate.id)
+
+
+def status_key_ranges(statuses, now, warning_days):
+    """
+    Map a set of status labels onto [low, high) ranges of the expiry order.
+    Status is a function of expiry alone, so filtering by status never has to
+    look at certificates outside the matching ranges.
+    """
+    warning_start = now + warning_window(warning_days)
+    ranges = []
+    if 'expired' in statuses:
+        ranges.append(((0,), (0, now)))
+    if 'warning' in statuses:
+        ranges.append(((0, now), (0, warning_start)))
+    if 'active' in statuses:
+        # Undated/invalid certificates (group 1) are always active
+        ranges.append(((0, warning_start), None))
+    return ranges
+
+
+def intersect_key_ranges(ranges, low, high):
+    """
+    Clip [low, high) ranges of the expiry order to [low, high) (None = unbounded).
+    `ranges` of None means the whole order. Empty results are dropped.
+    """
+    clipped = []
+    for range_low, range_high in ranges if ranges is not None else [((0,), None)]:
+        new_low = max(range_low, low) if low is not None else range_low
+        if high is None:
+            new_high = range_high
+        else:
+            new_high = high if range_high is None else min(range_high, high)
+        if new_high is None or new_low < new_high:
+            clipped.append((new_low, new_high))
+    return clipped
+
+
+def transition_key_ranges(start, end, warning_days):
+    """
+    Key ranges holding the certificates whose status changes in (start, end]:
+    those that expire (start <= expires_at < end) or enter the warning window
+    (start + window <= expires_at < end + window).
+    """
+    if end <= start:
+        return []
+    window = warning_window(warning_days)
+    if start + window <= end:
+        return [((0, start), (0, end + window))]
+    return [((0, start), (0, end)), ((0, start + window), (0, end + window))]
+
+
+def attribute_predicate(domain=None, issuer=None, domain_match='exact'):
+    """
+    Build a predicate for the domain/issuer filters (case-insensitive; the domain
+    matches domain_name, common_name or a SAN using the DomainIndex match modes).
+    None if there is no filter.
+    """
+    if domain is None and issuer is None:
+        return None
+    issuer = issuer.lower() if issuer else None
+
+    def matches(certificate):
+        if domain is not None and not any(domain_matches(name, domain, domain_match)
+                                          for name in certificate.domain_names()):
+            return False
+        if issuer is not None and (certificate.issuer or '').lower() != issuer:
+            return False
+        return True
+    return matches
+
+
+def split_new(certificates, known):
+    """
+    Separate certificates whose fingerprint is not in `known` (fingerprint -> ID)
+    and not repeated earlier in the batch. Returns (new, existing_ids), where
+    existing_ids lines up with `certificates` and holds the ID already holding
+    each skipped fingerprint, or None for certificates that are new.
+    """
+    known = dict(known)
+    new = []
+    existing_ids = []
+    for certificate in certificates:
+        existing_id = known.get(certificate.fingerprint_sha256)
+        existing_ids.append(existing_id)
+        if existing_id is None:
+            known[certificate.fingerprint_sha256] = certificate.id
+            new.append(certificate)
+    return new, existing_ids
+
+
+class CertificateRepository(ABC):
+    """
+    Storage interface used by the routes. Implementations keep certificates in
+    expiry order (see sort_key) and expose a `version` that every mutation bumps.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """
+        Call `listener(action, added, removed_ids, version)` after every mutation.
+        `action` is 'create', 'import', 'delete', 'rotate' or 'clear'; `added` holds
+        the new certificates and `removed_ids` the IDs that went away.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, action, added=(), removed_ids=(), version=None):
+        for listener in self._listeners:
+            listener(action, added, removed_ids, version)
+
+    @property
+    @abstractmethod
+    def version(self):
+        """Monotonically increasing mutation counter"""
+
+    @abstractmethod
+    def __contains__(self, cert_id):
+        pass
+
+    @abstractmethod
+    def __getitem__(self, cert_id):
+        """Return a certificate, raising KeyError if it does not exist"""
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    def get(self, cert_id, default=None):
+        try:
+            return self[cert_id]
+        except KeyError:
+            return default
+
+    @abstractmethod
+    def add(self, certificate):
+        """Insert a certificate, replacing any existing one with the same ID"""
+
+    @abstractmethod
+    def add_many(self, certificates):
+        """Insert a batch of certificates in one operation"""
+
+    def add_unique(self, certificates):
+        """
+        Add only the certificates whose fingerprint is not stored yet; see
+        split_new() for the (added, existing_ids) result.
+        """
+        certificates = list(certificates)
+        known = self.find_fingerprints(certificate.fingerprint_sha256 for certificate in certificates)
+        added, existing_ids = split_new(certificates, known)
+        if added:
+            self.add_many(added)
+        return added, existing_ids
+
+    def record_scans(self, certificates):
+        """
+        Store certificates captured by the TLS scanner (scan_target set). Each one is
+        'unchanged' if its fingerprint is already stored, 'renewed' if it replaces the
+        record last captured from the same target, or 'imported'. A stored copy found
+        by fingerprint also retires a different record still linked to that target,
+        since the target no longer serves it. Returns (outcome, id, replaced_id)
+        tuples lining up with `certificates`. Implementations run one call at a time,
+        so concurrent scans of a target each see the other's result.
+        """
+        certificates = list(certificates)
+        known = self.find_fingerprints(certificate.fingerprint_sha256 for certificate in certificates)
+        previous = self.find_scan_targets(certificate.scan_target for certificate in certificates)
+        outcomes = []
+        added = []
+        swaps = []
+        retired = []
+        for certificate in certificates:
+            previous_id = previous.pop(certificate.scan_target, None)
+            existing_id = known.get(certificate.fingerprint_sha256)
+            if existing_id is not None:
+                if previous_id is not None and previous_id != existing_id:
+                    retired.append(previous_id)
+                outcomes.append(('unchanged', existing_id, previous_id if previous_id != existing_id else None))
+                continue
+            known[certificate.fingerprint_sha256] = certificate.id
+            if previous_id is not None:
+                swaps.append((previous_id, certificate))
+                outcomes.append(('renewed', certificate.id, previous_id))
+            else:
+                added.append(certificate)
+                outcomes.append(('imported', certificate.id, None))
+        if swaps:
+            # A record deleted since the lookup has nothing left to replace
+            swapped = {certificate.id for certificate in self.replace_many(swaps)}
+            for position, (outcome, cert_id, previous_id) in enumerate(outcomes):
+                if outcome == 'renewed' and cert_id not in swapped:
+                    outcomes[position] = ('imported', cert_id, None)
+            added.extend(certificate for _, certificate in swaps if certificate.id not in swapped)
+        if added:
+            self.add_many(added)
+        for cert_id in retired:
+            try:
+                self.remove(cert_id)
+            except KeyError:
+                pass
+        return outcomes
+
+    @abstractmethod
+    def remove(self, cert_id):
+        """Remove and return a certificate, raising KeyError if it does not exist"""
+
+    @abstractmethod
+    def replace(self, old_id, certificate):
+        """Swap an existing certificate for a new one in one operation (used by rotation)"""
+
+    @abstractmethod
+    def replace_many(self, replacements):
+        """
+        Apply (old_id, certificate) swaps as one batch. Old IDs that no longer
+        exist are skipped; returns the certificates that were swapped in.
+        """
+
+    def rotate(self, cert_id, build):
+        """
+        Replace a certificate with `build(old_certificate)` as one operation, raising
+        KeyError if it does not exist or was removed concurrently.
+        """
+        certificate = build(self[cert_id])
+        return self.replace(cert_id, certificate)
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def find_fingerprints(self, fingerprints):
+        """Map each of `fingerprints` that is already stored to the ID holding it"""
+
+    @abstractmethod
+    def find_scan_targets(self, targets):
+        """Map each of `targets` that a stored certificate was scanned from to that certificate's ID"""
+
+    @abstractmethod
+    def next_transition(self, now, warning_days):
+        """Earliest epoch after `now` at which any certificate changes status, or None"""
+
+    @abstractmethod
+    def scan(self, after=None, ranges=None, domain=None, issuer=None, chunk_size=1000, domain_match='exact'):
+        """
+        Yield (key, certificate) pairs in expiry order, starting after the key `after`,
+        restricted to the [low, high) key `ranges` (see status_key_ranges) and to the
+        domain/issuer filters. `domain_match` is one of DOMAIN_MATCH_MODES.
+        """
+
+    def page(self, after=None, limit=None, ranges=None, domain=None, issuer=None, domain_match='exact'):
+        """
+        Return up to `limit` matching certificates in expiry order that sort after the
+        key `after`, plus the key of the last one returned when more remain.
+        """
+        chunk_size = limit + 1 if limit is not None else 1000
+        page, last_key = [], None
+        for key, certificate in self.scan(after, ranges, domain, issuer, chunk_size, domain_match):
+            if limit is not None and len(page) == limit:
+                # One more match exists, so the page gets a continuation key
+                return page, last_key
+            page.append(certificate)
+            last_key = key
+        return page, None
+
+    def ordered(self):
+        """Iterate over certificates in ascending expiry order"""
+        return (certificate for _, certificate in self.scan())
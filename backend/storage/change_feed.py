@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from collections import deque
+
+from models.certificate_status import now_epoch
+
+
+class FeedWait:
+    """
+    Yielded by a change stream where it waits for the feed to move past `version`
+    (or `timeout` seconds). Whoever serves the stream does the waiting: a thread
+    with ChangeFeed.wait, the event loop with ChangeFeed.wait_async.
+    """
+    __slots__ = ('version', 'timeout')
+
+    def __init__(self, version, timeout):
+        self.version = version
+        self.timeout = timeout
+
+
+class ChangeFeed:
+    """
+    Bounded history of store mutations, keyed by store version.
+
+    Subscribe `store_changed` to a repository (see attach) and clients can ask for
+    every change after a version they already have, or block until one arrives.
+    Only the last `max_events` mutations are kept; a client further behind than
+    that has to reload the full list. Threads wait with `wait`, event-loop code
+    with `wait_async`, which holds no thread while it waits.
+    """
+
+    def __init__(self, max_events=1000):
+        self._events = deque(maxlen=max_events)
+        self._condition = threading.Condition()
+        self._version = 0
+        # Oldest version a client can resume from, and when each retained version was reached
+        self._floor = 0
+        self._floor_time = now_epoch()
+        # (loop, future) pairs of wait_async callers, woken on every change
+        self._waiters = set()
+
+    @property
+    def version(self):
+        return self._version
+
+    def attach(self, store):
+        """Start recording `store`'s mutations, forgetting any previous history"""
+        with self._condition:
+            self._events.clear()
+            self._version = self._floor = store.version
+            self._floor_time = now_epoch()
+            self._notify()
+        store.subscribe(self.store_changed)
+
+    def store_changed(self, action, added, removed_ids, version):
+        """Repository listener recording each mutation"""
+        with self._condition:
+            if len(self._events) == self._events.maxlen:
+                oldest = self._events[0]
+                self._floor, self._floor_time = oldest['version'], oldest['time']
+            self._events.append({
+                'version': version,
+                'time': now_epoch(),
+                'action': action,
+                'added': tuple(added),
+                'removed_ids': tuple(removed_ids),
+            })
+            self._version = version
+            self._notify()
+
+    def since(self, version):
+        """
+        Changes after `version` as (events, reached_at), where reached_at is when the
+        store was at `version` (the start of the status-transition window).
+        Returns None if `version` is older than the retained history or unknown.
+        """
+        with self._condition:
+            if version < self._floor or version > self._version:
+                return None
+            reached_at = self._floor_time
+            events = []
+            for event in self._events:
+                if event['version'] <= version:
+                    reached_at = event['time']
+                else:
+                    events.append(event)
+            return events, reached_at
+
+    def wait(self, version, timeout):
+        """Block until the feed moves past `version` or `timeout` seconds pass; True if it moved"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._version != version, timeout)
+
+    async def wait_async(self, version, timeout):
+        """`wait` for asyncio code: suspends the calling task instead of blocking a thread"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._condition:
+            if self._version != version:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._waiters.discard(waiter)
+        return self._version != version
+
+    def _notify(self):
+        # Callers hold self._condition
+        self._condition.notify_all()
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,20 @@
+import base64
+import json
+
+
+def encode_cursor(key):
+    """Encode an index key (group, expires_at, id) as an opaque URL-safe cursor"""
+    raw = json.dumps(list(key), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        group, expires_at, cert_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {token}') from e
+    if group not in (0, 1) or not isinstance(expires_at, int) or not isinstance(cert_id, str):
+        raise ValueError(f'Invalid cursor: {token}')
+    return (group, expires_at, cert_id)
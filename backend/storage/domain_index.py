@@ -0,0 +1,130 @@
+# Supported `match` modes for domain queries
+DOMAIN_MATCH_MODES = ('exact', 'suffix', 'wildcard')
+
+
+def normalize_domain(name):
+    """Lower-case a domain name and drop any trailing dot; None is treated as empty"""
+    if name is None:
+        return ''
+    if not isinstance(name, str):
+        raise TypeError(f'Domain names must be strings, not {type(name).__name__}')
+    return name.strip().lower().rstrip('.')
+
+
+def indexed_names(names):
+    """Distinct non-empty normalized names; raises TypeError if any name is not a string"""
+    return set(filter(None, map(normalize_domain, names)))
+
+
+def reversed_labels(name):
+    """'a.example.com' -> ['com', 'example', 'a']"""
+    name = normalize_domain(name)
+    return name.split('.')[::-1] if name else []
+
+
+def wildcard_parent(pattern):
+    """'*.example.com' -> 'example.com'; a pattern without '*.' is its own parent"""
+    pattern = normalize_domain(pattern)
+    return pattern[2:] if pattern.startswith('*.') else pattern
+
+
+def domain_matches(name, query, mode):
+    """Reference implementation of the DomainIndex match modes for a single name"""
+    name, query = normalize_domain(name), normalize_domain(query)
+    if not name:
+        return False
+    if mode == 'exact':
+        return name == query
+    if mode == 'suffix':
+        return name == query or name.endswith('.' + query)
+    parent = wildcard_parent(query)
+    return name.endswith('.' + parent) and '.' not in name[:-len(parent) - 1]
+
+
+class _Node:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+
+
+class DomainIndex:
+    """
+    Trie over reversed domain labels (com -> example -> www) mapping names to
+    certificate IDs. Lookups walk one node per label of the query, so their cost
+    depends on the query and the number of matches, not on the inventory size.
+
+    Match modes:
+    - exact:    certificates for exactly that name
+    - suffix:   that name and everything under it ('example.org' finds
+                'example.org', 'a.example.org', '*.b.example.org', ...)
+    - wildcard: what a '*.' pattern covers: '*.payments.example.com' finds the
+                wildcard certificate itself and single-label children such as
+                'api.payments.example.com'
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, cert_id, names):
+        for name in indexed_names(names):
+            node = self._root
+            for label in reversed_labels(name):
+                node = node.children.setdefault(label, _Node())
+            node.ids.add(cert_id)
+
+    def remove(self, cert_id, names):
+        for name in indexed_names(names):
+            self._remove_path(cert_id, reversed_labels(name))
+
+    def _remove_path(self, cert_id, labels):
+        # Walk down remembering the path so empty branches can be pruned
+        path = [self._root]
+        for label in labels:
+            node = path[-1].children.get(label)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].ids.discard(cert_id)
+        for depth in range(len(labels), 0, -1):
+            node = path[depth]
+            if node.ids or node.children:
+                break
+            del path[depth - 1].children[labels[depth - 1]]
+
+    def clear(self):
+        self._root = _Node()
+
+    def _find(self, name):
+        node = self._root
+        for label in reversed_labels(name):
+            node = node.children.get(label)
+            if node is None:
+                return None
+        return node
+
+    def lookup(self, query, mode='exact'):
+        """Return the set of certificate IDs matching `query` in the given mode"""
+        if mode == 'wildcard':
+            node = self._find(wildcard_parent(query))
+            if node is None:
+                return set()
+            ids = set()
+            for child in node.children.values():
+                ids |= child.ids
+            return ids
+
+        node = self._find(query)
+        if node is None:
+            return set()
+        if mode == 'exact':
+            return set(node.ids)
+
+        ids = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            ids |= node.ids
+            stack.extend(node.children.values())
+        return ids
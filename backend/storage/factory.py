@@ -0,0 +1,30 @@
+import atexit
+
+from .memory import CertificateStore
+from .wal import open_store
+
+
+def create_store(config):
+    """Build the certificate store selected by CERTIFICATE_STORE in the app config"""
+    backend = config.get('CERTIFICATE_STORE', 'memory')
+    if backend == 'memory':
+        if not config.get('STORE_DATA_DIR'):
+            return CertificateStore()
+        # Restored from the latest snapshot and log tail, and logged from here on
+        store, log = open_store(
+            config['STORE_DATA_DIR'],
+            fsync=config.get('STORE_FSYNC', 'interval'),
+            fsync_interval=config.get('STORE_FSYNC_INTERVAL', 1.0),
+            snapshot_every=config.get('STORE_SNAPSHOT_EVERY', 100_000)
+        )
+        atexit.register(log.close)
+        return store
+    if backend == 'sql':
+        # Imported lazily so the in-memory store works without SQLAlchemy installed
+        from .sql import SQLCertificateStore
+        return SQLCertificateStore(
+            config['SQLALCHEMY_DATABASE_URI'],
+            pool_size=config.get('SQLALCHEMY_POOL_SIZE', 5),
+            max_overflow=config.get('SQLALCHEMY_MAX_OVERFLOW', 10)
+        )
+    raise ValueError(f'Unknown CERTIFICATE_STORE: {backend}')
@@ -0,0 +1,33 @@
+import threading
+from contextlib import contextmanager
+
+
+class StripedLock:
+    """
+    Fixed pool of locks selected by hashing a key. Operations on the same key always
+    serialize, while operations on different keys rarely contend, without keeping a
+    lock object per key.
+    """
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def for_key(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+    @contextmanager
+    def for_keys(self, keys):
+        """
+        Hold the locks of every key at once. Each stripe is taken once, in stripe
+        order, so two batches with overlapping keys can't deadlock each other.
+        """
+        stripes = sorted({hash(key) % len(self._locks) for key in keys})
+        acquired = []
+        try:
+            for stripe in stripes:
+                self._locks[stripe].acquire()
+                acquired.append(self._locks[stripe])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
@@ -0,0 +1,402 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from models.certificate_status import warning_window
+
+from .base import CertificateRepository, attribute_predicate, sort_key, split_new
+from .domain_index import DomainIndex, indexed_names
+from .locks import StripedLock
+
+
+class CertificateStore(CertificateRepository):
+    """
+    In-memory certificate store with an index ordered by expiry date.
+
+    Safe for threaded servers: per-certificate read-modify-write sequences (delete,
+    rotate) hold a striped lock keyed by certificate ID, and only the short index
+    update itself takes the shared index lock. Reads take no locks; dict lookups,
+    bisections and list slices are atomic under the GIL.
+    """
+
+    def __init__(self, stripes=64):
+        super().__init__()
+        self._certificates = {}
+        # Sorted list of sort_key() tuples: (group, expires_at, id). Certificates are
+        # never modified, so a certificate's key is recomputed rather than stored
+        self._index = []
+        # Reversed-label trie over every name (domain_name, common_name, SANs); None until first
+        # needed after a bulk load (see _domain_index)
+        self._domains = DomainIndex()
+        # fingerprint_sha256 -> ID, for upload deduplication, and scan_target -> ID of
+        # the certificate last captured there; like the trie, None after a bulk load
+        # until first needed (see _fingerprint_index, _target_index)
+        self._fingerprints = {}
+        self._targets = {}
+        # Bumped on every mutation; drives ETags and response cache invalidation
+        self._version = 0
+        self._id_locks = StripedLock(stripes)
+        # Always acquired after any ID lock, never before
+        self._index_lock = threading.Lock()
+        # Called with each mutation before it is applied (see set_journal)
+        self._journal = None
+        # Serializes record_scans, whose lookups and writes take the index lock separately
+        self._scan_lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def __contains__(self, cert_id):
+        return cert_id in self._certificates
+
+    def __getitem__(self, cert_id):
+        return self._certificates[cert_id]
+
+    def __len__(self):
+        return len(self._certificates)
+
+    def get(self, cert_id, default=None):
+        return self._certificates.get(cert_id, default)
+
+    def values(self):
+        return self._certificates.values()
+
+    def set_journal(self, journal):
+        """
+        Call `journal(action, added, removed_ids, version)` with every mutation before
+        it is applied, e.g. to write it ahead to a log. If the journal raises, the
+        mutation is abandoned and the store is left unchanged. Listeners are still
+        notified after the change, as usual.
+        """
+        self._journal = journal
+
+    def add(self, certificate):
+        entry = self._entry(certificate)
+        with self._id_locks.for_key(certificate.id), self._index_lock:
+            self._log('create', (certificate,))
+            self._insert(certificate, entry)
+            self._version += 1
+            self._notify('create', (certificate,), (), self._version)
+        return certificate
+
+    def add_many(self, certificates):
+        """Insert a batch of certificates with a single merge into the index"""
+        certificates = list(certificates)
+        if not certificates:
+            # Nothing to journal, version or announce
+            return certificates
+        entries = list(map(self._entry, certificates))
+        with self._index_lock:
+            self._log('import', certificates)
+            self._insert_many(certificates, entries)
+            self._version += 1
+            self._notify('import', certificates, (), self._version)
+        return certificates
+
+    def add_unique(self, certificates):
+        # The fingerprint check and the insert share the index lock, so concurrent
+        # uploads of the same certificate cannot both add it
+        certificates = list(certificates)
+        with self._index_lock:
+            fingerprints = self._fingerprint_index()
+            added, existing_ids = split_new(certificates, {
+                certificate.fingerprint_sha256: fingerprints[certificate.fingerprint_sha256]
+                for certificate in certificates if certificate.fingerprint_sha256 in fingerprints})
+            if added:
+                entries = list(map(self._entry, added))
+                self._log('import', added)
+                self._insert_many(added, entries)
+                self._version += 1
+                self._notify('import', added, (), self._version)
+        return added, existing_ids
+
+    def record_scans(self, certificates):
+        with self._scan_lock:
+            return super().record_scans(certificates)
+
+    def remove(self, cert_id):
+        with self._id_locks.for_key(cert_id), self._index_lock:
+            if cert_id not in self._certificates:
+                raise KeyError(cert_id)
+            self._log('delete', (), (cert_id,))
+            certificate = self._delete(cert_id)
+            self._version += 1
+            self._notify('delete', (), (cert_id,), self._version)
+        return certificate
+
+    def replace(self, old_id, certificate):
+        entry = self._entry(certificate)
+        with self._id_locks.for_key(old_id), self._index_lock:
+            if old_id not in self._certificates:
+                raise KeyError(old_id)
+            self._log('rotate', (certificate,), (old_id,))
+            self._delete(old_id)
+            self._insert(certificate, entry)
+            self._version += 1
+            self._notify('rotate', (certificate,), (old_id,), self._version)
+        return certificate
+
+    def replace_many(self, replacements):
+        # The stripes of every old ID are held, as a single rotate holds its own, so a
+        # rotate of one of them either finishes first (and the swap here is skipped)
+        # or only starts once the batch is done and finds the ID gone
+        replacements = list(replacements)
+        with self._id_locks.for_keys(old_id for old_id, _ in replacements), self._index_lock:
+            swaps = {}
+            for old_id, certificate in replacements:
+                if old_id in self._certificates and old_id not in swaps:
+                    swaps[old_id] = certificate
+            if not swaps:
+                return []
+            replaced = list(swaps.values())
+            removed_ids = list(swaps)
+            entries = list(map(self._entry, replaced))
+            self._log('rotate', replaced, removed_ids)
+            for old_id, certificate, entry in zip(removed_ids, replaced, entries):
+                self._delete(old_id)
+                self._insert(certificate, entry)
+            self._version += 1
+            self._notify('rotate', replaced, removed_ids, self._version)
+        return replaced
+
+    def rotate(self, cert_id, build):
+        """
+        Atomically replace a certificate with `build(old_certificate)`. Concurrent
+        rotations of the same ID serialize on its stripe: exactly one succeeds and
+        the others raise KeyError. The new certificate gets a fresh ID nobody else
+        can see yet, so only the old ID's stripe is held.
+        """
+        with self._id_locks.for_key(cert_id):
+            old_certificate = self._certificates[cert_id]
+            certificate = build(old_certificate)
+            entry = self._entry(certificate)
+            with self._index_lock:
+                # Checked again before logging, so a rotate that can't apply never
+                # reaches the journal
+                if cert_id not in self._certificates:
+                    raise KeyError(cert_id)
+                self._log('rotate', (certificate,), (cert_id,))
+                self._delete(cert_id)
+                self._insert(certificate, entry)
+                self._version += 1
+                self._notify('rotate', (certificate,), (cert_id,), self._version)
+        return certificate
+
+    def load(self, certificates, version=0):
+        """
+        Replace the contents with `certificates` in one pass, e.g. when restoring from
+        disk, and continue numbering versions from `version`. Listeners are not
+        notified, so load before subscribing. Input already in expiry order (as
+        snapshots are written) sorts in linear time; the domain trie and the
+        fingerprint and scan target maps are only built when first needed.
+        """
+        certificates = list(certificates)
+        index = sorted(map(sort_key, certificates))
+        with self._index_lock:
+            self._certificates = {certificate.id: certificate for certificate in certificates}
+            self._index = index
+            self._fingerprints = None
+            self._targets = None
+            self._domains = None
+            self._version = version
+
+    def snapshot(self, on_capture=None):
+        """
+        Consistent (version, certificates in expiry order). Certificates are replaced,
+        never modified, so copying the index and the ID map under the lock is enough;
+        `on_capture(version)` runs before writers are let go.
+        """
+        with self._index_lock:
+            version = self._version
+            keys = list(self._index)
+            certificates = self._certificates.copy()
+            if on_capture is not None:
+                on_capture(version)
+        return version, [certificates[key[2]] for key in keys]
+
+    def clear(self):
+        with self._index_lock:
+            self._log('clear')
+            self._certificates.clear()
+            self._index.clear()
+            self._domains = DomainIndex()
+            self._fingerprints = {}
+            self._targets = {}
+            self._version += 1
+            self._notify('clear', (), (), self._version)
+
+    def find_fingerprints(self, fingerprints):
+        with self._index_lock:
+            index = self._fingerprint_index()
+        return {fingerprint: index[fingerprint] for fingerprint in fingerprints if fingerprint in index}
+
+    def find_scan_targets(self, targets):
+        with self._index_lock:
+            index = self._target_index()
+        return {target: index[target] for target in targets if target in index}
+
+    def next_transition(self, now, warning_days):
+        """
+        Earliest epoch after `now` at which any stored certificate changes status,
+        found with two bisections of the expiry index. None if nothing will change.
+        """
+        window = warning_window(warning_days)
+        candidates = []
+        # First certificate that is not yet expired flips to 'expired' one second after expiry
+        position = bisect_left(self._index, (0, now))
+        if position < len(self._index) and self._index[position][0] == 0:
+            candidates.append(self._index[position][1] + 1)
+        # First certificate that is still 'active' enters the warning window next
+        position = bisect_left(self._index, (0, now + window))
+        if position < len(self._index) and self._index[position][0] == 0:
+            candidates.append(self._index[position][1] - window + 1)
+        return min(candidates) if candidates else None
+
+    def scan(self, after=None, ranges=None, domain=None, issuer=None, chunk_size=1000, domain_match='exact'):
+        """
+        Yield matching (key, certificate) pairs in expiry order. The index is read in
+        chunks and each chunk resumes from the last key seen, so a long-running scan
+        (e.g. a streamed export) tolerates concurrent inserts and deletes.
+        A domain filter is answered from the domain trie instead of walking the index.
+        """
+        if domain is not None:
+            yield from self._scan_domain(after, ranges, domain, issuer, domain_match)
+            return
+        predicate = attribute_predicate(issuer=issuer)
+        index = self._index
+        for low, high in ranges or [(None, None)]:
+            position = after if after is not None and (low is None or after >= low) else None
+            while True:
+                if position is not None:
+                    start = bisect_right(index, position)
+                else:
+                    start = bisect_left(index, low) if low is not None else 0
+                end = bisect_left(index, high) if high is not None else len(index)
+                keys = index[start:min(end, start + chunk_size)]
+                if not keys:
+                    break
+                certificates = self._certificates
+                for key in keys:
+                    certificate = certificates.get(key[2])
+                    if certificate is not None and (predicate is None or predicate(certificate)):
+                        yield key, certificate
+                position = keys[-1]
+
+    def _scan_domain(self, after, ranges, domain, issuer, domain_match):
+        # Only the matching certificates are sorted, so cost follows the match count
+        with self._index_lock:
+            ids = self._domain_index().lookup(domain, domain_match)
+            certificates = self._certificates
+            keys = sorted(sort_key(certificates[cert_id]) for cert_id in ids if cert_id in certificates)
+        predicate = attribute_predicate(issuer=issuer)
+        for key in keys:
+            if after is not None and key <= after:
+                continue
+            if ranges is not None and not any((low is None or key >= low) and (high is None or key < high)
+                                              for low, high in ranges):
+                continue
+            certificate = self._certificates.get(key[2])
+            if certificate is not None and (predicate is None or predicate(certificate)):
+                yield key, certificate
+
+    def page(self, after=None, limit=None, ranges=None, domain=None, issuer=None, domain_match='exact'):
+        if ranges is None and domain is None and issuer is None:
+            # Unfiltered pages are a plain slice of the index
+            start = bisect_right(self._index, after) if after is not None else 0
+            end = len(self._index) if limit is None else min(start + limit, len(self._index))
+            keys = self._index[start:end]
+            certificates = self._certificates
+            next_key = keys[-1] if keys and end < len(self._index) else None
+            # As in scan(), skip certificates deleted after the slice was taken
+            page = [certificates.get(key[2]) for key in keys]
+            return [certificate for certificate in page if certificate is not None], next_key
+        return super().page(after, limit, ranges, domain, issuer, domain_match)
+
+    def _entry(self, certificate):
+        """
+        (sort key, domain names) for a certificate about to be inserted. This is the
+        part of an insert that can fail (a name that isn't a string), so callers work
+        it out before journaling or touching any state and a bad certificate leaves
+        the store as it was.
+        """
+        return sort_key(certificate), indexed_names(certificate.domain_names())
+
+    def _insert(self, certificate, entry):
+        # Callers hold the index lock and have worked out `entry` with _entry()
+        key, names = entry
+        if certificate.id in self._certificates:
+            self._unindex(self._certificates[certificate.id])
+        self._certificates[certificate.id] = certificate
+        insort(self._index, key)
+        self._index_extras(certificate, names)
+
+    def _insert_many(self, certificates, entries):
+        # Callers hold the index lock and have worked out every entry beforehand
+        if len(certificates) < 16:
+            for certificate, entry in zip(certificates, entries):
+                self._insert(certificate, entry)
+            return
+        for certificate, (key, names) in zip(certificates, entries):
+            if certificate.id in self._certificates:
+                self._unindex(self._certificates[certificate.id])
+            self._certificates[certificate.id] = certificate
+            self._index.append(key)
+            self._index_extras(certificate, names)
+        # Timsort merges the sorted index with the appended run in linear time
+        self._index.sort()
+
+    def _log(self, action, added=(), removed_ids=()):
+        # Callers hold the index lock; runs before the mutation it describes
+        if self._journal is not None:
+            self._journal(action, added, removed_ids, self._version + 1)
+
+    def _delete(self, cert_id):
+        # Callers hold the index lock; raises KeyError if the ID is unknown
+        certificate = self._certificates.pop(cert_id)
+        self._unindex(certificate)
+        return certificate
+
+    def _index_extras(self, certificate, names):
+        # The lookup structures besides the expiry index, where they are built
+        if self._domains is not None:
+            self._domains.add(certificate.id, names)
+        if self._fingerprints is not None:
+            self._fingerprints[certificate.fingerprint_sha256] = certificate.id
+        if self._targets is not None and certificate.scan_target is not None:
+            self._targets[certificate.scan_target] = certificate.id
+
+    def _fingerprint_index(self):
+        # Callers hold the index lock
+        if self._fingerprints is None:
+            self._fingerprints = {certificate.fingerprint_sha256: certificate.id
+                                  for certificate in self._certificates.values()}
+        return self._fingerprints
+
+    def _target_index(self):
+        # Callers hold the index lock
+        if self._targets is None:
+            self._targets = {certificate.scan_target: certificate.id for certificate in self._certificates.values()
+                             if certificate.scan_target is not None}
+        return self._targets
+
+    def _domain_index(self):
+        # Callers hold the index lock
+        if self._domains is None:
+            domains = DomainIndex()
+            for certificate in self._certificates.values():
+                domains.add(certificate.id, certificate.domain_names())
+            self._domains = domains
+        return self._domains
+
+    def _unindex(self, certificate):
+        if self._domains is not None:
+            self._domains.remove(certificate.id, certificate.domain_names())
+        fingerprints = self._fingerprints
+        if fingerprints is not None and fingerprints.get(certificate.fingerprint_sha256) == certificate.id:
+            del fingerprints[certificate.fingerprint_sha256]
+        targets = self._targets
+        if targets is not None and certificate.scan_target is not None and targets.get(certificate.scan_target) == certificate.id:
+            del targets[certificate.scan_target]
+        key = sort_key(certificate)
+        position = bisect_left(self._index, key)
+        del self._index[position]
@@ -0,0 +1,112 @@
+"""
+Compact binary snapshots of the in-memory certificate store.
+
+A snapshot is a fixed header followed by the certificates as pickled columns
+(one list per field, in expiry order). Loading memory-maps the file and unpickles
+straight from the mapping, so what remains per certificate is building the object.
+Files are written under a temporary name, fsynced and renamed into place, so a
+crash never leaves a partial snapshot behind.
+
+Payloads (here and in the write-ahead log) are pickled with a pinned protocol and
+hold only lists, tuples, strings, integers and None, so any Python 3.8+ reads them;
+the header records SNAPSHOT_FORMAT, which changes whenever the layout does.
+"""
+import io
+import mmap
+import os
+import pickle
+import struct
+
+from models.certificate import Certificate
+
+SNAPSHOT_MAGIC = b'CERTSNAP'
+SNAPSHOT_FORMAT = 3
+
+# Pickle protocol of snapshot and log payloads; pinned rather than the interpreter's default
+PICKLE_PROTOCOL = 5
+
+# Magic, format, store version, certificate count, payload length
+_HEADER = struct.Struct('<8sIQQQ')
+
+# Column order of snapshots and write-ahead log rows; matches Certificate.from_storage
+FIELDS = ('id', 'domain_name', 'common_name', 'issuer', 'valid_from', 'valid_until', 'fingerprint_sha256',
+          'expires_at', 'subject_alt_names', 'scan_target')
+
+
+class _PlainUnpickler(pickle.Unpickler):
+    """Unpickler for payloads of plain values; refuses anything that names a class"""
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f'Unexpected object in certificate data: {module}.{name}')
+
+
+def dump_payload(value):
+    return pickle.dumps(value, protocol=PICKLE_PROTOCOL)
+
+
+def load_payload(data):
+    """Unpickle `data` (bytes or a file object positioned at the payload)"""
+    return _PlainUnpickler(io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data).load()
+
+
+def certificate_row(certificate):
+    return (certificate.id, certificate.domain_name, certificate.common_name, certificate.issuer,
+            certificate.valid_from, certificate.valid_until, certificate.fingerprint_sha256, certificate.expires_at,
+            certificate.subject_alt_names, certificate.scan_target)
+
+
+def certificates_from_columns(columns):
+    return list(map(Certificate.from_storage, *columns))
+
+
+def snapshot_path(directory, version):
+    return os.path.join(directory, f'snapshot-{version:020d}.snap')
+
+
+def fsync_directory(directory):
+    """Make a rename in `directory` durable (a no-op where directories can't be opened)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(directory, version, certificates):
+    """Write `certificates` (in expiry order) as the snapshot for store `version`; return its path"""
+    rows = [certificate_row(certificate) for certificate in certificates]
+    columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in FIELDS]
+    payload = dump_payload(columns)
+    path = snapshot_path(directory, version)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, version, len(rows), len(payload)))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    fsync_directory(directory)
+    return path
+
+
+def read_snapshot(path):
+    """(version, columns) from a snapshot file; raises ValueError if it is not a complete snapshot"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            raise ValueError(f'Truncated snapshot: {path}')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, snapshot_format, version, count, length = _HEADER.unpack_from(mapped)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f'Not a certificate snapshot: {path}')
+            if snapshot_format != SNAPSHOT_FORMAT:
+                raise ValueError(f'Unsupported snapshot format {snapshot_format} (expected {SNAPSHOT_FORMAT}): {path}')
+            if size != _HEADER.size + length:
+                raise ValueError(f'Not a complete certificate snapshot: {path}')
+            mapped.seek(_HEADER.size)
+            columns = load_payload(mapped)
+    if len(columns) != len(FIELDS) or any(len(column) != count for column in columns):
+        raise ValueError(f'Corrupt certificate snapshot: {path}')
+    return version, columns
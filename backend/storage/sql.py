@@ -0,0 +1,379 @@
+import threading
+
+from sqlalchemy import (JSON, BigInteger, Column, Index, Integer, MetaData, String, Table, and_, create_engine,
+                        delete, event, func, insert, inspect, or_, select, text, tuple_, update)
+from sqlalchemy.pool import StaticPool
+
+from models.certificate import Certificate
+from models.certificate_status import warning_window
+
+from .base import CertificateRepository, sort_key
+from .domain_index import reversed_labels, wildcard_parent
+
+metadata = MetaData()
+
+certificates_table = Table(
+    'certificates', metadata,
+    Column('id', String(64), primary_key=True),
+    Column('domain_name', String(255)),
+    Column('common_name', String(255)),
+    Column('issuer', String(255)),
+    Column('valid_from', String(64)),
+    Column('valid_until', String(64)),
+    Column('fingerprint_sha256', String(64)),
+    # Parsed valid_until, laid out like sort_key(): (sort_group, expires_at, id)
+    # with expires_at = 0 for undated/invalid certificates in group 1
+    Column('sort_group', Integer, nullable=False),
+    Column('expires_at', BigInteger, nullable=False),
+    # Normalized names with labels reversed ('www.example.com' -> 'com.example.www'),
+    # so suffix and wildcard lookups become index range scans
+    Column('domain_reversed', String(255)),
+    Column('common_reversed', String(255)),
+    # DNS subject alternative names as a JSON list; searchable through certificate_names
+    Column('subject_alt_names', JSON),
+    # "host:port" the TLS scanner captured the certificate from
+    Column('scan_target', String(300)),
+)
+
+# One row per subject alternative name, reversed like domain_reversed, so domain
+# filters cover SANs with the same index range scans
+certificate_names_table = Table(
+    'certificate_names', metadata,
+    Column('certificate_id', String(64), nullable=False),
+    Column('name_reversed', String(255), nullable=False),
+)
+
+# Expiry order doubles as the index on valid_until; issuer lookups are
+# case-insensitive, so that index is on the lowered value
+Index('ix_certificates_valid_until', certificates_table.c.sort_group,
+      certificates_table.c.expires_at, certificates_table.c.id)
+Index('ix_certificates_domain_name', certificates_table.c.domain_reversed)
+Index('ix_certificates_common_name', certificates_table.c.common_reversed)
+Index('ix_certificates_issuer', func.lower(certificates_table.c.issuer))
+Index('ix_certificates_fingerprint', certificates_table.c.fingerprint_sha256)
+Index('ix_certificates_scan_target', certificates_table.c.scan_target)
+Index('ix_certificate_names_name', certificate_names_table.c.name_reversed)
+Index('ix_certificate_names_certificate', certificate_names_table.c.certificate_id)
+
+# Columns added after the first release, with their DDL type; created on startup
+# in databases that predate them (their certificates have no SANs or scan target)
+ADDED_COLUMNS = {'subject_alt_names': 'JSON', 'scan_target': 'VARCHAR(300)'}
+
+# Single-row table holding the store version
+store_meta_table = Table(
+    'store_meta', metadata,
+    Column('key', String(32), primary_key=True),
+    Column('value', BigInteger, nullable=False),
+)
+
+SORT_COLUMNS = (certificates_table.c.sort_group, certificates_table.c.expires_at, certificates_table.c.id)
+
+# SQLite caps the number of bound parameters per statement; used for every IN (...) batch
+DELETE_BATCH_SIZE = 500
+
+
+def create_sql_engine(url, pool_size=5, max_overflow=10):
+    """Create an engine with a connection pool suited to the database URL"""
+    if url in ('sqlite://', 'sqlite:///:memory:'):
+        # An in-memory database only exists on one connection, so share it
+        return create_engine(url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+
+    kwargs = {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_pre_ping': True}
+    if url.startswith('sqlite'):
+        kwargs['connect_args'] = {'check_same_thread': False}
+    engine = create_engine(url, **kwargs)
+
+    if url.startswith('sqlite'):
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            # WAL lets readers proceed while a write is in progress
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.close()
+    return engine
+
+
+def reverse_domain(name):
+    return '.'.join(reversed_labels(name))
+
+
+def domain_condition(column, domain, mode):
+    """SQL condition on a *_reversed column equivalent to DomainIndex.lookup"""
+    if mode == 'exact':
+        return column == reverse_domain(domain)
+    if mode == 'suffix':
+        prefix = reverse_domain(domain)
+        # '/' sorts right after '.', so this range holds every name under the prefix
+        return or_(column == prefix, and_(column >= prefix + '.', column < prefix + '/'))
+    prefix = reverse_domain(wildcard_parent(domain))
+    return and_(column >= prefix + '.', column < prefix + '/',
+                func.instr(func.substr(column, len(prefix) + 2), '.') == 0)
+
+
+def to_row(certificate):
+    group, expires_at, _ = sort_key(certificate)
+    return {
+        'id': certificate.id,
+        'domain_name': certificate.domain_name,
+        'common_name': certificate.common_name,
+        'issuer': certificate.issuer,
+        'valid_from': certificate.valid_from,
+        'valid_until': certificate.valid_until,
+        'fingerprint_sha256': certificate.fingerprint_sha256,
+        'sort_group': group,
+        'expires_at': expires_at,
+        'domain_reversed': reverse_domain(certificate.domain_name),
+        'common_reversed': reverse_domain(certificate.common_name),
+        'subject_alt_names': list(certificate.subject_alt_names),
+        'scan_target': certificate.scan_target,
+    }
+
+
+def name_rows(certificates):
+    """certificate_names rows for the distinct, non-empty SANs of `certificates`"""
+    return [{'certificate_id': certificate.id, 'name_reversed': name}
+            for certificate in certificates
+            for name in dict.fromkeys(map(reverse_domain, certificate.subject_alt_names)) if name]
+
+
+def from_row(row):
+    return Certificate.from_storage(
+        row.id, row.domain_name, row.common_name, row.issuer, row.valid_from, row.valid_until,
+        row.fingerprint_sha256, row.expires_at if row.sort_group == 0 else None, row.subject_alt_names,
+        row.scan_target
+    )
+
+
+class SQLCertificateStore(CertificateRepository):
+    """
+    Certificate store backed by SQLAlchemy (SQLite by default). Ordering, status
+    ranges and domain/issuer filters are evaluated by the database using indexes.
+    """
+
+    def __init__(self, url='sqlite:///certificates.db', pool_size=5, max_overflow=10, engine=None):
+        super().__init__()
+        # Writers in this process commit and notify one at a time, so listeners
+        # see versions in order (reentrant for add_unique -> add_many)
+        self._write_lock = threading.RLock()
+        self.engine = engine or create_sql_engine(url, pool_size, max_overflow)
+        metadata.create_all(self.engine)
+        existing = {column['name'] for column in inspect(self.engine).get_columns('certificates')}
+        missing = [name for name in ADDED_COLUMNS if name not in existing]
+        if missing:
+            with self.engine.begin() as conn:
+                for name in missing:
+                    conn.execute(text(f'ALTER TABLE certificates ADD COLUMN {name} {ADDED_COLUMNS[name]}'))
+                if 'scan_target' in missing:
+                    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_certificates_scan_target '
+                                      'ON certificates (scan_target)'))
+        with self.engine.begin() as conn:
+            if conn.execute(select(store_meta_table.c.value).where(store_meta_table.c.key == 'version')).first() is None:
+                conn.execute(insert(store_meta_table).values(key='version', value=0))
+
+    @property
+    def version(self):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(store_meta_table.c.value).where(store_meta_table.c.key == 'version')
+            ).scalar_one()
+
+    def _bump_version(self, conn):
+        """Increment the version inside the caller's transaction and return the new value"""
+        conn.execute(
+            update(store_meta_table)
+            .where(store_meta_table.c.key == 'version')
+            .values(value=store_meta_table.c.value + 1)
+        )
+        return conn.execute(
+            select(store_meta_table.c.value).where(store_meta_table.c.key == 'version')
+        ).scalar_one()
+
+    def __contains__(self, cert_id):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(certificates_table.c.id).where(certificates_table.c.id == cert_id)
+            ).first() is not None
+
+    def __getitem__(self, cert_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(select(certificates_table).where(certificates_table.c.id == cert_id)).first()
+        if row is None:
+            raise KeyError(cert_id)
+        return from_row(row)
+
+    def __len__(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(certificates_table)).scalar_one()
+
+    def add(self, certificate):
+        with self._write_lock:
+            with self.engine.begin() as conn:
+                self._delete_rows(conn, [certificate.id])
+                self._insert_rows(conn, [certificate])
+                version = self._bump_version(conn)
+            self._notify('create', (certificate,), (), version)
+        return certificate
+
+    def add_many(self, certificates):
+        certificates = list(certificates)
+        if not certificates:
+            return certificates
+        with self._write_lock:
+            with self.engine.begin() as conn:
+                self._delete_rows(conn, [certificate.id for certificate in certificates])
+                self._insert_rows(conn, certificates)
+                version = self._bump_version(conn)
+            self._notify('import', certificates, (), version)
+        return certificates
+
+    def remove(self, cert_id):
+        with self._write_lock:
+            with self.engine.begin() as conn:
+                row = conn.execute(select(certificates_table).where(certificates_table.c.id == cert_id)).first()
+                if row is None:
+                    raise KeyError(cert_id)
+                self._delete_rows(conn, [cert_id])
+                version = self._bump_version(conn)
+            self._notify('delete', (), (cert_id,), version)
+        return from_row(row)
+
+    def replace(self, old_id, certificate):
+        with self._write_lock:
+            with self.engine.begin() as conn:
+                if self._delete_rows(conn, [old_id]) != 1:
+                    raise KeyError(old_id)
+                self._insert_rows(conn, [certificate])
+                version = self._bump_version(conn)
+            self._notify('rotate', (certificate,), (old_id,), version)
+        return certificate
+
+    def replace_many(self, replacements):
+        replacements = list(replacements)
+        table = certificates_table
+        replaced = []
+        removed_ids = []
+        with self._write_lock:
+            with self.engine.begin() as conn:
+                for start in range(0, len(replacements), DELETE_BATCH_SIZE):
+                    chunk = replacements[start:start + DELETE_BATCH_SIZE]
+                    old_ids = [old_id for old_id, _ in chunk]
+                    existing = set(conn.execute(select(table.c.id).where(table.c.id.in_(old_ids))).scalars())
+                    chunk = [(old_id, certificate) for old_id, certificate in chunk if old_id in existing]
+                    if not chunk:
+                        continue
+                    self._delete_rows(conn, [old_id for old_id, _ in chunk])
+                    self._insert_rows(conn, [certificate for _, certificate in chunk])
+                    removed_ids.extend(old_id for old_id, _ in chunk)
+                    replaced.extend(certificate for _, certificate in chunk)
+                if not replaced:
+                    return replaced
+                version = self._bump_version(conn)
+            self._notify('rotate', replaced, removed_ids, version)
+        return replaced
+
+    def clear(self):
+        with self._write_lock:
+            with self.engine.begin() as conn:
+                conn.execute(delete(certificates_table))
+                conn.execute(delete(certificate_names_table))
+                version = self._bump_version(conn)
+            self._notify('clear', (), (), version)
+
+    def _insert_rows(self, conn, certificates):
+        conn.execute(insert(certificates_table), [to_row(certificate) for certificate in certificates])
+        names = name_rows(certificates)
+        if names:
+            conn.execute(insert(certificate_names_table), names)
+
+    def _delete_rows(self, conn, ids):
+        """Delete certificates and their SAN rows in IN batches; returns the certificates deleted"""
+        deleted = 0
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[start:start + DELETE_BATCH_SIZE]
+            conn.execute(delete(certificate_names_table).where(certificate_names_table.c.certificate_id.in_(batch)))
+            deleted += conn.execute(delete(certificates_table).where(certificates_table.c.id.in_(batch))).rowcount
+        return deleted
+
+    def add_unique(self, certificates):
+        # Serialized with other writers so the fingerprint check and insert can't interleave
+        with self._write_lock:
+            return super().add_unique(certificates)
+
+    def record_scans(self, certificates):
+        with self._write_lock:
+            return super().record_scans(certificates)
+
+    def find_fingerprints(self, fingerprints):
+        fingerprints = list(fingerprints)
+        table = certificates_table
+        found = {}
+        with self.engine.connect() as conn:
+            for start in range(0, len(fingerprints), DELETE_BATCH_SIZE):
+                batch = fingerprints[start:start + DELETE_BATCH_SIZE]
+                rows = conn.execute(
+                    select(table.c.fingerprint_sha256, table.c.id).where(table.c.fingerprint_sha256.in_(batch))
+                )
+                found.update((fingerprint, cert_id) for fingerprint, cert_id in rows)
+        return found
+
+    def find_scan_targets(self, targets):
+        targets = [target for target in set(targets) if target is not None]
+        table = certificates_table
+        found = {}
+        with self.engine.connect() as conn:
+            for start in range(0, len(targets), DELETE_BATCH_SIZE):
+                batch = targets[start:start + DELETE_BATCH_SIZE]
+                rows = conn.execute(select(table.c.scan_target, table.c.id).where(table.c.scan_target.in_(batch)))
+                found.update((target, cert_id) for target, cert_id in rows)
+        return found
+
+    def next_transition(self, now, warning_days):
+        window = warning_window(warning_days)
+        table = certificates_table
+        candidates = []
+        with self.engine.connect() as conn:
+            # Both lookups are index seeks on (sort_group, expires_at)
+            expiring = conn.execute(
+                select(func.min(table.c.expires_at)).where(table.c.sort_group == 0, table.c.expires_at >= now)
+            ).scalar()
+            warning = conn.execute(
+                select(func.min(table.c.expires_at)).where(table.c.sort_group == 0, table.c.expires_at >= now + window)
+            ).scalar()
+        if expiring is not None:
+            candidates.append(expiring + 1)
+        if warning is not None:
+            candidates.append(warning - window + 1)
+        return min(candidates) if candidates else None
+
+    def scan(self, after=None, ranges=None, domain=None, issuer=None, chunk_size=1000, domain_match='exact'):
+        table = certificates_table
+        filters = []
+        if domain:
+            names = certificate_names_table
+            filters.append(or_(domain_condition(table.c.domain_reversed, domain, domain_match),
+                               domain_condition(table.c.common_reversed, domain, domain_match),
+                               table.c.id.in_(select(names.c.certificate_id).where(
+                                   domain_condition(names.c.name_reversed, domain, domain_match)))))
+        if issuer:
+            filters.append(func.lower(table.c.issuer) == issuer.lower())
+
+        for low, high in ranges or [(None, None)]:
+            position = after if after is not None and (low is None or after >= low) else None
+            while True:
+                conditions = list(filters)
+                if position is not None:
+                    conditions.append(tuple_(*SORT_COLUMNS) > tuple_(*position))
+                elif low is not None:
+                    conditions.append(tuple_(*SORT_COLUMNS[:len(low)]) >= tuple_(*low))
+                if high is not None:
+                    conditions.append(tuple_(*SORT_COLUMNS[:len(high)]) < tuple_(*high))
+                query = select(table).where(*conditions).order_by(*SORT_COLUMNS).limit(chunk_size)
+                # Fetch a whole chunk before yielding so no connection is held by the caller
+                with self.engine.connect() as conn:
+                    rows = conn.execute(query).all()
+                for row in rows:
+                    yield (row.sort_group, row.expires_at, row.id), from_row(row)
+                if len(rows) < chunk_size:
+                    break
+                position = (rows[-1].sort_group, rows[-1].expires_at, rows[-1].id)
@@ -0,0 +1,184 @@
+import heapq
+import threading
+from collections import Counter
+
+from models.certificate_status import (DEFAULT_WARNING_DAYS, SECONDS_PER_DAY, next_transition, now_epoch, status_for,
+                                       warning_window)
+
+STATUSES = ('active', 'warning', 'expired')
+
+
+class StatusSummary:
+    """
+    Certificate counts per status and per issuer, kept up to date incrementally.
+
+    Store mutations adjust the counts as they happen (subscribe `store_changed` to
+    a repository). Time-driven changes come from a min-heap of upcoming status
+    transitions (entering the warning window, expiring): reading the summary pops
+    only the transitions that are due and moves those certificates between buckets,
+    so certificates are never rescanned and reads are O(1) amortized.
+
+    A store followed through `attach` is only loaded by the first read (or `warm`),
+    so a restored store can serve requests before its summary is built.
+    """
+
+    def __init__(self, warning_days=DEFAULT_WARNING_DAYS):
+        self.warning_days = warning_days
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._counts = dict.fromkeys(STATUSES, 0)
+        self._by_issuer = {}
+        # cert_id -> [status, issuer, expires_at, next transition epoch or None]
+        self._entries = {}
+        # (transition epoch, cert_id); entries whose epoch no longer matches are stale
+        self._transitions = []
+        self._now = None
+        # Store attached but not loaded yet
+        self._pending = None
+
+    def rebuild(self, certificates, now):
+        """
+        Load the summary from scratch. IDs must be unique, as in a store; counts are
+        tallied per (status, issuer) and the heap is built with one heapify instead
+        of a push per certificate.
+        """
+        with self._lock:
+            self._rebuild(certificates, now)
+
+    def attach(self, store):
+        """Follow `store`'s mutations, loading its contents on the first read or `warm`"""
+        with self._lock:
+            self._reset()
+            self._pending = store
+        store.subscribe(self.store_changed)
+
+    def warm(self, now=None):
+        """Load the attached store now (e.g. from a background thread) rather than on the first read"""
+        with self._lock:
+            self._load_pending(now_epoch() if now is None else now)
+
+    def _load_pending(self, now):
+        # Callers hold the lock. Mutations notified before this were ignored but are
+        # already in the store, so the scan sees them; those notified while it runs
+        # wait for the lock and are applied on top, which _add and _remove tolerate
+        if self._pending is not None:
+            store, self._pending = self._pending, None
+            self._rebuild(store.ordered(), now)
+
+    def _rebuild(self, certificates, now):
+        window = warning_window(self.warning_days)
+        warning_start = now + self.warning_days * SECONDS_PER_DAY
+        tallies = Counter()
+        self._reset()
+        self._now = now
+        entries = self._entries
+        transitions = self._transitions
+        for certificate in certificates:
+            expires_at = certificate.expires_at
+            # status_for and next_transition, inlined for the one pass over everything
+            if expires_at is None:
+                status, transition = 'active', None
+            elif expires_at < now:
+                status, transition = 'expired', None
+            elif expires_at < warning_start:
+                status, transition = 'warning', expires_at + 1
+            else:
+                status, transition = 'active', expires_at - window + 1
+            entries[certificate.id] = [status, certificate.issuer, expires_at, transition]
+            tallies[status, certificate.issuer] += 1
+            if transition is not None:
+                transitions.append((transition, certificate.id))
+        heapq.heapify(transitions)
+        for (status, issuer), count in tallies.items():
+            self._count(status, issuer, count)
+
+    def store_changed(self, action, added, removed_ids, version, now=None):
+        """Repository listener keeping the counts in step with store mutations"""
+        now = now_epoch() if now is None else now
+        with self._lock:
+            if self._pending is not None:
+                # Covered by the load still to come
+                return
+            if action == 'clear':
+                self._reset()
+            self._advance(now)
+            for cert_id in removed_ids:
+                self._remove(cert_id)
+            for certificate in added:
+                self._add(certificate, now)
+
+    def snapshot(self, now):
+        """Counts as of `now`: {'total', 'by_status', 'by_issuer', 'next_transition'}"""
+        with self._lock:
+            self._load_pending(now)
+            self._advance(now)
+            return {
+                'total': len(self._entries),
+                'by_status': dict(self._counts),
+                'by_issuer': {issuer: dict(counts) for issuer, counts in self._by_issuer.items()},
+                'next_transition': self._peek_transition(),
+            }
+
+    def _add(self, certificate, now):
+        if certificate.id in self._entries:
+            self._remove(certificate.id)
+        status = status_for(certificate.expires_at, now, self.warning_days)
+        transition = next_transition(certificate.expires_at, now, self.warning_days)
+        self._entries[certificate.id] = [status, certificate.issuer, certificate.expires_at, transition]
+        self._count(status, certificate.issuer, 1)
+        if transition is not None:
+            heapq.heappush(self._transitions, (transition, certificate.id))
+
+    def _remove(self, cert_id):
+        entry = self._entries.pop(cert_id, None)
+        if entry is not None:
+            # Its heap entry becomes stale and is skipped when it surfaces
+            self._count(entry[0], entry[1], -1)
+            if len(self._transitions) > 2 * len(self._entries) + 64:
+                self._compact()
+
+    def _compact(self):
+        # Heavy churn leaves many stale heap entries behind; rebuild from live ones
+        self._transitions = [(entry[3], cert_id) for cert_id, entry in self._entries.items()
+                             if entry[3] is not None]
+        heapq.heapify(self._transitions)
+
+    def _count(self, status, issuer, delta):
+        self._counts[status] += delta
+        counts = self._by_issuer.get(issuer)
+        if counts is None:
+            counts = self._by_issuer[issuer] = dict.fromkeys(STATUSES, 0)
+        counts[status] += delta
+        if not any(counts.values()):
+            del self._by_issuer[issuer]
+
+    def _advance(self, now):
+        """Apply every transition due at or before `now`"""
+        transitions = self._transitions
+        while transitions and transitions[0][0] <= now:
+            due, cert_id = heapq.heappop(transitions)
+            entry = self._entries.get(cert_id)
+            if entry is None or entry[3] != due:
+                continue
+            status = status_for(entry[2], now, self.warning_days)
+            if status != entry[0]:
+                self._count(entry[0], entry[1], -1)
+                self._count(status, entry[1], 1)
+                entry[0] = status
+            entry[3] = next_transition(entry[2], now, self.warning_days)
+            if entry[3] is not None:
+                heapq.heappush(transitions, (entry[3], cert_id))
+        self._now = now
+
+    def _peek_transition(self):
+        # Drop stale heap heads so the reported time is a real upcoming change
+        transitions = self._transitions
+        while transitions:
+            due, cert_id = transitions[0]
+            entry = self._entries.get(cert_id)
+            if entry is not None and entry[3] == due:
+                return due
+            heapq.heappop(transitions)
+        return None
@@ -0,0 +1,285 @@
+"""
+Write-ahead log for the in-memory certificate store.
+
+Every store mutation (create, import, rotate, delete, clear) is appended to the
+current log segment as one framed record - length, CRC32, then the pickled
+(version, action, rows, removed IDs) - before the store applies it (the log is the
+store's journal), so a failed write leaves both the log and the store unchanged.
+Each segment starts with a header carrying LOG_FORMAT. How often the segment is
+fsynced is configurable:
+
+- always:   after every record; nothing acknowledged is ever lost
+- interval: a background thread fsyncs every `fsync_interval` seconds; a process
+            crash loses nothing, power loss at most that interval
+- never:    leave flushing to the operating system
+
+Every `snapshot_every` records a snapshot is written in the background and the log
+switches to a new segment at the snapshot's version, so older segments and
+snapshots can be deleted. On startup the latest snapshot is loaded and only the
+segments after it are replayed; a torn record at the end of the last segment
+(from a crash mid-write) is discarded.
+"""
+import gc
+import os
+import struct
+import threading
+import zlib
+
+from models.certificate import Certificate
+
+from .memory import CertificateStore
+from .snapshot import (certificate_row, certificates_from_columns, dump_payload, load_payload, read_snapshot,
+                       write_snapshot)
+
+FSYNC_MODES = ('always', 'interval', 'never')
+
+LOG_MAGIC = b'CERTWLOG'
+LOG_FORMAT = 3
+
+# Magic and format at the start of every segment
+_SEGMENT_HEADER = struct.Struct('<8sI')
+
+# Record length and CRC32 of the pickled record that follows
+_FRAME = struct.Struct('<II')
+
+
+def segment_path(directory, version):
+    """Log segment holding the records after store `version`"""
+    return os.path.join(directory, f'wal-{version:020d}.log')
+
+
+def list_versioned(directory, prefix, suffix):
+    """Sorted (version, path) pairs for files named <prefix><version><suffix>"""
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix):
+            version = name[len(prefix):-len(suffix)]
+            if version.isdigit():
+                found.append((int(version), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def read_segment(path):
+    """Records of a log segment and the length of its valid prefix; stops at a torn or corrupt record"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _SEGMENT_HEADER.size:
+        # Empty, or torn while its header was being written
+        return [], 0, len(data)
+    magic, log_format = _SEGMENT_HEADER.unpack_from(data)
+    if magic != LOG_MAGIC:
+        raise ValueError(f'Not a certificate write-ahead log segment: {path}')
+    if log_format != LOG_FORMAT:
+        raise ValueError(f'Unsupported write-ahead log format {log_format} (expected {LOG_FORMAT}): {path}')
+    records = []
+    offset = _SEGMENT_HEADER.size
+    while offset + _FRAME.size <= len(data):
+        length, checksum = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        end = start + length
+        if end > len(data) or zlib.crc32(data[start:end]) != checksum:
+            break
+        records.append(load_payload(data[start:end]))
+        offset = end
+    return records, offset, len(data)
+
+
+def recover(directory):
+    """
+    Rebuild the store contents from the latest snapshot plus the log segments after
+    it. Returns (certificates, version). Truncates a torn tail off the last segment
+    so appending resumes after the last complete record; a damaged record anywhere
+    else raises ValueError rather than silently dropping what follows it.
+    """
+    version = 0
+    columns = None
+    snapshots = list_versioned(directory, 'snapshot-', '.snap')
+    if snapshots:
+        version, columns = read_snapshot(snapshots[-1][1])
+
+    # Replay into an overlay instead of the snapshot itself: IDs the log removed or
+    # rewrote, and the latest row for each ID it added
+    dropped = set()
+    added = {}
+    cleared = False
+    last_version = version
+    segments = [(start, path) for start, path in list_versioned(directory, 'wal-', '.log') if start >= version]
+    for position, (start, path) in enumerate(segments):
+        records, valid_length, size = read_segment(path)
+        if valid_length < size:
+            if position != len(segments) - 1:
+                raise ValueError(f'Corrupt write-ahead log segment: {path}')
+            with open(path, 'r+b') as f:
+                f.truncate(valid_length)
+        for record_version, action, rows, removed_ids in records:
+            if record_version <= last_version:
+                continue
+            if action == 'clear':
+                cleared = True
+                dropped.clear()
+                added.clear()
+            for cert_id in removed_ids:
+                added.pop(cert_id, None)
+                dropped.add(cert_id)
+            for row in rows:
+                added[row[0]] = row
+                dropped.add(row[0])
+            last_version = record_version
+
+    certificates = []
+    if columns is not None and not cleared:
+        certificates = certificates_from_columns(columns)
+        if dropped:
+            certificates = [certificate for certificate in certificates if certificate.id not in dropped]
+    certificates.extend(Certificate.from_storage(*row) for row in added.values())
+    return certificates, last_version
+
+
+class WriteAheadLog:
+    """Store journal appending every mutation to disk before it is applied; see the module docstring"""
+
+    def __init__(self, directory, fsync='interval', fsync_interval=1.0, snapshot_every=100_000):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f'fsync must be one of: {", ".join(FSYNC_MODES)}')
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self._store = None
+        self._file = None
+        # Length of the current segment up to its last complete record
+        self._offset = 0
+        self._dirty = False
+        self._records = 0
+        self._snapshotting = False
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+
+    def attach(self, store):
+        """Start logging `store`'s mutations into a segment beginning at its current version"""
+        self._store = store
+        with self._lock:
+            self._open_segment(store.version)
+        store.set_journal(self.append)
+        if self.fsync == 'interval':
+            self._flusher = threading.Thread(target=self._flush_periodically, name='wal-fsync', daemon=True)
+            self._flusher.start()
+
+    def append(self, action, added, removed_ids, version):
+        """
+        Store journal: the store calls it in version order, holding its lock, before
+        applying the mutation. Raises OSError if the record could not be written
+        (with fsync='always': made durable), which abandons the mutation.
+        """
+        payload = dump_payload((version, action, [certificate_row(certificate) for certificate in added],
+                                list(removed_ids)))
+        with self._lock:
+            self._write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._records += 1
+            start_snapshot = self._records >= self.snapshot_every and not self._snapshotting
+            if start_snapshot:
+                self._snapshotting = True
+        if start_snapshot:
+            threading.Thread(target=self.snapshot, name='wal-snapshot', daemon=True).start()
+
+    def snapshot(self):
+        """Write a snapshot of the store, then drop the segments and snapshots it supersedes"""
+        try:
+            version, certificates = self._store.snapshot(on_capture=self._switch_segment)
+            write_snapshot(self.directory, version, certificates)
+            for older, path in list_versioned(self.directory, 'snapshot-', '.snap'):
+                if older < version:
+                    os.remove(path)
+            for start, path in list_versioned(self.directory, 'wal-', '.log'):
+                if start < version:
+                    os.remove(path)
+        finally:
+            with self._lock:
+                self._snapshotting = False
+
+    def close(self):
+        """Stop the fsync thread and make everything written so far durable"""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            if self._file is not None:
+                if self.fsync != 'never':
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def _switch_segment(self, version):
+        # Runs under the store's lock, so no record lands between the capture and the switch
+        with self._lock:
+            if self._file is not None:
+                if self.fsync != 'never':
+                    os.fsync(self._file.fileno())
+                self._file.close()
+            self._open_segment(version)
+            self._records = 0
+
+    def _open_segment(self, version):
+        # Callers hold self._lock; unbuffered so records go straight to the OS
+        self._file = open(segment_path(self.directory, version), 'ab', buffering=0)
+        self._offset = self._file.tell()
+        self._dirty = False
+        if self._offset == 0:
+            self._write(_SEGMENT_HEADER.pack(LOG_MAGIC, LOG_FORMAT))
+
+    def _write(self, data):
+        # Callers hold self._lock. A failed write is cut back off the segment, so a
+        # partial record never ends up in front of later ones
+        if self._file is None:
+            raise OSError('Write-ahead log is closed')
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[self._file.write(view):]
+            if self.fsync == 'always':
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+        except OSError:
+            try:
+                self._file.truncate(self._offset)
+            except OSError:
+                # Can't restore the segment, so stop appending to it at all
+                self._file.close()
+                self._file = None
+            raise
+        self._offset += len(data)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if self._dirty and self._file is not None:
+                    os.fsync(self._file.fileno())
+                    self._dirty = False
+
+
+def open_store(directory, fsync='interval', fsync_interval=1.0, snapshot_every=100_000):
+    """
+    Restore a CertificateStore from `directory` (created if missing) and log its
+    mutations there. Returns (store, log); call log.close() on shutdown.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.tmp'):
+            # Left by a snapshot interrupted before its rename
+            os.remove(os.path.join(directory, name))
+    # Millions of new objects would otherwise trigger repeated full collections
+    # that find nothing to free
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        certificates, version = recover(directory)
+        store = CertificateStore()
+        store.load(certificates, version)
+    finally:
+        if collecting:
+            gc.enable()
+    log = WriteAheadLog(directory, fsync, fsync_interval, snapshot_every)
+    log.attach(store)
+    return store, log
@@ -0,0 +1,48 @@
+"""Certificate listing responses"""
+import pytest
+
+import routes
+from app import create_app
+from app.config import Config
+from models import now_epoch
+
+from test_rotation import make_certificate
+
+
+@pytest.fixture
+def app():
+    class TestConfig(Config):
+        TESTING = True
+        CERTIFICATE_STORE = 'memory'
+        STORE_DATA_DIR = None
+    app = create_app(TestConfig)
+    routes.certificates_store.add_many([
+        make_certificate('a.test', subject_alt_names=['a.test', 'www.a.test']),
+        make_certificate('b.test', '2020-01-01T00:00:00+00:00'),
+    ])
+    return app
+
+
+def jsonify_body(app, response):
+    """What jsonify returns for the page in `response`, for comparison with its bytes"""
+    page = [routes.certificates_store[cert['id']] for cert in response.get_json()['data']]
+    now = now_epoch()
+    with app.app_context():
+        return app.json.response({
+            'status': 'success',
+            'data': [cert.to_dict(now=now) for cert in page],
+            'next_cursor': None
+        }).get_data()
+
+
+@pytest.mark.parametrize('compact', [None, True, False])
+def test_listing_matches_jsonify_byte_for_byte(app, compact):
+    app.json.compact = compact
+    client = app.test_client()
+    response = client.get('/api/v1/certificates')
+    assert response.get_data() == jsonify_body(app, response)
+    # Served again from the fragment cache
+    routes.response_cache.clear()
+    assert client.get('/api/v1/certificates').get_data() == response.get_data()
+    if compact is not False:
+        assert b', ' not in response.get_data()
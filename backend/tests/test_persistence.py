@@ -0,0 +1,76 @@
+"""Write-ahead log recovery of the memory store, compared with the store that wrote it"""
+from models.certificate_status import now_epoch
+from storage import CertificateStore, StatusSummary, open_store
+from storage.snapshot import certificate_row
+from storage.wal import recover
+
+from test_rotation import make_certificate, renewed
+
+
+def rows(certificates):
+    return sorted(map(certificate_row, certificates))
+
+
+def mutate(store):
+    """An import, a rotate, a batch rotate and a delete"""
+    certificates = store.add_many(make_certificate(f'host{i}.test', f'2030-01-{i + 1:02d}T00:00:00+00:00',
+                                                   subject_alt_names=[f'www.host{i}.test'])
+                                  for i in range(6))
+    store.rotate(certificates[0].id, renewed)
+    store.replace_many([(certificates[1].id, renewed(certificates[1])),
+                        (certificates[2].id, renewed(certificates[2]))])
+    store.remove(certificates[3].id)
+    return certificates
+
+
+def test_replaying_the_log_matches_the_live_store(tmp_path):
+    store, log = open_store(str(tmp_path), fsync='never', snapshot_every=10 ** 9)
+    mutate(store)
+    log.close()
+
+    certificates, version = recover(str(tmp_path))
+    assert version == store.version == 4
+    assert rows(certificates) == rows(store.values())
+
+
+def test_restoring_a_snapshot_and_its_log_tail_matches_the_live_store(tmp_path):
+    store, log = open_store(str(tmp_path), fsync='never', snapshot_every=10 ** 9)
+    certificates = mutate(store)
+    log.snapshot()
+    store.rotate(certificates[4].id, renewed)
+    store.add_many([make_certificate('late.test')])
+    log.close()
+
+    restored, restored_log = open_store(str(tmp_path), fsync='never')
+    try:
+        assert restored.version == store.version
+        assert list(map(certificate_row, restored.ordered())) == list(map(certificate_row, store.ordered()))
+        # The lookup maps skipped by the restore are built on first use
+        kept = store[certificates[5].id]
+        assert restored.add_unique([kept]) == ([], [kept.id])
+        assert restored.find_fingerprints([kept.fingerprint_sha256]) == {kept.fingerprint_sha256: kept.id}
+    finally:
+        restored_log.close()
+
+
+def test_empty_import_is_not_journaled():
+    store = CertificateStore()
+    journal = []
+    store.set_journal(lambda *record: journal.append(record))
+    changes = []
+    store.subscribe(lambda *change: changes.append(change))
+    assert store.add_many([]) == []
+    assert (journal, changes, store.version) == ([], [], 0)
+
+
+def test_summary_loads_an_attached_store_on_first_read():
+    store = CertificateStore()
+    store.add_many([make_certificate('a.test'), make_certificate('old.test', '2020-01-01T00:00:00+00:00')])
+    summary = StatusSummary()
+    summary.attach(store)
+    # Changes before the load are already in the store it reads
+    store.add(make_certificate('b.test'))
+    counts = summary.snapshot(now_epoch())
+    assert (counts['total'], counts['by_status']['expired']) == (3, 1)
+    store.remove(next(iter(store.values())).id)
+    assert summary.snapshot(now_epoch())['total'] == 2
@@ -0,0 +1,98 @@
+"""Single and batch rotation on the memory store, including their journal entries"""
+import threading
+import uuid
+
+import routes
+from app import create_app
+from app.config import Config
+from models import Certificate
+from storage import CertificateStore
+
+
+def make_certificate(name, valid_until='2030-01-01T00:00:00+00:00', **fields):
+    return Certificate(id=str(uuid.uuid4()), domain_name=name, common_name=name, issuer='Test CA',
+                       valid_from='2025-01-01T00:00:00+00:00', valid_until=valid_until, **fields)
+
+
+def renewed(certificate):
+    return make_certificate(certificate.domain_name, '2031-01-01T00:00:00+00:00')
+
+
+def journaled_store():
+    store = CertificateStore()
+    journal = []
+    store.set_journal(lambda *record: journal.append(record))
+    return store, journal
+
+
+def test_replace_many_swaps_existing_ids_and_skips_missing_ones():
+    store, journal = journaled_store()
+    first, second = make_certificate('a.test'), make_certificate('b.test')
+    store.add_many([first, second])
+    replacement = renewed(first)
+    swapped = store.replace_many([(first.id, replacement), ('missing', renewed(second))])
+    assert swapped == [replacement]
+    assert first.id not in store and replacement.id in store and second.id in store
+    action, added, removed_ids, version = journal[-1]
+    assert (action, list(added), list(removed_ids), version) == ('rotate', [replacement], [first.id], store.version)
+
+
+def test_rotate_and_batch_swap_of_the_same_id_apply_once():
+    store, journal = journaled_store()
+    certificate = make_certificate('a.test')
+    store.add(certificate)
+    building = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def build(old):
+        building.set()
+        release.wait(5)
+        return renewed(old)
+
+    def rotate():
+        results['rotated'] = store.rotate(certificate.id, build)
+
+    def batch():
+        results['batch'] = store.replace_many([(certificate.id, renewed(certificate))])
+
+    rotating = threading.Thread(target=rotate)
+    rotating.start()
+    assert building.wait(5)
+    # The batch needs the stripe the rotate is holding while it builds
+    batching = threading.Thread(target=batch)
+    batching.start()
+    batching.join(0.2)
+    assert batching.is_alive()
+    release.set()
+    rotating.join(5)
+    batching.join(5)
+
+    assert results['batch'] == []
+    assert list(store.values()) == [results['rotated']]
+    # create + one rotate, versions consecutive with the store's
+    assert [(action, version) for action, _, _, version in journal] == [('create', 1), ('rotate', 2)]
+    assert store.version == 2
+
+
+def test_rotate_batch_route_rotates_matches_once():
+    class TestConfig(Config):
+        TESTING = True
+        CERTIFICATE_STORE = 'memory'
+        STORE_DATA_DIR = None
+        ROTATE_BATCH_SIZE = 2
+    client = create_app(TestConfig).test_client()
+    expired = [make_certificate(f'old{i}.test', '2020-01-01T00:00:00+00:00') for i in range(5)]
+    current = make_certificate('current.test')
+    routes.certificates_store.add_many(expired + [current])
+
+    response = client.post('/api/v1/certificates/rotate-batch', json={'status': 'expired'})
+    data = response.get_json()['data']
+    assert (data['matched'], data['rotated'], data['skipped']) == (5, 5, 0)
+    assert [batch['rotated'] for batch in data['batches']] == [2, 4, 5]
+    new_ids = {swap['id'] for swap in data['certificates']}
+    stored = {certificate.id for certificate in routes.certificates_store.values()}
+    assert stored == new_ids | {current.id}
+
+    again = client.post('/api/v1/certificates/rotate-batch', json={'status': 'expired'}).get_json()['data']
+    assert again['matched'] == 0
@@ -0,0 +1,177 @@
+"""
+Scan endpoint tests against real TLS servers on 127.0.0.1, each presenting a
+self-signed certificate that a test can swap to simulate a renewal.
+"""
+import datetime
+import socket
+import ssl
+import threading
+import time
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from app import create_app
+from app.config import Config
+
+TOKEN = 'scan-test-token'
+AUTH = {'Authorization': f'Bearer {TOKEN}'}
+
+
+def self_signed(tmp_path, name, days):
+    """Write a self-signed certificate for `name` and its key; returns (cert_path, key_path)"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=days))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName(name)]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = tmp_path / f'{name}-{days}.pem'
+    key_path = tmp_path / f'{name}-{days}.key'
+    cert_path.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class TLSServer:
+    """Completes a TLS handshake with every client using the current certificate, then hangs up"""
+
+    def __init__(self, cert_path, key_path):
+        self.use(cert_path, key_path)
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def use(self, cert_path, key_path):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        self.context = context
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            try:
+                with self.context.wrap_socket(conn, server_side=True) as tls:
+                    tls.recv(1)
+            except (OSError, ssl.SSLError):
+                conn.close()
+
+    def close(self):
+        # close() alone leaves a blocked accept() listening on Linux; shutdown wakes it
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.thread.join(5)
+
+
+@pytest.fixture
+def client():
+    class TestConfig(Config):
+        TESTING = True
+        CERTIFICATE_STORE = 'memory'
+        STORE_DATA_DIR = None
+        SCAN_API_TOKEN = TOKEN
+        SCAN_ALLOWED_TARGETS = '127.0.0.1/32'
+        SCAN_TIMEOUT = 10
+        SCAN_RETRIES = 0
+    return create_app(TestConfig).test_client()
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = TLSServer(*self_signed(tmp_path, 'scan.test', 30))
+    yield server
+    server.close()
+
+
+def run_job(client, targets):
+    response = client.post('/api/v1/scans', json={'targets': targets}, headers=AUTH)
+    assert response.status_code == 202
+    location = response.headers['Location']
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        job = client.get(location, headers=AUTH).get_json()['data']
+        if job['status'] in ('done', 'failed'):
+            assert job['status'] == 'done', job['error']
+            return job['result']
+        time.sleep(0.05)
+    pytest.fail('scan job did not finish')
+
+
+def test_scans_need_the_token(client):
+    assert client.post('/api/v1/scans', json={'targets': ['127.0.0.1:443']}).status_code == 401
+    wrong = {'Authorization': 'Bearer nope'}
+    response = client.post('/api/v1/scans', json={'targets': ['127.0.0.1:443']}, headers=wrong)
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+    assert client.get('/api/v1/scans/unknown').status_code == 401
+
+
+def test_scans_are_disabled_without_a_token(client):
+    client.application.config['SCAN_API_TOKEN'] = None
+    response = client.post('/api/v1/scans', json={'targets': ['127.0.0.1:443']}, headers=AUTH)
+    assert response.status_code == 403
+
+
+def test_targets_outside_the_allow_list_are_rejected(client):
+    targets = ['169.254.169.254:80', 'localhost:22', '127.0.0.1:443']
+    response = client.post('/api/v1/scans', json={'targets': targets}, headers=AUTH)
+    assert response.status_code == 403
+    assert response.get_json()['rejected'] == ['169.254.169.254:80', 'localhost:22']
+
+
+def test_allowed_names_only_dial_allowed_addresses(client, server):
+    # localhost is listed, but the loopback address it resolves to is not
+    client.application.config['SCAN_ALLOWED_TARGETS'] = 'localhost'
+    result = run_job(client, [f'localhost:{server.port}'])
+    assert result['failed'] == 1
+    assert 'allow-list' in result['results'][0]['error']
+
+
+def test_scan_imports_then_replaces_a_renewed_certificate(client, server, tmp_path):
+    target = f'127.0.0.1:{server.port}'
+    first = run_job(client, [target])
+    assert (first['imported'], first['failed']) == (1, 0)
+    first_id = first['results'][0]['id']
+    stored = client.get(f'/api/v1/certificates/{first_id}').get_json()['data']
+    assert stored['common_name'] == 'scan.test'
+    assert stored['scan_target'] == target
+
+    again = run_job(client, [target])
+    assert again['unchanged'] == 1
+    assert again['results'][0]['id'] == first_id
+
+    server.use(*self_signed(tmp_path, 'scan.test', 365))
+    renewed = run_job(client, [target])
+    assert renewed['renewed'] == 1
+    report = renewed['results'][0]
+    assert report['replaced_id'] == first_id
+    assert client.get(f'/api/v1/certificates/{first_id}').status_code == 404
+    listed = client.get('/api/v1/certificates').get_json()['data']
+    assert [cert['id'] for cert in listed] == [report['id']]
+
+
+def test_unreachable_targets_fail(client, server):
+    port = server.port
+    server.close()
+    result = run_job(client, [f'127.0.0.1:{port}'])
+    assert result['failed'] == 1
+    assert result['results'][0]['status'] == 'failed'
@@ -0,0 +1,9 @@
+# Import the record streaming helpers, the response and fragment caches and the X.509 parser
+from .fragment_cache import FragmentCache
+from .records import RECORD_FORMATS, batched, detect_format, iter_lines, iter_records
+from .response_cache import ResponseCache
+from .x509_parser import X509_CONTENT_TYPES, parse_upload
+
+# Make the helpers available when importing from this package
+__all__ = ['RECORD_FORMATS', 'FragmentCache', 'ResponseCache', 'X509_CONTENT_TYPES', 'batched', 'detect_format', 'iter_lines',
+           'iter_records', 'parse_upload']
@@ -0,0 +1,75 @@
+import math
+
+from models.certificate_status import DEFAULT_WARNING_DAYS, evaluate_statuses, next_transition, to_epoch_array
+
+
+class FragmentCache:
+    """
+    Encoded JSON for individual certificates, reused across list responses.
+
+    A certificate's JSON only changes when it is replaced in the store or when its
+    status crosses a boundary, so each fragment is kept until one of those happens:
+    store mutations evict entries (subscribe `store_changed` to a repository), and
+    every entry carries the epoch of the certificate's next status transition, after
+    which it is re-encoded. Entries are also tied to the content they were built
+    from (Certificate.content_key), so a certificate changed under the same ID
+    never reuses them. The content is compared, not just the object, since stores
+    like SQLCertificateStore build new objects on every read, and changes made by
+    another process never reach `store_changed`.
+    """
+
+    def __init__(self, warning_days=DEFAULT_WARNING_DAYS, max_entries=200_000):
+        self.warning_days = warning_days
+        self.max_entries = max_entries
+        # cert_id -> (certificate, content key, built at, valid until, fragment bytes)
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries = {}
+
+    def store_changed(self, action, added, removed_ids, version):
+        """Repository listener evicting fragments of replaced and removed certificates"""
+        if action == 'clear':
+            self.clear()
+            return
+        entries = self._entries
+        for cert_id in removed_ids:
+            entries.pop(cert_id, None)
+        for certificate in added:
+            entries.pop(certificate.id, None)
+
+    def fragments(self, certificates, now, dumps):
+        """
+        Encoded JSON (bytes) for each certificate as of `now`, in order. Misses are
+        evaluated in one vectorized status pass and encoded with `dumps` (dict -> str).
+        """
+        entries = self._entries
+        result = []
+        missing = []
+        for position, certificate in enumerate(certificates):
+            entry = entries.get(certificate.id)
+            # The same object (memory store) skips building the content key
+            if (entry is not None and entry[2] <= now < entry[3]
+                    and (entry[0] is certificate or entry[1] == certificate.content_key())):
+                result.append(entry[4])
+            else:
+                result.append(None)
+                missing.append(position)
+        if not missing:
+            return result
+
+        misses = [certificates[position] for position in missing]
+        statuses = evaluate_statuses(to_epoch_array([cert.expires_at for cert in misses]), now, self.warning_days)
+        if len(entries) + len(misses) > self.max_entries:
+            # Rare and cheap to rebuild; a bounded dict beats LRU bookkeeping on every hit
+            entries = self._entries = {}
+        for position, certificate, status in zip(missing, misses, statuses):
+            fragment = dumps(certificate.to_dict(status=status)).encode()
+            expires = next_transition(certificate.expires_at, now, self.warning_days)
+            entries[certificate.id] = (certificate, certificate.content_key(), now,
+                                       math.inf if expires is None else expires, fragment)
+            result[position] = fragment
+        return result
@@ -0,0 +1,225 @@
+"""
+Minimal Prometheus-style metrics with per-thread shards.
+
+Every thread updates its own dict, so recording a sample takes no lock; the
+shards are only merged when /metrics is scraped. Copying a dict or list is
+atomic under the GIL, so a scrape never sees a half-written value (at worst a
+histogram's sum and buckets are one sample apart). When a thread exits, its
+shard is folded into a retired total so thread-per-request servers don't
+accumulate shards.
+"""
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+# Latency buckets in seconds, tuned for an API that mostly answers in milliseconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ShardHolder:
+    """Per-thread owner of a shard; its finalizer runs when the thread's locals are dropped"""
+
+    __slots__ = ('values', '__weakref__')
+
+    def __init__(self):
+        self.values = {}
+
+
+class ShardedMetric(ABC):
+    """Base class: one values dict per thread, merged on read"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.holder.values
+        except AttributeError:
+            holder = self._local.holder = _ShardHolder()
+            # Only taken once per thread
+            with self._shards_lock:
+                self._shards.append(holder.values)
+            weakref.finalize(holder, self._retire, holder.values)
+            return holder.values
+
+    def _retire(self, values):
+        with self._shards_lock:
+            self._shards = [shard for shard in self._shards if shard is not values]
+            self._merge(self._retired, values)
+
+    @abstractmethod
+    def _merge(self, totals, shard):
+        """Add the samples in `shard` into `totals`"""
+
+    def collect(self):
+        with self._shards_lock:
+            totals = {}
+            self._merge(totals, self._retired)
+            shards = list(self._shards)
+        for shard in shards:
+            self._merge(totals, shard.copy())
+        return totals
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(ShardedMetric):
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def _merge(self, totals, shard):
+        for labels, value in shard.items():
+            totals[labels] = totals.get(labels, 0) + value
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    """Counter that may go down; per-thread increments and decrements sum to the current value"""
+
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class CallbackGauge:
+    """Gauge whose value is read from `callback()` at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}',
+                f'{self.name} {format_value(self.callback())}']
+
+
+class Histogram(ShardedMetric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        values = self._shard()
+        row = values.get(labels)
+        if row is None:
+            # Per-bucket (non-cumulative) counts, the +Inf bucket, then the sum
+            row = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def _merge(self, totals, shard):
+        for labels, row in shard.items():
+            total = totals.get(labels)
+            if total is None:
+                totals[labels] = list(row)
+            else:
+                for i, value in enumerate(list(row)):
+                    total[i] += value
+
+    def collect(self):
+        """Merged rows per label tuple: ([cumulative bucket counts], sum, count)"""
+        collected = {}
+        for labels, row in super().collect().items():
+            cumulative = []
+            running = 0
+            for count in row[:-1]:
+                running += count
+                cumulative.append(running)
+            collected[labels] = (cumulative, row[-1], running)
+        return collected
+
+    def render(self):
+        lines = self.header()
+        bounds = [format_value(bound) for bound in self.buckets] + ['+Inf']
+        for labels, (cumulative, total, count) in sorted(self.collect().items()):
+            for bound, value in zip(bounds, cumulative):
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, labels, le)} {value}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add a metric, returning the one already registered under its name if any"""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback_gauge(self, name, documentation, callback):
+        """(Re)bind a scrape-time gauge; the latest callback wins"""
+        self._metrics[name] = CallbackGauge(name, documentation, callback)
+        return self._metrics[name]
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry and the metrics shared by the app and the routes
+registry = MetricsRegistry()
+
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling a request, by route template.', ('method', 'route'))
+requests_total = registry.counter(
+    'http_requests_total', 'Requests handled, by route template and status code.', ('method', 'route', 'status'))
+requests_in_flight = registry.gauge(
+    'http_requests_in_flight', 'Requests currently being handled.')
+serialization_duration = registry.histogram(
+    'certificate_serialization_seconds', 'Time spent turning certificates into a JSON response body.', ('route',))
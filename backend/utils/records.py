@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+
+# Supported record formats and the content types that select them (the first is
+# the one used for responses)
+RECORD_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'application/ndjson', 'application/jsonl'),
+    'csv': ('text/csv',),
+}
+
+def detect_format(content_type, requested=None):
+    """Pick a record format from an explicit `format` value or the Content-Type header"""
+    if requested:
+        return requested if requested in RECORD_FORMATS else None
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    for name, mimetypes in RECORD_FORMATS.items():
+        if mimetype in mimetypes:
+            return name
+    return None
+
+def iter_ndjson_records(stream):
+    """
+    Yield (row_number, record, error) for each non-blank line of a binary NDJSON
+    stream. Lines are decoded one at a time so the body is never fully buffered.
+    """
+    for row_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, 'Each line must be a JSON object'
+            continue
+        yield row_number, record, None
+
+def iter_csv_records(stream):
+    """
+    Yield (row_number, record, error) for each data row of a binary CSV stream with a
+    header row. Empty cells are dropped so they count as missing fields. Lines are
+    decoded one at a time, so a row that isn't valid UTF-8 is reported on its own.
+    """
+    undecodable = [0]
+
+    def decoded_lines():
+        for line in stream:
+            try:
+                yield line.decode('utf-8')
+            except UnicodeDecodeError:
+                undecodable[0] += 1
+                yield line.decode('utf-8', 'replace')
+
+    reader = csv.DictReader(decoded_lines())
+    # Reading the field names consumes the header, so its decoding is checked separately
+    reader.fieldnames
+    header_error = 'Header row is not valid UTF-8' if undecodable[0] else None
+    seen = undecodable[0]
+    # Row numbers are 1-based data rows, not counting the header
+    for row_number, row in enumerate(reader, start=1):
+        if header_error or undecodable[0] != seen:
+            seen = undecodable[0]
+            yield row_number, None, header_error or 'Row is not valid UTF-8'
+            continue
+        if None in row:
+            yield row_number, None, 'Row has more columns than the header'
+            continue
+        yield row_number, {key: value for key, value in row.items() if value not in (None, '')}, None
+
+def iter_records(stream, record_format):
+    """Iterate over (row_number, record, error) tuples in the given format"""
+    if record_format == 'csv':
+        return iter_csv_records(stream)
+    return iter_ndjson_records(stream)
+
+def iter_ndjson_lines(records):
+    """Serialize dicts as NDJSON, one line per record"""
+    for record in records:
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+def iter_csv_lines(records, fields):
+    """Serialize dicts as CSV with a header row, one line per record; lists become space-separated cells"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    for record in records:
+        writer.writerow({key: ' '.join(value) if isinstance(value, list) else value
+                         for key, value in record.items()})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header-only output for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_lines(records, record_format, fields):
+    """Serialize dicts in the given format"""
+    if record_format == 'csv':
+        return iter_csv_lines(records, fields)
+    return iter_ndjson_lines(records)
+
+def batched(iterable, size):
+    """Group an iterable into lists of at most `size` items"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,35 @@
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Small LRU cache of serialized response bodies keyed by request, each tagged with
+    the ETag it was built for. An entry is only served while its ETag is current, so
+    bumping the store version (or crossing a status boundary) invalidates everything.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        """Return the cached body for `key` if it was built for `etag`, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
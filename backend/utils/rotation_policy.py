@@ -0,0 +1,107 @@
+"""
+Selectors for policy-driven batch rotation, shared by the Flask backend and the
+Lambda (aws-backend/rotation_policy.py is a symlink to this file), so it only
+depends on the standard library.
+"""
+
+ROTATION_STATUSES = ('active', 'warning', 'expired')
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Selector keys that narrow the match; at least one is required so an empty body
+# can never rotate the whole inventory
+SELECTOR_CRITERIA = ('status', 'expiring_within_days', 'issuer', 'domain_suffix')
+
+
+def normalize_suffix(suffix):
+    """'*.Example.com.' -> 'example.com'"""
+    suffix = suffix.strip().lower().rstrip('.')
+    if suffix.startswith('*.'):
+        suffix = suffix[2:]
+    return suffix.lstrip('.')
+
+
+def parse_rotation_selector(data):
+    """
+    Validate a rotate-batch request body and return the selector:
+    {'statuses', 'expiring_within_days', 'issuer', 'domain_suffix', 'dry_run', 'limit'}
+    with None for criteria that were not given. Raises ValueError on bad input.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    if not any(data.get(key) not in (None, '', []) for key in SELECTOR_CRITERIA):
+        raise ValueError(f'Provide at least one of: {", ".join(SELECTOR_CRITERIA)}')
+
+    statuses = data.get('status')
+    if statuses is not None:
+        if isinstance(statuses, str):
+            statuses = [value.strip() for value in statuses.split(',') if value.strip()]
+        if not isinstance(statuses, list) or not all(isinstance(value, str) for value in statuses):
+            raise ValueError('status must be a string or a list of strings')
+        unknown = [value for value in statuses if value not in ROTATION_STATUSES]
+        if unknown:
+            raise ValueError(f'Unknown status value(s): {", ".join(unknown)}')
+        statuses = set(statuses) or None
+
+    within = data.get('expiring_within_days')
+    if within is not None:
+        if isinstance(within, bool) or not isinstance(within, (int, float)) or within < 0:
+            raise ValueError('expiring_within_days must be a non-negative number')
+
+    issuer = data.get('issuer')
+    if issuer is not None and not isinstance(issuer, str):
+        raise ValueError('issuer must be a string')
+
+    suffix = data.get('domain_suffix')
+    if suffix is not None:
+        if not isinstance(suffix, str) or not normalize_suffix(suffix):
+            raise ValueError('domain_suffix must be a domain name such as example.com')
+        suffix = normalize_suffix(suffix)
+
+    dry_run = data.get('dry_run', False)
+    if not isinstance(dry_run, bool):
+        raise ValueError('dry_run must be true or false')
+
+    limit = data.get('limit')
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        raise ValueError('limit must be a positive integer')
+
+    return {
+        'statuses': statuses,
+        'expiring_within_days': within,
+        'issuer': issuer or None,
+        'domain_suffix': suffix,
+        'dry_run': dry_run,
+        'limit': limit,
+    }
+
+
+def expiry_cutoff(selector, now):
+    """Epoch before which a certificate counts as expiring within the window, or None"""
+    within = selector['expiring_within_days']
+    return None if within is None else now + int(within * SECONDS_PER_DAY)
+
+
+def suffix_matches(name, suffix):
+    name = (name or '').strip().lower().rstrip('.')
+    return name == suffix or name.endswith('.' + suffix)
+
+
+def selector_matches(selector, expires_at, status, issuer, names, now):
+    """
+    Whether one certificate matches. `expires_at` is its expiry epoch (None if
+    undated), `status` its current status and `names` its domain/common names.
+    Expiring within N days includes certificates that already expired; add a
+    status criterion to leave those out.
+    """
+    if selector['statuses'] is not None and status not in selector['statuses']:
+        return False
+    cutoff = expiry_cutoff(selector, now)
+    if cutoff is not None and (expires_at is None or expires_at >= cutoff):
+        return False
+    if selector['issuer'] is not None and (issuer or '').lower() != selector['issuer'].lower():
+        return False
+    if selector['domain_suffix'] is not None and not any(
+            suffix_matches(name, selector['domain_suffix']) for name in names):
+        return False
+    return True
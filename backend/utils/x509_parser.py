@@ -0,0 +1,140 @@
+"""
+Parse uploaded X.509 certificates (PEM bundles or single DER files) into
+certificate records with the real SHA-256 fingerprint.
+
+Splitting a PEM bundle is cheap and done in the calling process; decoding the
+DER blobs is CPU-bound, so large bundles are parsed in chunks on a shared
+process pool.
+"""
+import atexit
+import base64
+import binascii
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.x509.oid import ExtensionOID, NameOID
+
+# Content types accepted for raw (non-multipart) uploads
+X509_CONTENT_TYPES = ('application/x-pem-file', 'application/pem-certificate-chain',
+                      'application/pkix-cert', 'application/x-x509-ca-cert', 'application/octet-stream')
+
+PEM_CERTIFICATE = re.compile(rb'-----BEGIN CERTIFICATE-----(.+?)-----END CERTIFICATE-----', re.DOTALL)
+
+# Bundles smaller than this are parsed inline; pool dispatch costs more than it saves
+PARALLEL_THRESHOLD = 256
+
+# Certificates sent to a worker per task
+CHUNK_SIZE = 128
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def split_certificates(data):
+    """
+    Split an upload into DER blobs. PEM input may hold any number of certificates
+    (other PEM blocks such as keys are ignored); anything else is one DER certificate.
+    Returns a list of (der_bytes, error) pairs.
+    """
+    if b'-----BEGIN' not in data:
+        return [(data, None)] if data.strip() else []
+    blocks = []
+    for match in PEM_CERTIFICATE.finditer(data):
+        try:
+            blocks.append((base64.b64decode(b''.join(match.group(1).split()), validate=True), None))
+        except (binascii.Error, ValueError):
+            blocks.append((None, 'Invalid base64 in PEM block'))
+    return blocks
+
+
+def name_attribute(name, oid):
+    """First value of `oid` in an x509.Name, or None"""
+    attributes = name.get_attributes_for_oid(oid)
+    return attributes[0].value if attributes else None
+
+
+def certificate_fields(der):
+    """Decode one DER certificate into the fields of a certificate record"""
+    certificate = x509.load_der_x509_certificate(der)
+    try:
+        san = certificate.extensions.get_extension_for_oid(ExtensionOID.SUBJECT_ALTERNATIVE_NAME)
+        alt_names = san.value.get_values_for_type(x509.DNSName)
+    except x509.ExtensionNotFound:
+        alt_names = []
+    common_name = name_attribute(certificate.subject, NameOID.COMMON_NAME)
+    issuer = (name_attribute(certificate.issuer, NameOID.ORGANIZATION_NAME)
+              or name_attribute(certificate.issuer, NameOID.COMMON_NAME)
+              or certificate.issuer.rfc4514_string())
+    return {
+        'domain_name': alt_names[0] if alt_names else common_name,
+        'common_name': common_name or (alt_names[0] if alt_names else None),
+        'issuer': issuer,
+        'subject_alt_names': alt_names,
+        'valid_from': certificate.not_valid_before_utc.isoformat(),
+        'valid_until': certificate.not_valid_after_utc.isoformat(),
+        'fingerprint_sha256': certificate.fingerprint(hashes.SHA256()).hex(),
+    }
+
+
+def parse_chunk(blobs):
+    """Parse a list of DER blobs; returns (fields, error) pairs in the same order"""
+    results = []
+    for der in blobs:
+        try:
+            results.append((certificate_fields(der), None))
+        except ValueError as exc:
+            results.append((None, f'Invalid certificate: {exc}'))
+    return results
+
+
+def parser_pool(workers):
+    """Return the shared parser pool, (re)creating it when the worker count changes"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+@atexit.register
+def shutdown_parser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def parse_certificates(blobs, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Parse DER blobs into (fields, error) pairs, keeping input order. Uses the
+    process pool for large inputs unless `workers` is 0 or 1.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(blobs) < PARALLEL_THRESHOLD:
+        return parse_chunk(blobs)
+    chunks = [blobs[start:start + chunk_size] for start in range(0, len(blobs), chunk_size)]
+    results = []
+    for parsed in parser_pool(workers).map(parse_chunk, chunks):
+        results.extend(parsed)
+    return results
+
+
+def parse_upload(data, workers=None):
+    """
+    Split and parse an uploaded PEM bundle or DER file. Returns (fields, error)
+    pairs, one per certificate found.
+    """
+    blocks = split_certificates(data)
+    blobs = [der for der, error in blocks if error is None]
+    parsed = iter(parse_certificates(blobs, workers))
+    return [next(parsed) if error is None else (None, error) for der, error in blocks]
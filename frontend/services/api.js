@@ -53,9 +53,16 @@ api.interceptors.response.use(
   }
 );
 
-export const getCertificates = async () => {
+// Optional params: { limit, cursor, fields } for keyset pagination ordered by expiry.
+// `fields` may be an array of field names; pass the returned `next_cursor` back as
+// `cursor` to fetch the following page (it is null on the last page).
+export const getCertificates = async ({ limit, cursor, fields } = {}) => {
   try {
-    return await api.get('/certificates');
+    const params = {};
+    if (limit) params.limit = limit;
+    if (cursor) params.cursor = cursor;
+    if (fields) params.fields = Array.isArray(fields) ? fields.join(',') : fields;
+    return await api.get('/certificates', { params });
   } catch (error) {
     throw error;
   }
@@ -103,4 +110,54 @@ export const rotateCertificate = async (id) => {
     } catch (error) {
       throw error;
     }
-  };
\ No newline at end of file
+  };
+
+// Rotate every certificate matching a selector: { status, expiring_within_days, issuer,
+// domain_suffix, limit, dry_run }. With dry_run the matches are returned without rotating.
+export const rotateCertificatesBatch = async (selector) => {
+  try {
+    return await api.post('/certificates/rotate-batch', selector);
+  } catch (error) {
+    throw error;
+  }
+};
+
+// Changes after a store version: { version, changes, transitions }. Rejects with a
+// 410 payload when `since` is older than the server keeps; reload the list then.
+export const getCertificateChanges = async (since) => {
+  try {
+    return await api.get('/certificates/changes', { params: { since } });
+  } catch (error) {
+    throw error;
+  }
+};
+
+// Subscribe to the server-sent change stream instead of refetching the list.
+// Handlers: onChange({ version, action, certificates, removed_ids }) for create/import/
+// delete/rotate/clear, onStatus({ version, certificates }) for certificates crossing
+// into warning/expired, onReset() when the client is too far behind and must reload.
+// `since` resumes from a known version; the browser resumes on reconnect by itself.
+// EventSource cannot send headers, so this needs a backend that does not require x-api-key.
+// Returns a function that closes the stream.
+export const subscribeToCertificateChanges = ({ since, onChange, onStatus, onReset, onError } = {}) => {
+  const url = new URL(`${API_BASE_URL}/certificates/changes`, window.location.origin);
+  if (since !== undefined && since !== null) url.searchParams.set('since', since);
+
+  const source = new EventSource(url.toString());
+  const parse = (event) => JSON.parse(event.data);
+
+  source.addEventListener('change', (event) => onChange?.(parse(event)));
+  source.addEventListener('status', (event) => onStatus?.(parse(event)));
+  source.addEventListener('reset', (event) => {
+    source.close();
+    onReset?.(parse(event));
+  });
+  source.onerror = (error) => {
+    if (import.meta.env.DEV) {
+      console.warn('[API] Change stream error, the browser will reconnect', error);
+    }
+    onError?.(error);
+  };
+
+  return () => source.close();
+};